@@ -0,0 +1,151 @@
+"""
+Frontend asset build and delivery.
+
+    python -m app.assets
+
+fingerprints static/app.js and static/styles.css into static/dist, rewrites
+index.html to reference them and writes gzip/brotli siblings of every output.
+Fingerprinted files are served as immutable; index.html is served from memory
+with an ETag so repeat visits revalidate with a 304.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from fastapi import Request
+from fastapi.responses import Response
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+from app.responses import choose_encoding, etag_matches
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None
+
+STATIC_DIR = "static"
+DIST_DIR = os.path.join(STATIC_DIR, "dist")
+ASSETS = ("app.js", "styles.css")
+FINGERPRINTED = re.compile(r"\.[0-9a-f]{12}\.\w+$")
+IMMUTABLE = "public, max-age=31536000, immutable"
+ASSET_REFERENCE = re.compile(r"/static/(" + "|".join(re.escape(name) for name in ASSETS) + r")(\?v=[\w.]+)?")
+
+
+def fingerprint(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()[:12]
+
+
+def write_precompressed(path: str, content: bytes):
+    """Write ``path`` plus .gz (and .br when brotli is installed) siblings."""
+    with open(path, "wb") as f:
+        f.write(content)
+    with open(path + ".gz", "wb") as f:
+        f.write(gzip.compress(content, compresslevel=9))
+    if brotli is not None:
+        with open(path + ".br", "wb") as f:
+            f.write(brotli.compress(content, quality=11))
+
+
+def build_assets(static_dir: str = STATIC_DIR, dist_dir: str = DIST_DIR) -> dict:
+    """Fingerprint and precompress the frontend; returns the asset manifest."""
+    shutil.rmtree(dist_dir, ignore_errors=True)
+    os.makedirs(dist_dir)
+
+    manifest = {}
+    for name in ASSETS:
+        with open(os.path.join(static_dir, name), "rb") as f:
+            content = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed_name = f"{stem}.{fingerprint(content)}{ext}"
+        write_precompressed(os.path.join(dist_dir, hashed_name), content)
+        manifest[name] = hashed_name
+
+    with open(os.path.join(static_dir, "index.html"), encoding="utf-8") as f:
+        index_html = f.read()
+    index_html = ASSET_REFERENCE.sub(lambda m: f"/static/dist/{manifest[m.group(1)]}", index_html)
+    write_precompressed(os.path.join(dist_dir, "index.html"), index_html.encode("utf-8"))
+
+    with open(os.path.join(dist_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves .br/.gz siblings and long-lived caching for fingerprinted files."""
+
+    SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        available = [enc for enc, suffix in self.SUFFIXES.items() if os.path.isfile(full_path + suffix)]
+        encoding = choose_encoding(request_headers.get("accept-encoding", ""), available)
+
+        if encoding:
+            encoded_path = full_path + self.SUFFIXES[encoding]
+            response = FileResponse(
+                encoded_path,
+                status_code=status_code,
+                stat_result=os.stat(encoded_path),
+                method=scope["method"],
+                media_type=mimetypes.guess_type(full_path)[0] or "text/plain"
+            )
+            response.headers["content-encoding"] = encoding
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, method=scope["method"])
+
+        response.headers["vary"] = "Accept-Encoding"
+        response.headers["cache-control"] = IMMUTABLE if FINGERPRINTED.search(full_path) else "no-cache"
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class IndexPage:
+    """index.html held in memory with precompressed variants and a content ETag."""
+
+    def __init__(self, path: str, watch: bool = False):
+        self.path = path
+        self.watch = watch
+        self.mtime = None
+        self.load()
+
+    def load(self):
+        with open(self.path, "rb") as f:
+            content = f.read()
+        self.mtime = os.stat(self.path).st_mtime
+        self.etag = f'W/"{fingerprint(content)}"'
+        self.variants = {None: content, "gzip": gzip.compress(content, compresslevel=9)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(content, quality=11)
+
+    def response(self, request: Request) -> Response:
+        if self.watch and os.stat(self.path).st_mtime != self.mtime:
+            self.load()
+
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match", ""), self.etag):
+            return Response(status_code=304, headers=headers)
+
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""), self.variants)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type="text/html", headers=headers)
+
+
+def index_html_path(production: bool = True) -> str:
+    """The built index.html in production when present, otherwise the source file."""
+    built = os.path.join(DIST_DIR, "index.html")
+    source = os.path.join(STATIC_DIR, "index.html")
+    return built if production and os.path.isfile(built) else source
+
+
+if __name__ == "__main__":
+    for source, built in build_assets().items():
+        print(f"{source} -> {DIST_DIR}/{built}")
@@ -53,7 +53,11 @@ def verify_token(token: str) -> Optional[TokenData]:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
     """Get current authenticated user from JWT token."""
-    token = credentials.credentials
+    return await user_from_token(credentials.credentials)
+
+
+async def user_from_token(token: str) -> User:
+    """Load the active user a JWT was issued to (raises 401/400 like get_current_user)."""
     token_data = verify_token(token)
     
     if token_data is None:
@@ -64,7 +68,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         )
     
     users_collection = get_collection("users")
-    user = await users_collection.find_one({"email": token_data.email})
+    user = await users_collection.find_one({"email": token_data.email, "deleted_at": None})
     
     if user is None:
         raise HTTPException(
@@ -98,7 +102,7 @@ async def get_current_admin_user(current_user: User = Depends(get_current_user))
 async def authenticate_user(email: str, password: str) -> Optional[User]:
     """Authenticate user with email and password."""
     users_collection = get_collection("users")
-    user = await users_collection.find_one({"email": email})
+    user = await users_collection.find_one({"email": email, "deleted_at": None})
     
     if not user:
         return None
@@ -1,15 +1,68 @@
-import openai
-from typing import List, Optional
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, List, Optional
+from openai import OpenAI
 from app.config import settings
+from app.faq import normalize
 from app.models import ChatRequest, ChatResponse, RetrievalRef, MessageRole
-from app.rag import rag_engine
+from app.rag import RAGEngine, scope_filter, search_params
+from app.resilience import CircuitOpenError, qdrant_breaker
+from app.scheduler import completion_tokens, is_failure, openai_scheduler
+from app.singleflight import SingleFlight
+
+ERROR_REPLY = "I apologize, but I encountered an error while processing your request. Please try again."
+RETRIEVAL_ONLY_REPLY = "I can't generate a full answer right now. These excerpts from the documentation look most relevant to your question:"
+UNAVAILABLE_REPLY = "I can't generate an answer right now and found no matching documentation. Please try again in a moment."
+EXCERPT_CHARS = 300
+NO_CONTEXT_REPLY = "I have access to technical documentation about signage and mounting methods. Please ask me specific questions about these topics, and I'll do my best to help you with the information available in my knowledge base."
+
+
+class GenerationPool:
+    """Threads for blocking LLM calls, apart from the default executor; created on first use."""
+    executor: ThreadPoolExecutor = None
+
+
+def generation_executor() -> ThreadPoolExecutor:
+    """One thread per admitted chat turn, so every turn past admission gets its answer started."""
+    if GenerationPool.executor is None:
+        workers = settings.chat_max_queue_depth or settings.openai_max_connections
+        GenerationPool.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chat-generation")
+    return GenerationPool.executor
+
+
+def shutdown_generation_pool():
+    """Stop the generation threads once the answers in progress finish."""
+    if GenerationPool.executor is not None:
+        GenerationPool.executor.shutdown(wait=False, cancel_futures=True)
+        GenerationPool.executor = None
+
+
+@dataclass
+class AnswerPlan:
+    """What to send to the LLM for one question, or the reply to give without it."""
+    prompt: Optional[str] = None
+    system: Optional[str] = None
+    retrieval_refs: List[RetrievalRef] = field(default_factory=list)
+    reply: Optional[str] = None
+    excerpts: List[dict] = field(default_factory=list)   # {"filename", "text"} of the context, for a retrieval-only reply
+
+
+def llm_unavailable(error: Exception) -> bool:
+    """Whether ``error`` means OpenAI is down or its breaker is open (answer from retrieval alone)."""
+    if isinstance(error, CircuitOpenError):
+        return error.dependency == "openai"
+    return is_failure(error)
 
 
 class ChatService:
-    def __init__(self):
-        """Initialize chat service with OpenAI."""
-        from openai import OpenAI
-        self.client = OpenAI(api_key=settings.openai_api_key)
+    def __init__(self, rag_engine: RAGEngine, openai_client: OpenAI = None):
+        """Initialize chat service, sharing the RAG engine's OpenAI client by default."""
+        self.rag_engine = rag_engine
+        self.client = openai_client or rag_engine.openai_client
+        # Identical concurrent questions within a tenant share one answer
+        self.answer_flight = SingleFlight()
     
     def build_context_prompt(self, query: str, retrieval_refs: List[RetrievalRef]) -> str:
         """Build context-aware prompt for the LLM."""
@@ -24,7 +77,7 @@ I don't have enough information in the knowledge base to answer that question. P
         context_parts = []
         for ref in retrieval_refs:
             # Get the actual chunk content
-            chunks = rag_engine.get_document_chunks(ref.doc_id)
+            chunks = self.rag_engine.get_document_chunks(ref.doc_id)
             chunk_content = next((chunk['content'] for chunk in chunks if chunk['chunk_id'] == ref.chunk_id), "")
             
             context_parts.append(f"Document: {ref.filename} (Page {ref.page})\nContent: {chunk_content}\n")
@@ -54,47 +107,72 @@ Answer:"""
         try:
             prompt = self.build_context_prompt(query, retrieval_refs)
             
-            response = self.client.chat.completions.create(
-                model=settings.openai_chat_model,
-                messages=[
+            request = {
+                "model": settings.openai_chat_model,
+                "messages": [
                     {"role": "system", "content": "You are a helpful RAG assistant that only answers based on provided context."},
                     {"role": "user", "content": prompt}
                 ],
-                max_tokens=1000,
-                temperature=0.1
-            )
+                "max_tokens": 1000,
+                "temperature": 0.1
+            }
+            response = openai_scheduler.call(lambda: self.client.chat.completions.create(**request),
+                                             tokens=completion_tokens(request))
             
             return response.choices[0].message.content.strip()
         
         except Exception as e:
             return "I apologize, but I encountered an error while processing your request. Please try again."
     
-    async def process_chat_message(self, message: str) -> ChatResponse:
-        """Process a chat message and return response with retrieval references."""
-        try:
-            # Search for relevant documents
-            retrieval_refs = rag_engine.search_documents(message)
-            
-            # If no specific search results, try to get some general context
-            if not retrieval_refs:
-                # Try to get some general documents for context
-                try:
-                    # Get a few random documents for general context
-                    search_result = rag_engine.qdrant_client.scroll(
-                        collection_name=settings.qdrant_collection_name,
-                        limit=3
-                    )
-                    
-                    if search_result[0]:
-                        # Use general context but be clear about limitations
-                        context_chunks = []
-                        for point in search_result[0]:
-                            if point.payload.get("text", "").strip():
-                                context_chunks.append(point.payload["text"])
-                        
-                        if context_chunks:
-                            context = "\n\n".join(context_chunks)
-                            prompt = f"""You are a helpful assistant. I have some general information available, but it may not be directly related to the user's question. Please provide a helpful response if possible, or politely explain what kind of information you have access to.
+    async def process_chat_message(self, message: str, doc_ids: Optional[List[str]] = None,
+                                   tags: Optional[List[str]] = None, tenant_id: Optional[str] = None,
+                                   query_embedding: Optional[List[float]] = None) -> ChatResponse:
+        """Process a chat message and return response with retrieval references.
+
+        Retrieval only sees ``tenant_id``'s knowledge base; ``doc_ids`` / ``tags``
+        narrow it further (None searches the whole knowledge base). A precomputed
+        ``query_embedding`` is reused instead of embedding the message again.
+        Runs on a generation thread so database writes can proceed meanwhile. While
+        an answer to the same normalized question and scope is being generated
+        for the tenant, callers share it instead of starting another.
+        """
+        def answer():
+            return asyncio.get_running_loop().run_in_executor(
+                generation_executor(), self.answer_message, message, doc_ids, tags, tenant_id, query_embedding
+            )
+
+        if not settings.coalesce_requests:
+            return await answer()
+        key = (tenant_id or settings.default_tenant, normalize(message),
+               tuple(doc_ids) if doc_ids is not None else None, tuple(tags) if tags is not None else None)
+        return (await self.answer_flight.do(key, answer)).model_copy()
+
+    def plan_answer(self, message: str, doc_ids: Optional[List[str]] = None,
+                    tags: Optional[List[str]] = None, tenant_id: Optional[str] = None,
+                    query_embedding: Optional[List[float]] = None) -> AnswerPlan:
+        """Retrieve context for ``message`` and build the LLM request (blocking)."""
+        # Search for relevant documents
+        retrieval_refs = self.rag_engine.search_documents(
+            message, doc_ids=doc_ids, tags=tags, tenant_id=tenant_id, query_embedding=query_embedding
+        )
+        
+        # If no specific search results, try to get some general context
+        if not retrieval_refs:
+            # Try to get some general documents for context
+            try:
+                # Get a few random documents for general context
+                search_result = qdrant_breaker.call(lambda: self.rag_engine.qdrant_client.scroll(
+                    collection_name=self.rag_engine.collection_for(tenant_id),
+                    shard_key_selector=self.rag_engine.shard_key_for(tenant_id),
+                    scroll_filter=scope_filter(doc_ids, tags),
+                    limit=3
+                ))
+                
+                # Use general context but be clear about limitations
+                context_chunks = [point.payload["text"] for point in search_result[0] if point.payload.get("text", "").strip()]
+                if context_chunks:
+                    context = "\n\n".join(context_chunks)
+                    prompt = f"""You are a helpful assistant. I have some general information available, but it may not be directly related to the user's question. Please provide a helpful response if possible, or politely explain what kind of information you have access to.
 
 Available context:
 {context}
@@ -102,42 +180,29 @@ Available context:
 User question: {message}
 
 Please respond helpfully, but if the context doesn't contain relevant information, explain what kind of documents you have access to."""
-                            
-                            response = self.client.chat.completions.create(
-                                model=settings.openai_chat_model,
-                                messages=[
-                                    {"role": "system", "content": "You are a helpful RAG assistant."},
-                                    {"role": "user", "content": prompt}
-                                ],
-                                max_tokens=1000,
-                                temperature=0.1
-                            )
-                            
-                            response_text = response.choices[0].message.content.strip()
-                            return ChatResponse(message=response_text, retrieval_refs=[])
-                except Exception as e:
-                    pass
+                    return AnswerPlan(prompt=prompt, system="You are a helpful RAG assistant.")
+            except Exception as e:
+                pass
+        
+        # If we have specific search results, use them
+        if retrieval_refs:
+            # Get the actual content from the search results
+            query_embedding = query_embedding or self.rag_engine.get_openai_embedding(message)
+            search_result = qdrant_breaker.call(lambda: self.rag_engine.qdrant_client.search(
+                collection_name=self.rag_engine.collection_for(tenant_id),
+                shard_key_selector=self.rag_engine.shard_key_for(tenant_id),
+                query_vector=query_embedding,
+                query_filter=scope_filter(doc_ids, tags),
+                limit=len(retrieval_refs),
+                search_params=search_params()
+            ))
             
-            # If we have specific search results, use them
-            if retrieval_refs:
-                # Get the actual content from the search results
-                query_embedding = rag_engine.get_openai_embedding(message)
-                search_result = rag_engine.qdrant_client.search(
-                    collection_name=settings.qdrant_collection_name,
-                    query_vector=query_embedding,
-                    limit=len(retrieval_refs)
-                )
-                
-                # Extract actual text content from search results
-                context_chunks = []
-                for hit in search_result:
-                    if hit.payload.get("text", "").strip():
-                        context_chunks.append(hit.payload["text"])
-                
-                if context_chunks:
-                    # Build context prompt with actual content
-                    context = "\n\n".join(context_chunks)
-                    prompt = f"""You are a helpful assistant. Use the following context to answer the user's question. If the context contains relevant information, provide a helpful answer. Only say you don't have enough information if the context is completely unrelated to the question.
+            # Extract actual text content from search results
+            context_chunks = [hit.payload["text"] for hit in search_result if hit.payload.get("text", "").strip()]
+            if context_chunks:
+                # Build context prompt with actual content
+                context = "\n\n".join(context_chunks)
+                prompt = f"""You are a helpful assistant. Use the following context to answer the user's question. If the context contains relevant information, provide a helpful answer. Only say you don't have enough information if the context is completely unrelated to the question.
 
 Context:
 {context}
@@ -145,31 +210,120 @@ Context:
 Question: {message}
 
 Answer the question based on the context above:"""
-                    
-                    # Get response from LLM
-                    response = self.client.chat.completions.create(
-                        model=settings.openai_chat_model,
-                        messages=[
-                            {"role": "system", "content": "You are a helpful RAG assistant that only answers based on provided context."},
-                            {"role": "user", "content": prompt}
-                        ],
-                        max_tokens=1000,
-                        temperature=0.1
-                    )
-                    
-                    response_text = response.choices[0].message.content.strip()
-                    return ChatResponse(message=response_text, retrieval_refs=retrieval_refs)
+                return AnswerPlan(
+                    prompt=prompt,
+                    system="You are a helpful RAG assistant that only answers based on provided context.",
+                    retrieval_refs=retrieval_refs,
+                    excerpts=[{"filename": hit.payload.get("source_file"), "text": hit.payload["text"]}
+                              for hit in search_result if hit.payload.get("text", "").strip()]
+                )
+        
+        # Fallback response
+        return AnswerPlan(reply=NO_CONTEXT_REPLY)
+
+    def completion_request(self, plan: AnswerPlan) -> dict:
+        return {
+            "model": settings.openai_chat_model,
+            "messages": [
+                {"role": "system", "content": plan.system},
+                {"role": "user", "content": plan.prompt}
+            ],
+            "max_tokens": 1000,
+            "temperature": 0.1
+        }
+
+    def answer_message(self, message: str, doc_ids: Optional[List[str]] = None,
+                       tags: Optional[List[str]] = None, tenant_id: Optional[str] = None,
+                       query_embedding: Optional[List[float]] = None) -> ChatResponse:
+        """Retrieve context for ``message`` and generate the answer (blocking).
+
+        When OpenAI fails or its breaker is open the reply lists document excerpts instead.
+        """
+        plan = None
+        try:
+            plan = self.plan_answer(message, doc_ids, tags, tenant_id, query_embedding)
+            if plan.reply is not None:
+                return ChatResponse(message=plan.reply, retrieval_refs=plan.retrieval_refs)
             
-            # Fallback response
-            response_text = "I have access to technical documentation about signage and mounting methods. Please ask me specific questions about these topics, and I'll do my best to help you with the information available in my knowledge base."
-            return ChatResponse(message=response_text, retrieval_refs=[])
+            # Get response from LLM
+            request = self.completion_request(plan)
+            response = openai_scheduler.call(lambda: self.client.chat.completions.create(**request),
+                                             tokens=completion_tokens(request))
+            
+            response_text = response.choices[0].message.content.strip()
+            return ChatResponse(message=response_text, retrieval_refs=plan.retrieval_refs)
             
         except Exception as e:
-            return ChatResponse(
-                message="I apologize, but I encountered an error while processing your request. Please try again.",
-                retrieval_refs=[]
-            )
+            if llm_unavailable(e):
+                print(f"LLM unavailable, answering from retrieval alone: {e}")
+                return self.retrieval_only_answer(message, plan, doc_ids, tags, tenant_id)
+            if isinstance(e, CircuitOpenError):
+                raise
+            return ChatResponse(message=ERROR_REPLY, retrieval_refs=[])
+
+    def retrieval_only_answer(self, message: str, plan: Optional[AnswerPlan] = None,
+                              doc_ids: Optional[List[str]] = None, tags: Optional[List[str]] = None,
+                              tenant_id: Optional[str] = None) -> ChatResponse:
+        """Answer with the excerpts retrieval found, for when the LLM cannot be reached (blocking).
 
+        Uses the plan's context when retrieval already ran, otherwise a keyword
+        search, which needs no embedding.
+        """
+        if plan is not None and plan.excerpts:
+            excerpts, retrieval_refs = plan.excerpts, plan.retrieval_refs
+        else:
+            excerpts = self.rag_engine.keyword_search(message, settings.retrieval_top_k, doc_ids, tags, tenant_id)
+            retrieval_refs = [
+                RetrievalRef(doc_id=excerpt["doc_id"], filename=excerpt["filename"], page=1,
+                             chunk_id=excerpt["chunk_id"], score=0.0)
+                for excerpt in excerpts
+            ]
+        if not excerpts:
+            return ChatResponse(message=UNAVAILABLE_REPLY, retrieval_refs=[], route="retrieval_only")
+        lines = [RETRIEVAL_ONLY_REPLY, ""]
+        for excerpt in excerpts:
+            text = " ".join(excerpt["text"].split())
+            if len(text) > EXCERPT_CHARS:
+                text = text[:EXCERPT_CHARS].rsplit(" ", 1)[0] + "..."
+            lines.append(f"- {excerpt['filename']}: {text}")
+        return ChatResponse(message="\n".join(lines), retrieval_refs=retrieval_refs, route="retrieval_only")
 
-# Global chat service instance
-chat_service = ChatService()
+    async def stream_answer(self, plan: AnswerPlan) -> AsyncIterator[str]:
+        """Yield the LLM's answer to ``plan`` token by token.
+
+        The blocking OpenAI stream is read on a generation thread. When the consumer
+        stops early (e.g. the task is cancelled) the worker closes the HTTP
+        response at the next token, which aborts the generation upstream.
+        """
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+
+        def produce():
+            try:
+                request = self.completion_request(plan)
+                # Only opening the stream is scheduled (and retried); tokens already sent cannot be replayed
+                stream = openai_scheduler.call(lambda: self.client.chat.completions.create(**request, stream=True),
+                                               tokens=completion_tokens(request))
+                try:
+                    for chunk in stream:
+                        if stop.is_set():
+                            break
+                        token = chunk.choices[0].delta.content if chunk.choices else None
+                        if token:
+                            loop.call_soon_threadsafe(queue.put_nowait, token)
+                finally:
+                    stream.response.close()
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        loop.run_in_executor(generation_executor(), produce)
+        try:
+            while (item := await queue.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            stop.set()
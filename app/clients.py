@@ -0,0 +1,77 @@
+import importlib.util
+import httpx
+from openai import OpenAI
+from qdrant_client import QdrantClient
+from app.config import settings
+from app.scheduler import openai_scheduler
+
+
+def create_openai_http_client() -> httpx.Client:
+    """Keep-alive HTTP client shared by every OpenAI call in the process."""
+    return httpx.Client(
+        http2=settings.openai_http2 and importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(
+            max_connections=settings.openai_max_connections,
+            max_keepalive_connections=settings.openai_max_keepalive_connections,
+            keepalive_expiry=settings.openai_keepalive_expiry
+        ),
+        timeout=httpx.Timeout(settings.openai_timeout, connect=settings.openai_connect_timeout),
+        event_hooks={"response": [openai_scheduler.observe]}  # Feed rate-limit headers to the scheduler
+    )
+
+
+def create_openai_client(http_client: httpx.Client = None) -> OpenAI:
+    """OpenAI client on top of the shared keep-alive HTTP client."""
+    return OpenAI(
+        api_key=settings.openai_api_key,
+        base_url=settings.openai_base_url,
+        http_client=http_client or create_openai_http_client(),
+        max_retries=0  # The scheduler retries with backoff and shares 429 pauses across calls
+    )
+
+
+def create_qdrant_client() -> QdrantClient:
+    """Qdrant client using gRPC when preferred, otherwise a pooled REST client."""
+    if settings.qdrant_url == ":memory:":
+        # Local in-process store, used by the tests and the offline benchmarks
+        return QdrantClient(location=":memory:")
+    return QdrantClient(
+        url=settings.qdrant_url,  # e.g. "https://<cluster-id>.<region>.gcp.cloud.qdrant.io"
+        api_key=settings.qdrant_api_key,
+        prefer_grpc=settings.qdrant_prefer_grpc,
+        grpc_port=settings.qdrant_grpc_port,
+        limits=httpx.Limits(
+            max_connections=settings.qdrant_max_connections,
+            max_keepalive_connections=settings.qdrant_max_connections
+        ),
+        timeout=settings.qdrant_timeout,
+        check_compatibility=False  # Avoid a version round-trip at construction time
+    )
+
+
+def http_pool_stats(client: httpx.Client) -> dict:
+    """Open, idle and HTTP/2 connection counts of an httpx client's pool."""
+    pool = getattr(getattr(client, "_transport", None), "_pool", None)
+    if pool is None:
+        return {}
+    connections = pool.connections
+    idle = sum(1 for connection in connections if connection.is_idle())
+    return {
+        "connections": len(connections),
+        "idle": idle,
+        "active": len(connections) - idle,
+        "http2": sum(1 for connection in connections if "HTTP/2" in connection.info()),
+    }
+
+
+def qdrant_pool_stats(client: QdrantClient) -> dict:
+    """Transport in use and, for REST, the pool of the underlying httpx client."""
+    if settings.qdrant_url == ":memory:":
+        return {"transport": "local"}
+    if settings.qdrant_prefer_grpc:
+        return {"transport": "grpc"}
+    try:
+        http_client = client._client.openapi_client.client._client
+    except AttributeError:
+        return {"transport": "rest"}
+    return {"transport": "rest", **http_pool_stats(http_client)}
@@ -0,0 +1,191 @@
+"""
+Background garbage collector.
+
+Deleting a user, thread or document only sets ``deleted_at`` (a tombstone)
+and returns; this collector removes what is left behind in rate-limited
+batches:
+
+- tombstoned users: their threads are tombstoned, then the user is removed
+- tombstoned threads: messages are deleted batch by batch, then the thread
+- tombstoned documents: their vector points, then the metadata row
+
+Every reconcile_interval it also sweeps orphans no tombstone points at:
+messages without a thread, threads without an owner and vector points
+without a document. Points younger than gc_orphan_grace are never swept,
+because a bulk upload stores its points before it records its documents,
+and older ones are only deleted when still orphaned on the next sweep.
+"""
+
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+from app.config import settings
+from app.database import get_collection
+from app.messages import get_message_repository
+from app.rag import RAGEngine
+from app.tenants import tenant_filter, tenant_of
+
+TOMBSTONED = {"deleted_at": {"$exists": True}}
+
+
+class GarbageCollector:
+    def __init__(self, rag_engine: RAGEngine):
+        self.rag_engine = rag_engine
+        self.task: asyncio.Task = None
+        self.wake_event = asyncio.Event()
+        self.last_reconcile = time.monotonic()
+        # Orphaned point ids seen on the previous sweep, per tenant
+        self.suspect_points: Dict[str, set] = {}
+
+    async def pause(self):
+        """Yield between batches so collection never saturates MongoDB or Qdrant."""
+        await asyncio.sleep(settings.gc_batch_pause)
+
+    async def delete_messages(self, thread_ids: List[str]) -> int:
+        """Delete the messages of ``thread_ids`` in batches of gc_batch_size."""
+        message_repository = get_message_repository()
+        deleted = 0
+        while True:
+            removed = await message_repository.delete_batch(thread_ids, settings.gc_batch_size)
+            if not removed:
+                return deleted
+            deleted += removed
+            await self.pause()
+
+    async def collect_users(self) -> int:
+        """Tombstone the threads of deleted users, then remove the users."""
+        users_collection = get_collection("users")
+        threads_collection = get_collection("threads")
+        users = await users_collection.find(TOMBSTONED, {"_id": 1}).limit(settings.gc_batch_size).to_list(settings.gc_batch_size)
+        if not users:
+            return 0
+        user_ids = [str(user["_id"]) for user in users]
+        await threads_collection.update_many(
+            {"owner_user_id": {"$in": user_ids}, "deleted_at": None},
+            {"$set": {"deleted_at": datetime.now(timezone.utc)}}
+        )
+        result = await users_collection.delete_many({"_id": {"$in": [user["_id"] for user in users]}})
+        return result.deleted_count
+
+    async def collect_threads(self) -> int:
+        """Delete the messages of tombstoned threads, then the threads."""
+        threads_collection = get_collection("threads")
+        threads = await threads_collection.find(TOMBSTONED, {"_id": 1}).limit(settings.gc_batch_size).to_list(settings.gc_batch_size)
+        if not threads:
+            return 0
+        await self.delete_messages([str(thread["_id"]) for thread in threads])
+        result = await threads_collection.delete_many({"_id": {"$in": [thread["_id"] for thread in threads]}})
+        return result.deleted_count
+
+    async def collect_documents(self) -> int:
+        """Delete the vector points of tombstoned documents, then their metadata."""
+        documents_collection = get_collection("documents")
+        collected = 0
+        async for doc in documents_collection.find(TOMBSTONED).limit(settings.gc_batch_size):
+            removed = await asyncio.to_thread(
+                self.rag_engine.delete_document, doc["doc_id"], tenant_of(doc), doc.get("filename")
+            )
+            if removed:
+                await documents_collection.delete_one({"_id": doc["_id"]})
+                collected += 1
+            await self.pause()
+        return collected
+
+    async def reconcile(self) -> dict:
+        """Remove messages, threads and vector points whose parent no longer exists."""
+        threads_collection = get_collection("threads")
+        users_collection = get_collection("users")
+
+        thread_ids = {str(thread["_id"]) async for thread in threads_collection.find({}, {"_id": 1})}
+        orphan_threads = [thread_id for thread_id in await get_message_repository().thread_ids()
+                          if thread_id not in thread_ids]
+        orphan_messages = await self.delete_messages(orphan_threads) if orphan_threads else 0
+
+        user_ids = {str(user["_id"]) async for user in users_collection.find({}, {"_id": 1})}
+        orphan_owners = [owner for owner in await threads_collection.distinct("owner_user_id") if owner not in user_ids]
+        orphaned = await threads_collection.update_many(
+            {"owner_user_id": {"$in": orphan_owners}, "deleted_at": None},
+            {"$set": {"deleted_at": datetime.now(timezone.utc)}}
+        ) if orphan_owners else None
+
+        orphan_points = 0
+        tenants = {tenant_of({"tenant_id": tenant_id}) for tenant_id in await get_collection("documents").distinct("tenant_id")}
+        for tenant_id in tenants | {settings.default_tenant} | set(self.rag_engine.ready_tenants):
+            orphan_points += await self.reconcile_points(tenant_id)
+
+        return {
+            "messages": orphan_messages,
+            "threads": orphaned.modified_count if orphaned else 0,
+            "points": orphan_points
+        }
+
+    async def reconcile_points(self, tenant_id: str) -> int:
+        """Delete a tenant's points past the grace period that belong to no live document on two consecutive sweeps."""
+        live = set()
+        async for doc in get_collection("documents").find({**tenant_filter(tenant_id), "deleted_at": None},
+                                                           {"doc_id": 1, "filename": 1}):
+            # Older chunks carry the filename as their doc_id, or only as source_file
+            live.update((doc.get("doc_id"), doc.get("filename")))
+
+        orphans, offset = [], None
+        ingested_before = time.time() - settings.gc_orphan_grace
+        try:
+            while True:
+                page, offset = await asyncio.to_thread(
+                    self.rag_engine.scroll_point_doc_ids, tenant_id, offset, settings.gc_batch_size, ingested_before
+                )
+                # A point with neither doc_id nor source_file cannot be attributed; leave it
+                orphans.extend(point_id for point_id, doc_id in page if doc_id is not None and doc_id not in live)
+                if offset is None:
+                    break
+                await self.pause()
+        except Exception as e:
+            # No collection for this tenant yet
+            return 0
+
+        confirmed = [point_id for point_id in orphans if point_id in self.suspect_points.get(tenant_id, set())]
+        self.suspect_points[tenant_id] = set(orphans) - set(confirmed)
+        for start in range(0, len(confirmed), settings.gc_batch_size):
+            await asyncio.to_thread(self.rag_engine.delete_points, confirmed[start:start + settings.gc_batch_size], tenant_id)
+            await self.pause()
+        return len(confirmed)
+
+    async def run_once(self) -> dict:
+        """One collection pass over every kind of tombstone."""
+        return {
+            "users": await self.collect_users(),
+            "threads": await self.collect_threads(),
+            "documents": await self.collect_documents()
+        }
+
+    async def run_forever(self):
+        while True:
+            try:
+                await self.run_once()
+                if time.monotonic() - self.last_reconcile >= settings.gc_reconcile_interval:
+                    self.last_reconcile = time.monotonic()
+                    print(f"Reconciled orphans: {await self.reconcile()}")
+            except Exception as e:
+                print(f"Garbage collection error: {e}")
+            try:
+                await asyncio.wait_for(self.wake_event.wait(), settings.gc_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wake_event.clear()
+
+    def wake(self):
+        """Start the next pass now instead of at the end of gc_interval."""
+        self.wake_event.set()
+
+    def start(self):
+        self.task = asyncio.create_task(self.run_forever())
+
+    async def stop(self):
+        if self.task:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
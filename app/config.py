@@ -7,29 +7,119 @@ class Settings(BaseSettings):
     mongodb_dbname: str
 
     # Qdrant Configuration (replaces ChromaDB)
-    qdrant_url: str                           # e.g. "https://<cluster-id>.<region>.gcp.cloud.qdrant.io"
-    qdrant_api_key: str
+    qdrant_url: str                           # e.g. "https://<cluster-id>.<region>.gcp.cloud.qdrant.io", or ":memory:" for a local in-process store
+    qdrant_api_key: Optional[str] = None
     qdrant_collection_name: str = "documents"
-    embedding_dim: int = 1536                  # Dimension for "text-embedding-3-small"
+    embedding_dim: int = 1536                  # Collection vector size; text-embedding-3 models are asked for this many dimensions
+    qdrant_quantization: str = "none"          # "none", "scalar" (int8, ~4x smaller) or "binary" (1 bit/dim, ~32x smaller)
+    qdrant_quantization_always_ram: bool = True
+    qdrant_on_disk_vectors: bool = False       # Keep full-precision originals on disk (only read for rescoring)
+    qdrant_rescore: bool = True                # Re-rank quantized candidates with the original vectors
+    qdrant_oversampling: float = 2.0           # Candidates fetched per result before rescoring
+
+    # Tenancy
+    default_tenant: str = "default"            # Tenant of users, threads and documents created before tenants existed
+    qdrant_tenant_mode: str = "collection"     # "collection" (one collection per tenant) or "shard_key" (custom shards; needs a Qdrant cluster)
 
     # OpenAI Configuration
     openai_api_key: str
+    openai_base_url: Optional[str] = None      # Override to point at a compatible server (e.g. the benchmark stand-in)
     openai_chat_model: str = "gpt-4o-mini"
     embedding_model: str = "text-embedding-3-small"
 
+    # OpenAI Rate Limits (every call goes through app.scheduler)
+    openai_rpm_limit: int = 0                  # Requests per minute for this process; 0 = only the server's headers count
+    openai_tpm_limit: int = 0                  # Tokens per minute for this process; 0 = only the server's headers count
+    openai_interactive_reserve: float = 0.2    # Share of the local budget background ingestion leaves for chat
+    openai_max_retries: int = 5                # Retries of 429s, timeouts, connection errors and 5xx
+    openai_backoff_base: float = 0.5           # Seconds; the backoff ceiling doubles per attempt
+    openai_backoff_max: float = 30.0
+
+    # Timeouts, Circuit Breakers and Load Shedding
+    openai_timeout: float = 30.0               # Seconds to wait for each response read (a streamed answer may take longer overall)
+    openai_connect_timeout: float = 5.0
+    qdrant_timeout: int = 5                    # Seconds per Qdrant request
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: int = 30000
+    breaker_failure_threshold: int = 5         # Consecutive failures that open a dependency's breaker
+    breaker_reset_timeout: float = 30.0        # Seconds an open breaker fails fast before letting one trial call through
+    chat_max_queue_depth: int = 64             # Chat turns in progress before new ones get 503; 0 = no limit
+    shed_retry_after: int = 2                  # Retry-After seconds sent with a shed request
+
+    # Rate Limiting (token bucket per user and route, see app.ratelimit)
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"         # "memory" (per worker) or "redis" (shared by all workers; needs the redis package)
+    redis_url: str = "redis://localhost:6379/0"
+    rate_limit_chat: str = "20/minute"         # Chat turns per user, HTTP and WebSocket together
+    rate_limit_upload: str = "30/minute"       # Document upload requests per admin
+
+    # Connection Pooling
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 5               # Connections kept open so requests skip the handshake
+    mongo_max_idle_time_ms: int = 300000
+    mongo_compressors: str = "zstd,snappy,zlib"  # Only codecs whose package is installed are offered
+    openai_max_connections: int = 100
+    openai_max_keepalive_connections: int = 20
+    openai_keepalive_expiry: float = 120.0
+    openai_http2: bool = True                  # Negotiated over TLS when the h2 package is installed
+    qdrant_prefer_grpc: bool = False
+    qdrant_grpc_port: int = 6334
+    qdrant_max_connections: int = 50
+
     # JWT Configuration
     jwt_secret: str
     jwt_algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    password_hash_workers: int = 0             # Processes hashing passwords for bulk imports; 0 = one per CPU
+    user_import_max_rows: int = 10000
 
     # RAG Configuration
     retrieval_top_k: int = 5
     retrieval_score_min: float = 0.7
+    fast_path_enabled: bool = True             # Answer small talk and curated FAQ questions without retrieval or the LLM
+    faq_file: Optional[str] = None             # JSON list of {"questions": [...], "answer": "..."}
+    faq_match_threshold: float = 0.9           # Cosine similarity needed to answer from an admin FAQ entry
+    faq_refresh_interval: float = 30.0         # Seconds between checks for FAQ edits made by other workers
+    coalesce_requests: bool = True             # Concurrent identical questions share one embedding, search and answer
+
+    # Ingestion
+    embed_batch_size: int = 64                 # Chunks embedded per OpenAI request
+    ingest_concurrency: int = 4                # Bulk-upload items parsed and chunked at the same time
+    ingest_embed_concurrency: int = 4          # Embedding requests in flight across a bulk upload; tune to the rate limit
+    ingest_max_member_bytes: int = 50 * 1024 * 1024  # Larger archive members are rejected unread
+
+    # WebSocket Chat
+    ws_auth_timeout: float = 10.0              # Seconds a new socket has to send its auth frame
+    ws_max_concurrent_turns: int = 4           # Answers one socket may have streaming at once
+
+    # Message Storage
+    message_storage: str = "documents"         # "documents" (one per message) or "buckets"; move data with app.migrate_messages
+    message_bucket_size: int = 100             # Messages per bucket document in the "buckets" layout
+
+    # Garbage Collection (tombstoned users, threads and documents)
+    gc_enabled: bool = True
+    gc_interval: float = 30.0                  # Seconds between passes; deletes also start a pass right away
+    gc_batch_size: int = 500                   # Records or points removed per batch
+    gc_batch_pause: float = 0.05               # Seconds slept between batches to cap load on MongoDB and Qdrant
+    gc_reconcile_interval: float = 3600.0      # Seconds between orphan sweeps across MongoDB and Qdrant
+    gc_orphan_grace: float = 86400.0           # Seconds a vector point is never swept as an orphan (covers long bulk uploads)
 
     # Server Configuration
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = True
+    env: str = "development"                   # "production" selects the multi-worker launch mode in run.py and the built frontend
+    web_workers: int = 0                       # 0 = one worker per available CPU
+    keep_alive_timeout: int = 75               # Longer than typical load balancer idle timeouts
+    backlog: int = 2048
+    limit_concurrency: Optional[int] = None
+    graceful_shutdown_timeout: int = 60        # Let in-flight LLM calls finish before workers exit
+    warm_up_on_boot: bool = True
+
+    # Response Compression
+    compression_min_size: int = 1024           # Bytes; smaller bodies are sent as-is
+    gzip_level: int = 6
+    brotli_quality: int = 4                    # Used when the brotli package is installed
 
     class Config:
         env_file = ".env"
@@ -1,16 +1,97 @@
+import importlib.util
+from collections import defaultdict
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
 from app.config import settings
 
+COMPRESSOR_PACKAGES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Count connection pool events per server so the pool can be sized."""
+
+    def __init__(self):
+        self.counters = defaultdict(lambda: defaultdict(int))
+
+    def _count(self, event, name: str):
+        self.counters[f"{event.address[0]}:{event.address[1]}"][name] += 1
+
+    def pool_created(self, event):
+        self._count(event, "pools_created")
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._count(event, "pools_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._count(event, "connections_created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._count(event, "connections_closed")
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count(event, "checkouts_failed")
+
+    def connection_checked_out(self, event):
+        self._count(event, "checkouts")
+
+    def connection_checked_in(self, event):
+        self._count(event, "checkins")
+
+    def snapshot(self) -> dict:
+        return {
+            address: {
+                **counters,
+                "open": counters["connections_created"] - counters["connections_closed"],
+                "in_use": counters["checkouts"] - counters["checkins"],
+            }
+            for address, counters in self.counters.items()
+        }
+
 
 class Database:
     client: AsyncIOMotorClient = None
     database = None
+    pool_stats = PoolStatsListener()
+    transactions: bool = None
+
+
+def mongo_client_options() -> dict:
+    """Pool sizing, timeouts and wire compression options for the Motor client."""
+    compressors = [
+        name.strip() for name in settings.mongo_compressors.split(",")
+        if name.strip() in COMPRESSOR_PACKAGES
+        and (COMPRESSOR_PACKAGES[name.strip()] is None or importlib.util.find_spec(COMPRESSOR_PACKAGES[name.strip()]))
+    ]
+    options = {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+        "socketTimeoutMS": settings.mongo_socket_timeout_ms,
+        "event_listeners": [Database.pool_stats],
+    }
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+    return options
 
 
 async def connect_to_mongo():
     """Create database connection."""
-    Database.client = AsyncIOMotorClient(settings.mongodb_uri)
+    Database.client = AsyncIOMotorClient(settings.mongodb_uri, **mongo_client_options())
     Database.database = Database.client[settings.mongodb_dbname]
+    Database.transactions = None
 
 
 async def close_mongo_connection():
@@ -19,6 +100,36 @@ async def close_mongo_connection():
         Database.client.close()
 
 
+async def ensure_indexes():
+    """Create the indexes the list and revalidation queries rely on."""
+    from app.messages import get_message_repository
+    database = Database.database
+    await get_message_repository().ensure_indexes()
+    await database["threads"].create_index([("owner_user_id", 1), ("updated_at", -1)])
+    await database["threads"].create_index([("tenant_id", 1), ("updated_at", -1)])
+    await database["users"].create_index([("tenant_id", 1)])
+    await database["documents"].create_index([("tenant_id", 1)])
+    await database["faqs"].create_index([("tenant_id", 1)])
+    # Sparse: only tombstoned rows are indexed, so the collector's scans stay small
+    for name in ("users", "threads", "documents"):
+        await database[name].create_index([("deleted_at", 1)], sparse=True)
+    # Signup and bulk import check for an existing email first; this index settles their races.
+    # Last, so existing duplicate accounts only block this index
+    await database["users"].create_index([("email", 1)], unique=True)
+
+
+async def transactions_supported() -> bool:
+    """Whether the deployment is a replica set or sharded cluster (standalone servers have no transactions)."""
+    if Database.transactions is None:
+        try:
+            hello = await Database.database.command("hello")
+            Database.transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            print(f"Could not detect transaction support: {e}")
+            Database.transactions = False
+    return Database.transactions
+
+
 def get_database():
     """Get database instance."""
     return Database.database
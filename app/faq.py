@@ -0,0 +1,136 @@
+"""
+Admin-managed FAQ.
+
+Each entry holds question variants, a canonical answer and linked documents,
+which are returned as the answer's retrieval refs while they are not deleted.
+Question embeddings are computed when an entry is saved and stored with it;
+every tenant's embeddings are stacked into one normalized matrix at startup,
+so a query is matched with a single matrix-vector product. Saving bumps a
+per-tenant revision that other workers pick up within faq_refresh_interval.
+"""
+
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.config import settings
+from app.database import get_collection
+from app.models import RetrievalRef
+from app.tenants import tenant_filter, tenant_of
+
+
+def normalize(text: str) -> str:
+    """Lowercase, drop punctuation and collapse whitespace so phrasing variants compare equal."""
+    text = re.sub(r"[^\w\s]", "", text.lower().replace("'", ""))
+    return " ".join(text.split())
+
+
+class TenantFAQ:
+    """One tenant's entries, their normalized question lookup and embedding matrix."""
+
+    def __init__(self, entries: List[dict], filenames: Optional[Dict[str, str]] = None):
+        filenames = filenames or {}
+        self.entries = [
+            {**entry, "retrieval_refs": [
+                RetrievalRef(doc_id=doc_id, filename=filenames[doc_id], page=1, chunk_id="", score=1.0)
+                for doc_id in entry.get("doc_ids") or [] if doc_id in filenames
+            ]}
+            for entry in entries
+        ]
+        self.exact = {normalize(question): entry for entry in self.entries for question in entry["questions"]}
+        rows, owners = [], []
+        for position, entry in enumerate(self.entries):
+            # Vectors from another embedding model are not comparable; those entries match exactly only
+            if entry.get("embedding_model") != settings.embedding_model:
+                continue
+            for vector in entry.get("embeddings") or []:
+                if len(vector) == settings.embedding_dim:
+                    rows.append(vector)
+                    owners.append(position)
+        self.matrix = np.asarray(rows, dtype=np.float32).reshape(len(rows), settings.embedding_dim)
+        norms = np.linalg.norm(self.matrix, axis=1, keepdims=True)
+        self.matrix /= np.where(norms == 0, 1, norms)
+        self.owners = np.asarray(owners, dtype=np.int64)
+
+    def match(self, embedding: List[float]) -> Optional[Tuple[dict, float]]:
+        """Best entry for ``embedding`` by cosine similarity over every question variant."""
+        if not len(self.owners):
+            return None
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = self.matrix @ (query / (np.linalg.norm(query) or 1))
+        best = int(np.argmax(scores))
+        return self.entries[self.owners[best]], float(scores[best])
+
+
+async def linked_filenames(tenant_id: str, entries: List[dict]) -> Dict[str, str]:
+    """Filename of each live document of the tenant that ``entries`` link to, by doc_id."""
+    doc_ids = sorted({doc_id for entry in entries for doc_id in entry.get("doc_ids") or []})
+    if not doc_ids:
+        return {}
+    cursor = get_collection("documents").find({**tenant_filter(tenant_id), "doc_id": {"$in": doc_ids}, "deleted_at": None})
+    return {doc["doc_id"]: doc.get("filename", "Unknown") async for doc in cursor}
+
+
+class FAQIndex:
+    """In-memory FAQ for every tenant, reloaded when a tenant's revision changes."""
+
+    def __init__(self):
+        self.tenants: Dict[str, TenantFAQ] = {}
+        self.revisions: Dict[str, int] = {}
+        self.checked_at: Dict[str, float] = {}
+
+    def set_entries(self, tenant_id: str, entries: List[dict], revision: int = 0,
+                    filenames: Optional[Dict[str, str]] = None):
+        self.tenants[tenant_id] = TenantFAQ(entries, filenames)
+        self.revisions[tenant_id] = revision
+        self.checked_at[tenant_id] = time.monotonic()
+
+    def lookup(self, text: str, tenant_id: str) -> Optional[dict]:
+        """Entry with a question variant equal to the normalized ``text``."""
+        tenant = self.tenants.get(tenant_id)
+        return tenant.exact.get(text) if tenant else None
+
+    def has_embeddings(self, tenant_id: str) -> bool:
+        tenant = self.tenants.get(tenant_id)
+        return tenant is not None and len(tenant.owners) > 0
+
+    def match(self, embedding: List[float], tenant_id: str) -> Optional[dict]:
+        """Entry whose closest question variant clears faq_match_threshold."""
+        tenant = self.tenants.get(tenant_id)
+        best = tenant.match(embedding) if tenant else None
+        if best and best[1] >= settings.faq_match_threshold:
+            return best[0]
+        return None
+
+    async def load(self):
+        """Load every tenant's entries from MongoDB."""
+        grouped: Dict[str, List[dict]] = {}
+        async for entry in get_collection("faqs").find({}):
+            grouped.setdefault(tenant_of(entry), []).append(entry)
+        revisions = {row["_id"]: row.get("revision", 0) async for row in get_collection("faq_revisions").find({})}
+        for tenant_id in set(grouped) | set(self.tenants):
+            entries = grouped.get(tenant_id, [])
+            self.set_entries(tenant_id, entries, revisions.get(tenant_id, 0), await linked_filenames(tenant_id, entries))
+
+    async def refresh(self, tenant_id: str):
+        """Reload one tenant's entries from MongoDB."""
+        revision = await get_collection("faq_revisions").find_one({"_id": tenant_id})
+        entries = await get_collection("faqs").find(tenant_filter(tenant_id)).to_list(None)
+        self.set_entries(tenant_id, entries, (revision or {}).get("revision", 0), await linked_filenames(tenant_id, entries))
+
+    async def maybe_refresh(self, tenant_id: str):
+        """Reload a tenant whose revision moved, checking at most once per faq_refresh_interval."""
+        if time.monotonic() - self.checked_at.get(tenant_id, float("-inf")) < settings.faq_refresh_interval:
+            return
+        self.checked_at[tenant_id] = time.monotonic()
+        try:
+            revision = await get_collection("faq_revisions").find_one({"_id": tenant_id})
+            if (revision or {}).get("revision", 0) != self.revisions.get(tenant_id, 0):
+                await self.refresh(tenant_id)
+        except Exception as e:
+            print(f"Error refreshing FAQ for tenant {tenant_id}: {e}")
+
+
+async def bump_revision(tenant_id: str):
+    """Record a change to ``tenant_id``'s FAQ so every worker reloads it."""
+    await get_collection("faq_revisions").update_one({"_id": tenant_id}, {"$inc": {"revision": 1}}, upsert=True)
@@ -0,0 +1,120 @@
+"""
+Bulk document ingestion.
+
+Uploaded files and the members of uploaded zip archives are fed one at a
+time through a shared parse -> chunk -> embed -> upsert pipeline. Up to
+ingest_concurrency items are parsed at once, each archive member is copied
+to a temporary file only when a slot is free (the archive is never fully
+extracted), and embedding requests from every item share
+ingest_embed_concurrency slots, so the embedding rate is the only limit on
+throughput.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import Callable, Iterator, List, Optional, Tuple
+from fastapi import UploadFile
+from app.config import settings
+from app.rag import RAGEngine
+
+DOCUMENT_SUFFIXES = (".pdf", ".docx")
+ARCHIVE_SUFFIXES = (".zip",)
+
+
+def iter_upload_members(files: List[UploadFile]) -> Iterator[Tuple[str, Optional[Callable], Optional[str]]]:
+    """Yield (filename, opener, error) for every uploaded file and archive member.
+
+    ``opener`` returns a readable binary stream; it is None when the item is
+    skipped, with the reason in ``error``.
+    """
+    for upload in files:
+        name = upload.filename or "upload"
+        if name.lower().endswith(ARCHIVE_SUFFIXES):
+            try:
+                archive = zipfile.ZipFile(upload.file)
+            except zipfile.BadZipFile:
+                yield name, None, "Not a valid zip archive"
+                continue
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                member = info.filename
+                if not member.lower().endswith(DOCUMENT_SUFFIXES):
+                    yield member, None, "Only PDF (.pdf) and Word (.docx) files are allowed"
+                elif info.file_size > settings.ingest_max_member_bytes:
+                    yield member, None, f"File is larger than {settings.ingest_max_member_bytes} bytes"
+                else:
+                    yield member, (lambda archive=archive, info=info: archive.open(info)), None
+        elif name.lower().endswith(DOCUMENT_SUFFIXES):
+            yield name, (lambda upload=upload: upload.file), None
+        else:
+            yield name, None, "Only PDF (.pdf), Word (.docx) and zip files are allowed"
+
+
+def spool_member(opener: Callable, filename: str) -> Tuple[str, int]:
+    """Copy one item to a temporary file in fixed-size blocks; returns (path, size)."""
+    suffix = os.path.splitext(filename)[1].lower()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        shutil.copyfileobj(opener(), temp_file, 1024 * 1024)
+        return temp_file.name, temp_file.tell()
+
+
+class IngestPipeline:
+    """Parse, chunk, embed and upsert documents with bounded, shared concurrency."""
+
+    def __init__(self, rag_engine: RAGEngine, tags: Optional[List[str]] = None, tenant_id: Optional[str] = None):
+        self.rag_engine = rag_engine
+        self.tags = tags or []
+        self.tenant_id = tenant_id
+        self.item_slots = asyncio.Semaphore(settings.ingest_concurrency)
+        self.embed_slots = asyncio.Semaphore(settings.ingest_embed_concurrency)
+
+    async def embed(self, chunks: List[dict]) -> List[dict]:
+        """Embed a document's chunks batch by batch, all batches in flight under the shared limit."""
+        async def embed_batch(batch):
+            async with self.embed_slots:
+                return await asyncio.to_thread(self.rag_engine.embed_chunks, batch)
+
+        size = settings.embed_batch_size
+        await asyncio.gather(*(embed_batch(chunks[start:start + size]) for start in range(0, len(chunks), size)))
+        return chunks
+
+    async def process(self, filename: str, path: str, size_bytes: int) -> dict:
+        """Run one spooled item through the pipeline; never raises, failures are reported in the result."""
+        result = {"filename": filename, "status": "error", "size_bytes": size_bytes}
+        try:
+            document = await asyncio.to_thread(self.rag_engine.parse_document, path, filename, self.tags)
+            chunks = await asyncio.to_thread(self.rag_engine.preprocess_document, document)
+            await self.embed(chunks)
+            await asyncio.to_thread(self.rag_engine.add_documents_to_qdrant, chunks, self.tenant_id)
+            result.update(status="ok", doc_id=document["doc_id"], page_count=document["page_count"], chunk_count=len(chunks))
+        except Exception as e:
+            result["detail"] = str(e)
+        finally:
+            self.item_slots.release()
+            try:
+                os.unlink(path)
+            except Exception as cleanup_error:
+                pass
+        return result
+
+    async def run(self, files: List[UploadFile]) -> List[dict]:
+        """Ingest every uploaded file and archive member; results keep upload order."""
+        results = []
+        for filename, opener, error in iter_upload_members(files):
+            if opener is None:
+                results.append({"filename": filename, "status": "skipped", "detail": error, "size_bytes": 0})
+                continue
+            # Hold a slot before spooling so only in-progress items occupy temporary files
+            await self.item_slots.acquire()
+            try:
+                path, size_bytes = await asyncio.to_thread(spool_member, opener, filename)
+            except Exception as e:
+                self.item_slots.release()
+                results.append({"filename": filename, "status": "error", "detail": f"Could not read file: {e}", "size_bytes": 0})
+                continue
+            results.append(asyncio.create_task(self.process(filename, path, size_bytes)))
+        return [await result if isinstance(result, asyncio.Task) else result for result in results]
@@ -1,16 +1,41 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from app.database import connect_to_mongo, close_mongo_connection
+from fastapi.responses import JSONResponse
+from app.assets import IndexPage, PrecompressedStaticFiles, index_html_path
+from app.database import connect_to_mongo, close_mongo_connection, ensure_indexes
+from app.resilience import CircuitOpenError, service_unavailable
+from app.responses import CompressionMiddleware
+from app.services import init_services, close_services, check_readiness, warm_up
 from app.routers import auth, admin, threads, chat
 from app.config import settings
 import os
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect to MongoDB and build service clients once uvicorn is listening."""
+    await connect_to_mongo()
+    try:
+        await asyncio.wait_for(ensure_indexes(), timeout=10)
+    except Exception as e:
+        # Keep serving; /ready reports MongoDB until it recovers
+        print(f"Error creating MongoDB indexes: {e}")
+    await init_services()
+    if settings.warm_up_on_boot:
+        await warm_up()
+    yield
+    await close_services()
+    await close_mongo_connection()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="RAG Chatbot API",
     description="A role-based RAG chatbot platform with FastAPI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -22,6 +47,21 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (brotli when installed, otherwise gzip)
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.compression_min_size,
+    gzip_level=settings.gzip_level,
+    brotli_quality=settings.brotli_quality
+)
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    """A dependency's breaker is open: 503 with a Retry-After matching its reset."""
+    error = service_unavailable(str(exc), exc.retry_after)
+    return JSONResponse(status_code=error.status_code, content={"detail": error.detail}, headers=error.headers)
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(admin.router)
@@ -29,18 +69,6 @@ app.include_router(threads.router)
 app.include_router(chat.router)
 
 
-@app.on_event("startup")
-async def startup_event():
-    """Initialize database connection on startup."""
-    await connect_to_mongo()
-
-
-@app.on_event("shutdown")
-async def shutdown_event():
-    """Close database connection on shutdown."""
-    await close_mongo_connection()
-
-
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
@@ -51,17 +79,37 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: MongoDB, the vector store and the LLM client must all respond."""
+    checks = await check_readiness()
+    ready = all(result == "ok" for result in checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks}
+    )
+
+
 # Create uploads directory if it doesn't exist
 os.makedirs("uploads", exist_ok=True)
 
-# Mount static files for frontend
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Mount static files for frontend (fingerprinted, precompressed build in static/dist when present)
+app.mount("/static", PrecompressedStaticFiles(directory="static"), name="static")
+
+def create_index_page() -> IndexPage:
+    """index.html held in memory: the built one in production, the watched source otherwise."""
+    production = settings.env.lower() == "production"
+    return IndexPage(index_html_path(production), watch=not production)
+
+
+# index.html is served from memory and revalidated by ETag
+index_page = create_index_page()
+
 
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Root endpoint - serve the main application."""
-    from fastapi.responses import FileResponse
-    return FileResponse("static/index.html")
+    return index_page.response(request)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,320 @@
+"""
+Message storage.
+
+Routers, the admin history view and the garbage collector read and write
+messages only through a MessageRepository, so the storage layout is a
+deployment choice (MESSAGE_STORAGE):
+
+- "documents": one document per message in ``messages`` (the original layout)
+- "buckets": consecutive messages of a thread grouped into documents of up
+  to message_bucket_size in ``message_buckets``, each with its message count
+  and time/id range. A history page reads one or two documents instead of
+  one per message, and the indexes hold one (thread_id, seq) entry per bucket
+  plus one multikey entry per message id instead of three per message.
+
+Message ids are ObjectIds in both layouts, so ``python -m app.migrate_messages``
+can move data either way without changing the ids clients hold.
+
+Each thread document also carries a summary of its messages (message_count,
+last_message_preview, last_activity_at), updated by the same thread write
+that bumps updated_at, so counts and thread lists never touch the messages.
+"""
+
+import asyncio
+from datetime import datetime, timezone
+from typing import List, Optional
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, PyMongoError
+from app.config import settings
+from app.database import Database, get_collection, transactions_supported
+
+STORAGE_LAYOUTS = ("documents", "buckets")
+PREVIEW_CHARS = 120
+
+
+class DocumentMessageRepository:
+    """One MongoDB document per message."""
+
+    @property
+    def collection(self):
+        return get_collection("messages")
+
+    async def add(self, thread_id: str, messages: List[dict], session=None) -> List[dict]:
+        """Append ``messages`` (role, content, created_at, retrieval_refs) to a thread."""
+        docs = [{"_id": ObjectId(), "thread_id": thread_id, **message} for message in messages]
+        await self.collection.insert_many(docs, session=session)
+        return docs
+
+    async def count(self, thread_id: str) -> int:
+        return await self.collection.count_documents({"thread_id": thread_id})
+
+    async def page(self, thread_id: str, skip: int = 0, limit: int = 50) -> List[dict]:
+        """Messages in creation order, ``limit`` of them after the first ``skip``."""
+        cursor = self.collection.find({"thread_id": thread_id}).sort("created_at", 1).skip(skip).limit(limit)
+        return await cursor.to_list(limit or None)
+
+    async def since(self, thread_id: str, message_id: Optional[str], limit: int = 100) -> List[dict]:
+        """Messages newer than ``message_id`` (from the start when None)."""
+        # ObjectIds increase with insertion, so the (thread_id, _id) index serves this as a range scan
+        query = {"thread_id": thread_id}
+        if message_id:
+            query["_id"] = {"$gt": ObjectId(message_id)}
+        return await self.collection.find(query).sort("_id", 1).limit(limit).to_list(limit or None)
+
+    async def latest(self, thread_id: str) -> Optional[dict]:
+        """The thread's newest message."""
+        latest = await self.collection.find({"thread_id": thread_id}).sort("created_at", -1).limit(1).to_list(1)
+        return latest[0] if latest else None
+
+    async def get(self, message_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"_id": ObjectId(message_id)})
+
+    async def delete(self, message_id: str) -> bool:
+        result = await self.collection.delete_one({"_id": ObjectId(message_id)})
+        return result.deleted_count > 0
+
+    async def delete_batch(self, thread_ids: List[str], batch_size: int) -> int:
+        """Delete up to ``batch_size`` messages of ``thread_ids``; returns how many went."""
+        batch = await self.collection.find({"thread_id": {"$in": thread_ids}}, {"_id": 1}).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return 0
+        result = await self.collection.delete_many({"_id": {"$in": [message["_id"] for message in batch]}})
+        return result.deleted_count
+
+    async def delete_ids(self, thread_id: str, message_ids: List[ObjectId]) -> int:
+        """Delete exactly ``message_ids`` of a thread; returns how many went."""
+        result = await self.collection.delete_many({"thread_id": thread_id, "_id": {"$in": message_ids}})
+        return result.deleted_count
+
+    async def thread_ids(self) -> List[str]:
+        """Every thread id that has stored messages."""
+        return await self.collection.distinct("thread_id")
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("thread_id", 1), ("created_at", 1)])
+        await self.collection.create_index([("thread_id", 1), ("_id", 1)])
+
+
+class BucketMessageRepository:
+    """Consecutive messages of a thread stored together in fixed-size bucket documents."""
+
+    HEADER = {"seq": 1, "count": 1}
+
+    def __init__(self, bucket_size: Optional[int] = None):
+        self.bucket_size = bucket_size or settings.message_bucket_size
+
+    @property
+    def collection(self):
+        return get_collection("message_buckets")
+
+    @staticmethod
+    def unpack(bucket: dict) -> List[dict]:
+        return [{**message, "thread_id": bucket["thread_id"]} for message in bucket.get("messages", [])]
+
+    async def headers(self, thread_id: str) -> List[dict]:
+        """Bucket seq and count for a thread, without the messages."""
+        return await self.collection.find({"thread_id": thread_id}, self.HEADER).sort("seq", 1).to_list(None)
+
+    async def add(self, thread_id: str, messages: List[dict], session=None) -> List[dict]:
+        """Append ``messages`` to the thread's newest bucket, opening a new bucket when it is full."""
+        docs = [{"_id": ObjectId(), **message} for message in messages]
+        update = {
+            "$push": {"messages": {"$each": docs}},
+            "$inc": {"count": len(docs)},
+            "$min": {"first_at": docs[0]["created_at"]},
+            "$max": {"last_at": docs[-1]["created_at"], "last_id": docs[-1]["_id"]}
+        }
+        while True:
+            latest = await self.collection.find(
+                {"thread_id": thread_id}, self.HEADER, session=session
+            ).sort("seq", -1).limit(1).to_list(1)
+            if latest:
+                # Only fill the bucket if every new message fits; concurrent writers race on count
+                result = await self.collection.update_one(
+                    {"_id": latest[0]["_id"], "count": {"$lte": self.bucket_size - len(docs)}}, update, session=session
+                )
+                if result.modified_count:
+                    return [{**doc, "thread_id": thread_id} for doc in docs]
+            seq = latest[0]["seq"] + 1 if latest else 0
+            try:
+                await self.collection.insert_one({
+                    "thread_id": thread_id, "seq": seq, "count": len(docs), "messages": docs,
+                    "first_at": docs[0]["created_at"], "last_at": docs[-1]["created_at"], "last_id": docs[-1]["_id"]
+                }, session=session)
+                return [{**doc, "thread_id": thread_id} for doc in docs]
+            except DuplicateKeyError:
+                # Another writer opened bucket ``seq`` first; append to it instead
+                continue
+
+    async def count(self, thread_id: str) -> int:
+        return sum(header["count"] for header in await self.headers(thread_id))
+
+    async def page(self, thread_id: str, skip: int = 0, limit: int = 50) -> List[dict]:
+        """Messages in creation order; only the buckets overlapping the page are read."""
+        wanted, start, position = [], None, 0
+        for header in await self.headers(thread_id):
+            if position + header["count"] > skip and (not limit or position < skip + limit):
+                wanted.append(header["_id"])
+                if start is None:
+                    start = skip - position
+            position += header["count"]
+        if not wanted:
+            return []
+        buckets = await self.collection.find({"_id": {"$in": wanted}}).sort("seq", 1).to_list(None)
+        messages = [message for bucket in buckets for message in self.unpack(bucket)]
+        return messages[start:start + limit] if limit else messages[start:]
+
+    async def since(self, thread_id: str, message_id: Optional[str], limit: int = 100) -> List[dict]:
+        """Messages newer than ``message_id`` (from the start when None)."""
+        query = {"thread_id": thread_id}
+        after = ObjectId(message_id) if message_id else None
+        if after:
+            query["last_id"] = {"$gt": after}
+        messages = []
+        async for bucket in self.collection.find(query).sort("seq", 1):
+            messages.extend(message for message in self.unpack(bucket) if not after or message["_id"] > after)
+            if limit and len(messages) >= limit:
+                break
+        return messages[:limit] if limit else messages
+
+    async def latest(self, thread_id: str) -> Optional[dict]:
+        """The thread's newest message."""
+        latest = await self.collection.find(
+            {"thread_id": thread_id, "count": {"$gt": 0}}
+        ).sort("seq", -1).limit(1).to_list(1)
+        return self.unpack(latest[0])[-1] if latest else None
+
+    async def get(self, message_id: str) -> Optional[dict]:
+        oid = ObjectId(message_id)
+        bucket = await self.collection.find_one({"messages._id": oid})
+        if not bucket:
+            return None
+        return next((message for message in self.unpack(bucket) if message["_id"] == oid), None)
+
+    async def delete(self, message_id: str) -> bool:
+        oid = ObjectId(message_id)
+        result = await self.collection.update_one(
+            {"messages._id": oid},
+            {"$pull": {"messages": {"_id": oid}}, "$inc": {"count": -1}}
+        )
+        return result.modified_count > 0
+
+    async def delete_batch(self, thread_ids: List[str], batch_size: int) -> int:
+        """Delete buckets of ``thread_ids`` holding up to about ``batch_size`` messages."""
+        buckets = await self.collection.find(
+            {"thread_id": {"$in": thread_ids}}, {"count": 1}
+        ).limit(max(1, batch_size // self.bucket_size)).to_list(None)
+        if not buckets:
+            return 0
+        await self.collection.delete_many({"_id": {"$in": [bucket["_id"] for bucket in buckets]}})
+        return sum(bucket["count"] for bucket in buckets)
+
+    async def delete_ids(self, thread_id: str, message_ids: List[ObjectId]) -> int:
+        """Delete exactly ``message_ids`` of a thread, dropping buckets left empty; returns how many went."""
+        wanted, deleted = set(message_ids), 0
+        async for bucket in self.collection.find({"thread_id": thread_id, "messages._id": {"$in": message_ids}}):
+            removed = sum(1 for message in bucket["messages"] if message["_id"] in wanted)
+            result = await self.collection.update_one(
+                {"_id": bucket["_id"]},
+                {"$pull": {"messages": {"_id": {"$in": message_ids}}}, "$inc": {"count": -removed}}
+            )
+            deleted += removed if result.modified_count else 0
+        # A bucket a writer appended to meanwhile no longer has count 0 and stays
+        await self.collection.delete_many({"thread_id": thread_id, "count": 0})
+        return deleted
+
+    async def thread_ids(self) -> List[str]:
+        return await self.collection.distinct("thread_id")
+
+    async def ensure_indexes(self):
+        await self.collection.create_index([("thread_id", 1), ("seq", 1)], unique=True)
+        await self.collection.create_index([("messages._id", 1)])
+
+
+def get_message_repository():
+    """Repository for the configured MESSAGE_STORAGE layout."""
+    if settings.message_storage not in STORAGE_LAYOUTS:
+        raise ValueError(f"message_storage must be one of {', '.join(STORAGE_LAYOUTS)}, got {settings.message_storage!r}")
+    if settings.message_storage == "buckets":
+        return BucketMessageRepository()
+    return DocumentMessageRepository()
+
+
+def preview(message: Optional[dict]) -> Optional[str]:
+    return message["content"][:PREVIEW_CHARS] if message else None
+
+
+def summary_update(messages: List[dict]) -> dict:
+    """Thread update recording ``messages`` as the newest in the thread."""
+    return {
+        "$inc": {"message_count": len(messages)},
+        "$set": {
+            "last_message_preview": preview(messages[-1]),
+            "last_activity_at": messages[-1]["created_at"],
+            "updated_at": datetime.now(timezone.utc)
+        }
+    }
+
+
+async def append_messages(thread_id: str, messages: List[dict], written: List[dict] = ()) -> List[dict]:
+    """Store ``messages`` and update the thread's summary.
+
+    ``written`` are messages of the same turn already stored without touching
+    the thread; they are counted in the same summary update. Both writes go
+    in one transaction when the deployment supports it, otherwise they are
+    issued together.
+    """
+    message_repository = get_message_repository()
+    threads_collection = get_collection("threads")
+    update = summary_update(list(written) + messages)
+    if await transactions_supported():
+        try:
+            async with await Database.client.start_session() as session:
+                async with session.start_transaction():
+                    stored = await message_repository.add(thread_id, messages, session=session)
+                    await threads_collection.update_one({"_id": ObjectId(thread_id)}, update, session=session)
+                    return stored
+        except PyMongoError as e:
+            # The transaction was rolled back, so writing without one cannot duplicate anything
+            print(f"Message transaction failed, writing without one: {e}")
+    stored, _ = await asyncio.gather(
+        message_repository.add(thread_id, messages),
+        threads_collection.update_one({"_id": ObjectId(thread_id)}, update)
+    )
+    return stored
+
+
+async def remove_message(message: dict) -> bool:
+    """Delete ``message`` and take it out of the thread's summary."""
+    message_repository = get_message_repository()
+    if not await message_repository.delete(str(message["_id"])):
+        return False
+    latest = await message_repository.latest(message["thread_id"])
+    await get_collection("threads").update_one(
+        {"_id": ObjectId(message["thread_id"])},
+        {
+            "$inc": {"message_count": -1},
+            "$set": {
+                "last_message_preview": preview(latest),
+                "last_activity_at": latest["created_at"] if latest else None,
+                "updated_at": datetime.now(timezone.utc)
+            }
+        }
+    )
+    return True
+
+
+async def ensure_summary(thread: dict) -> dict:
+    """Fill in the summary of a thread written before threads carried one."""
+    if "message_count" in thread:
+        return thread
+    thread_id = str(thread["_id"])
+    message_repository = get_message_repository()
+    latest = await message_repository.latest(thread_id)
+    summary = {
+        "message_count": await message_repository.count(thread_id),
+        "last_message_preview": preview(latest),
+        "last_activity_at": latest["created_at"] if latest else None
+    }
+    await get_collection("threads").update_one({"_id": thread["_id"], "message_count": None}, {"$set": summary})
+    return {**thread, **summary}
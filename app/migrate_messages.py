@@ -0,0 +1,72 @@
+"""
+Move stored messages between the MESSAGE_STORAGE layouts.
+
+    python -m app.migrate_messages --to buckets
+    python -m app.migrate_messages --to documents
+
+Threads are migrated one at a time: messages missing from the target are
+copied in order with their ids, then exactly the source rows that were read
+are deleted; messages written meanwhile are picked up by the next round.
+A run that stops part way can simply be repeated. Switch MESSAGE_STORAGE
+after the run; messages written by workers still on the old layout in the
+meantime are picked up by running the tool again.
+"""
+
+import argparse
+import asyncio
+from app.config import settings
+from app.database import close_mongo_connection, connect_to_mongo
+from app.messages import STORAGE_LAYOUTS, BucketMessageRepository, DocumentMessageRepository
+
+
+def repository_for(layout: str):
+    return BucketMessageRepository() if layout == "buckets" else DocumentMessageRepository()
+
+
+async def migrate_thread(thread_id: str, source, target, chunk_size: int) -> int:
+    """Copy one thread's messages from ``source`` to ``target``, then remove them from ``source``.
+
+    Only rows known to be in the target are deleted, so a message written to
+    the source during the copy is never lost.
+    """
+    copied = 0
+    while messages := await source.page(thread_id, 0, 0):
+        present = {message["_id"] for message in await target.page(thread_id, 0, 0)}
+        missing = [
+            {key: value for key, value in message.items() if key != "thread_id"}
+            for message in messages if message["_id"] not in present
+        ]
+        for start in range(0, len(missing), chunk_size):
+            await target.add(thread_id, missing[start:start + chunk_size])
+        ids = [message["_id"] for message in messages]
+        for start in range(0, len(ids), chunk_size):
+            await source.delete_ids(thread_id, ids[start:start + chunk_size])
+        copied += len(missing)
+    return copied
+
+
+async def migrate(to: str) -> dict:
+    """Migrate every thread into the ``to`` layout."""
+    source = repository_for("documents" if to == "buckets" else "buckets")
+    target = repository_for(to)
+    await target.ensure_indexes()
+    threads = copied = 0
+    for thread_id in await source.thread_ids():
+        copied += await migrate_thread(thread_id, source, target, settings.message_bucket_size)
+        threads += 1
+    return {"threads": threads, "messages": copied}
+
+
+async def main(to: str):
+    await connect_to_mongo()
+    try:
+        result = await migrate(to)
+        print(f"Migrated {result['messages']} messages in {result['threads']} threads to the {to} layout")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move stored messages between storage layouts")
+    parser.add_argument("--to", choices=STORAGE_LAYOUTS, required=True, help="Layout to migrate into")
+    asyncio.run(main(parser.parse_args().to))
@@ -13,6 +13,7 @@ class UserBase(BaseModel):
     email: EmailStr
     role: UserRole = UserRole.USER
     is_active: bool = True
+    tenant_id: Optional[str] = None  # None means the default tenant
 
 
 class UserCreate(UserBase):
@@ -23,6 +24,7 @@ class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     role: Optional[UserRole] = None
     is_active: Optional[bool] = None
+    tenant_id: Optional[str] = None
 
 
 class User(UserBase):
@@ -54,10 +56,14 @@ class ThreadBase(BaseModel):
 
 class ThreadCreate(BaseModel):
     title: Optional[str] = None
+    doc_ids: Optional[List[str]] = None  # Restrict retrieval to these documents
+    tags: Optional[List[str]] = None     # ...or to documents carrying any of these tags
 
 
 class ThreadUpdate(BaseModel):
-    title: str
+    title: Optional[str] = None
+    doc_ids: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
 
 
 class Thread(ThreadBase):
@@ -76,8 +82,14 @@ class Thread(ThreadBase):
 class ThreadResponse(ThreadBase):
     id: str
     owner_user_id: str
+    tenant_id: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+    doc_ids: Optional[List[str]] = None
+    tags: Optional[List[str]] = None
+    message_count: int = 0
+    last_message_preview: Optional[str] = None
+    last_activity_at: Optional[datetime] = None
 
     class Config:
         json_encoders = {
@@ -153,6 +165,8 @@ class Document(DocumentBase):
 class DocumentResponse(DocumentBase):
     id: str
     doc_id: str  # Add the doc_id field needed for RAG operations
+    tags: List[str] = []
+    tenant_id: Optional[str] = None
     created_at: datetime
 
     class Config:
@@ -161,13 +175,56 @@ class DocumentResponse(DocumentBase):
         }
 
 
+class BulkUploadItem(BaseModel):
+    filename: str
+    status: str  # "ok", "skipped" or "error"
+    id: Optional[str] = None
+    doc_id: Optional[str] = None
+    size_bytes: int = 0
+    page_count: int = 0
+    chunk_count: int = 0
+    detail: Optional[str] = None
+
+
+class BulkUploadResponse(BaseModel):
+    items: List[BulkUploadItem]
+    succeeded: int
+    failed: int
+
+
 class ChatRequest(BaseModel):
     message: str
+    doc_ids: Optional[List[str]] = None  # Overrides the thread's retrieval scope for this message
+    tags: Optional[List[str]] = None
 
 
 class ChatResponse(BaseModel):
     message: str
     retrieval_refs: Optional[List[RetrievalRef]] = None
+    route: str = "rag"  # "chitchat" and "faq" answers skipped retrieval and the LLM; "retrieval_only" lists excerpts while the LLM is down
+
+
+class FAQCreate(BaseModel):
+    questions: List[str] = Field(..., min_length=1)  # Phrasing variants of the same question
+    answer: str
+    doc_ids: List[str] = []
+    tenant_id: Optional[str] = None  # Platform admins only; defaults to the admin's tenant
+
+
+class FAQUpdate(BaseModel):
+    questions: Optional[List[str]] = Field(None, min_length=1)
+    answer: Optional[str] = None
+    doc_ids: Optional[List[str]] = None
+
+
+class FAQResponse(BaseModel):
+    id: str
+    questions: List[str]
+    answer: str
+    doc_ids: List[str] = []
+    tenant_id: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
 
 
 class Token(BaseModel):
@@ -179,6 +236,20 @@ class TokenData(BaseModel):
     email: Optional[str] = None
 
 
+class UserImportResult(BaseModel):
+    row: int  # 1-based position in the file, header excluded
+    email: str
+    status: str  # "created", "duplicate" or "error"
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+
+class UserImportResponse(BaseModel):
+    results: List[UserImportResult]
+    created: int
+    failed: int
+
+
 class LoginRequest(BaseModel):
     email: EmailStr
     password: str
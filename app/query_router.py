@@ -0,0 +1,101 @@
+"""
+Fast path in front of ChatService.
+
+Greetings, thanks and other small talk are answered from templates, and
+questions matching a curated FAQ from their precomputed answers, so only
+knowledge questions pay for embedding, retrieval and completion. FAQ
+entries come from faq_file (every tenant) and the admin-managed FAQ index
+(per tenant, also matched by embedding similarity).
+"""
+
+import json
+import re
+from typing import Dict, List, Optional
+from app.config import settings
+from app.faq import FAQIndex, normalize
+from app.models import ChatResponse
+
+ROUTE_CHITCHAT = "chitchat"
+ROUTE_FAQ = "faq"
+
+# Whole-message patterns only: "hi, how do I mount a sign?" is still a knowledge question
+CHITCHAT_TEMPLATES = [
+    (r"(hi|hello|hey|hiya|howdy|good (morning|afternoon|evening))( there)?( (bot|assistant))?",
+     "Hello! Ask me anything about the documents in the knowledge base."),
+    (r"(how are you|how are you doing|how is it going|hows it going)( today)?",
+     "I'm doing well, thanks! What would you like to know about the documents in the knowledge base?"),
+    (r"(thanks|thank you|thank u|thx|ty|cheers|much appreciated)( (so|very) much| a lot| again)?( for (the|your) help)?",
+     "You're welcome! Let me know if you have any other questions."),
+    (r"(ok|okay|cool|great|got it|perfect|nice|awesome|understood)( thanks| thank you)?",
+     "Glad that helps. Anything else you'd like to know?"),
+    (r"(bye|goodbye|see you|see ya|later)( later| soon)?",
+     "Goodbye! Come back any time you have a question."),
+    (r"(who are you|what are you|what can you do|help|what do you know)",
+     "I'm an assistant for this knowledge base. Ask me a question about the uploaded documents "
+     "and I'll answer from them with citations."),
+]
+
+
+def load_faq_file(path: str) -> List[dict]:
+    """Read curated FAQ entries: a JSON list of {"questions": [...], "answer": "..."}."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    for entry in entries:
+        if not entry.get("questions") or not entry.get("answer"):
+            raise ValueError(f"FAQ entries need questions and an answer: {entry!r}")
+    return entries
+
+
+class QueryRouter:
+    """Answer trivial turns without touching the vector store or the LLM."""
+
+    def __init__(self, faq_entries: Optional[List[dict]] = None, faq_index: Optional[FAQIndex] = None):
+        self.chitchat = [(re.compile(pattern), answer) for pattern, answer in CHITCHAT_TEMPLATES]
+        self.faq_answers: Dict[str, str] = {}
+        self.load_faq(faq_entries or [])
+        self.faq_index = faq_index or FAQIndex()
+
+    @classmethod
+    def from_settings(cls) -> "QueryRouter":
+        """Build the router with the curated FAQ file, if one is configured."""
+        entries = []
+        if settings.faq_file:
+            try:
+                entries = load_faq_file(settings.faq_file)
+            except Exception as e:
+                print(f"Error loading FAQ file {settings.faq_file}: {e}")
+        return cls(entries)
+
+    def load_faq(self, entries: List[dict]):
+        """Index every question variant by its normalized text."""
+        self.faq_answers = {
+            normalize(question): entry["answer"]
+            for entry in entries
+            for question in entry["questions"]
+        }
+
+    def route(self, message: str, tenant_id: Optional[str] = None) -> Optional[ChatResponse]:
+        """Answer ``message`` from a template or an exact FAQ question, or None; makes no network calls."""
+        if not settings.fast_path_enabled:
+            return None
+        text = normalize(message)
+        for pattern, answer in self.chitchat:
+            if pattern.fullmatch(text):
+                return ChatResponse(message=answer, retrieval_refs=[], route=ROUTE_CHITCHAT)
+        if text in self.faq_answers:
+            return ChatResponse(message=self.faq_answers[text], retrieval_refs=[], route=ROUTE_FAQ)
+        entry = self.faq_index.lookup(text, tenant_id or settings.default_tenant)
+        if entry:
+            return ChatResponse(message=entry["answer"], retrieval_refs=entry["retrieval_refs"], route=ROUTE_FAQ)
+        return None
+
+    def wants_embedding(self, tenant_id: Optional[str] = None) -> bool:
+        """Whether the tenant has FAQ embeddings worth embedding the query for."""
+        return settings.fast_path_enabled and self.faq_index.has_embeddings(tenant_id or settings.default_tenant)
+
+    def match_faq(self, query_embedding: List[float], tenant_id: Optional[str] = None) -> Optional[ChatResponse]:
+        """Answer from the FAQ entry closest to ``query_embedding``, or None below the threshold."""
+        entry = self.faq_index.match(query_embedding, tenant_id or settings.default_tenant)
+        if entry:
+            return ChatResponse(message=entry["answer"], retrieval_refs=entry["retrieval_refs"], route=ROUTE_FAQ)
+        return None
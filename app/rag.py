@@ -1,72 +1,180 @@
 import os
+import re
+import time
 import uuid
 from typing import List, Optional, Tuple
-import PyPDF2
 from qdrant_client import QdrantClient
-from qdrant_client.http.models import PointStruct, Filter, FieldCondition, MatchValue
+from qdrant_client.http import models
+from qdrant_client.http.models import (
+    PointStruct, Filter, FieldCondition, IsEmptyCondition, MatchAny, MatchText, MatchValue, PayloadField
+)
+from app.clients import create_openai_client, create_qdrant_client
 from app.config import settings
 from app.models import RetrievalRef
+from app.resilience import CircuitOpenError, qdrant_breaker
+from app.scheduler import BACKGROUND, INTERACTIVE, estimate_tokens, openai_scheduler
+from app.singleflight import ThreadSingleFlight
 from openai import OpenAI
 
 
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+TENANT_MODES = ("collection", "shard_key")
+# doc_id is the stable id stored in MongoDB; source_file is kept for points written before it existed
+PAYLOAD_INDEXES = {"doc_id": "keyword", "tags": "keyword", "source_file": "keyword", "text": "text"}
+KEYWORD = re.compile(r"[a-z0-9]{3,}")
+
+
+def scope_filter(doc_ids: Optional[List[str]] = None, tags: Optional[List[str]] = None) -> Optional[Filter]:
+    """Restrict retrieval to chunks of the given documents or carrying any of the given tags."""
+    conditions = []
+    if doc_ids:
+        conditions.append(FieldCondition(key="doc_id", match=MatchAny(any=list(doc_ids))))
+    if tags:
+        conditions.append(FieldCondition(key="tags", match=MatchAny(any=list(tags))))
+    return Filter(should=conditions) if conditions else None
+
+
+def quantization_config():
+    """Qdrant quantization settings for the configured mode (None when disabled)."""
+    mode = settings.qdrant_quantization.lower()
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"qdrant_quantization must be one of {', '.join(QUANTIZATION_MODES)}, got {mode!r}")
+    if mode == "scalar":
+        return models.ScalarQuantization(scalar=models.ScalarQuantizationConfig(
+            type=models.ScalarType.INT8,
+            quantile=0.99,
+            always_ram=settings.qdrant_quantization_always_ram
+        ))
+    if mode == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(
+            always_ram=settings.qdrant_quantization_always_ram
+        ))
+    return None
+
+
+def search_params():
+    """Rescoring/oversampling for quantized collections (None when not quantized)."""
+    if quantization_config() is None:
+        return None
+    return models.SearchParams(quantization=models.QuantizationSearchParams(
+        rescore=settings.qdrant_rescore,
+        oversampling=settings.qdrant_oversampling
+    ))
+
+
+def embedding_options() -> dict:
+    """Extra embedding request fields; text-embedding-3 models can return shortened vectors."""
+    if settings.embedding_model.startswith("text-embedding-3"):
+        return {"extra_body": {"dimensions": settings.embedding_dim}}
+    return {}
+
+
 class RAGEngine:
-    def __init__(self):
-        """Initialize RAG engine with Qdrant and OpenAI."""
-        # Initialize Qdrant client
-        self.qdrant_client = QdrantClient(
-            url=settings.qdrant_url,  # e.g. "https://<cluster-id>.<region>.gcp.cloud.qdrant.io"
-            api_key=settings.qdrant_api_key
-        )
+    def __init__(self, qdrant_client: QdrantClient = None, openai_client: OpenAI = None):
+        """Initialize RAG engine with Qdrant and OpenAI clients (no network calls)."""
+        self.qdrant_client = qdrant_client or create_qdrant_client()
+        self.openai_client = openai_client or create_openai_client()
+        self.collection_ready = False
+        # Tenants whose collection (or shard) has been checked by this process
+        self.ready_tenants = set()
+        # Identical concurrent embedding inputs and searches share one upstream call
+        self.embedding_flight = ThreadSingleFlight()
+        self.search_flight = ThreadSingleFlight()
+
+    def collection_for(self, tenant_id: Optional[str] = None) -> str:
+        """Vector collection holding ``tenant_id``'s chunks (the default tenant keeps the original name)."""
+        tenant_id = tenant_id or settings.default_tenant
+        if settings.qdrant_tenant_mode == "shard_key" or tenant_id == settings.default_tenant:
+            return settings.qdrant_collection_name
+        return f"{settings.qdrant_collection_name}_{tenant_id}"
 
+    def shard_key_for(self, tenant_id: Optional[str] = None) -> Optional[str]:
+        """Custom shard key for ``tenant_id`` in shard_key mode, otherwise None."""
+        if settings.qdrant_tenant_mode not in TENANT_MODES:
+            raise ValueError(f"qdrant_tenant_mode must be one of {', '.join(TENANT_MODES)}, got {settings.qdrant_tenant_mode!r}")
+        if settings.qdrant_tenant_mode == "shard_key":
+            return tenant_id or settings.default_tenant
+        return None
+
+    def ensure_tenant(self, tenant_id: Optional[str] = None):
+        """Create ``tenant_id``'s collection or shard the first time it is used."""
+        if (tenant_id or settings.default_tenant) not in self.ready_tenants:
+            self.ensure_collection(tenant_id)
+
+    def ensure_collection(self, tenant_id: Optional[str] = None):
+        """Create the tenant's Qdrant collection (or shard) and payload indexes if they are missing."""
+        collection_name = self.collection_for(tenant_id)
+        shard_key = self.shard_key_for(tenant_id)
         # Ensure collection exists with proper indexing
         try:
             collections = self.qdrant_client.get_collections().collections
-            if not any(c.name == settings.qdrant_collection_name for c in collections):
+            if not any(c.name == collection_name for c in collections):
                 # Create collection with proper indexing
-                self.qdrant_client.recreate_collection(
-                    collection_name=settings.qdrant_collection_name,
-                    vectors_config={
-                        "size": 3072,  # OpenAI text-embedding-3-large dimensions
-                        "distance": "Cosine"
-                    },
-                    optimizers_config={
-                        "default_segment_number": 2,
-                        "memmap_threshold": 10000
-                    }
+                self.qdrant_client.create_collection(
+                    collection_name=collection_name,
+                    vectors_config=models.VectorParams(
+                        size=settings.embedding_dim,
+                        distance=models.Distance.COSINE,
+                        on_disk=settings.qdrant_on_disk_vectors
+                    ),
+                    optimizers_config=models.OptimizersConfigDiff(
+                        default_segment_number=2,
+                        memmap_threshold=10000
+                    ),
+                    quantization_config=quantization_config(),
+                    sharding_method=models.ShardingMethod.CUSTOM if shard_key else None
                 )
-                
-                # Create index on source_file field for filtering
-                self.qdrant_client.create_payload_index(
-                    collection_name=settings.qdrant_collection_name,
-                    field_name="source_file",
-                    field_schema="keyword"
-                )
-                
-                pass
             else:
-                # Ensure index exists on source_file field
+                self.check_collection_config(collection_name)
+            if shard_key:
                 try:
-                    self.qdrant_client.create_payload_index(
-                        collection_name=settings.qdrant_collection_name,
-                        field_name="source_file",
-                        field_schema="keyword"
-                    )
-                except Exception as index_error:
-                    # Index might already exist
+                    self.qdrant_client.create_shard_key(collection_name, shard_key=shard_key)
+                except Exception as shard_error:
+                    # Shard key might already exist
                     pass
-                    
+            self.ensure_payload_indexes(collection_name)
         except Exception as e:
             print(f"❌ Error initializing Qdrant: {e}")
             raise
+        self.ready_tenants.add(tenant_id or settings.default_tenant)
+        if (tenant_id or settings.default_tenant) == settings.default_tenant:
+            self.collection_ready = True
+
+    def ensure_payload_indexes(self, collection_name: str):
+        """Index the payload fields used by scoped search and deletes."""
+        for field_name, field_schema in PAYLOAD_INDEXES.items():
+            try:
+                self.qdrant_client.create_payload_index(
+                    collection_name=collection_name,
+                    field_name=field_name,
+                    field_schema=field_schema
+                )
+            except Exception as index_error:
+                # Index might already exist
+                pass
 
-        # Initialize OpenAI client
-        self.openai_client = OpenAI(api_key=settings.openai_api_key)
+    def check_collection_config(self, collection_name: str):
+        """Fail on a vector size mismatch and apply a changed quantization mode in place."""
+        params = self.qdrant_client.get_collection(collection_name).config
+        size = params.params.vectors.size
+        if size != settings.embedding_dim:
+            raise ValueError(
+                f"Collection '{collection_name}' stores {size}-dimensional vectors "
+                f"but embedding_dim is {settings.embedding_dim}; re-index into a new collection"
+            )
+        wanted = quantization_config()
+        if wanted != params.quantization_config:
+            self.qdrant_client.update_collection(
+                collection_name=collection_name,
+                quantization_config=wanted or models.Disabled.DISABLED
+            )
 
 
     def load_document_from_upload(self, file_path: str, filename: str):
         """Load document content from a PDF or Word file."""
         if filename.lower().endswith(".pdf"):
             try:
+                import PyPDF2
                 with open(file_path, "rb") as file:
                     pdf_reader = PyPDF2.PdfReader(file)
                     text_content = ""
@@ -127,29 +235,67 @@ class RAGEngine:
         """Split a single document into chunks."""
         chunks = self.split_text(document["text"], chunk_size, chunk_overlap)
         return [
-            {"id": f"{document['id']}_chunk{i}", "text": chunk, "source_file": document["id"]}
+            {
+                "id": f"{document['id']}_chunk{i}",
+                "text": chunk,
+                "source_file": document["id"],
+                "doc_id": document.get("doc_id", document["id"]),
+                "tags": document.get("tags", [])
+            }
             for i, chunk in enumerate(chunks, start=1)
         ]
 
 
     def get_openai_embedding(self, text: str):
-        """Generate OpenAI embedding for text."""
-        response = self.openai_client.embeddings.create(
-            input=text,
-            model=settings.embedding_model
+        """Generate OpenAI embedding for text (concurrent calls for the same text share one request)."""
+        def embed():
+            response = openai_scheduler.call(
+                lambda: self.openai_client.embeddings.create(
+                    input=text,
+                    model=settings.embedding_model,
+                    **embedding_options()
+                ),
+                priority=INTERACTIVE,
+                tokens=estimate_tokens(text)
+            )
+            return response.data[0].embedding
+
+        if not settings.coalesce_requests:
+            return embed()
+        return self.embedding_flight.do((settings.embedding_model, settings.embedding_dim, text), embed)
+
+
+    def get_openai_embeddings(self, texts: List[str], priority: int = INTERACTIVE) -> List[List[float]]:
+        """Embed several texts in one request."""
+        response = openai_scheduler.call(
+            lambda: self.openai_client.embeddings.create(
+                input=texts,
+                model=settings.embedding_model,
+                **embedding_options()
+            ),
+            priority=priority,
+            tokens=sum(estimate_tokens(text) for text in texts)
         )
-        return response.data[0].embedding
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
 
 
-    def generate_embeddings(self, chunked_documents):
-        """Generate embeddings for all chunks."""
-        for doc in chunked_documents:
-            doc["embedding"] = self.get_openai_embedding(doc["text"])
+    def embed_chunks(self, chunked_documents):
+        """Generate embeddings for chunks in batches of embed_batch_size texts per request.
+
+        Ingestion is background work: chat requests are scheduled first.
+        """
+        for start in range(0, len(chunked_documents), settings.embed_batch_size):
+            batch = chunked_documents[start:start + settings.embed_batch_size]
+            embeddings = self.get_openai_embeddings([doc["text"] for doc in batch], priority=BACKGROUND)
+            for doc, embedding in zip(batch, embeddings):
+                doc["embedding"] = embedding
         return chunked_documents
 
 
-    def add_documents_to_qdrant(self, chunked_documents):
-        """Insert chunks with embeddings into Qdrant."""
+    def add_documents_to_qdrant(self, chunked_documents, tenant_id: Optional[str] = None):
+        """Insert chunks with embeddings into the tenant's Qdrant collection."""
+        self.ensure_tenant(tenant_id)
+        now = time.time()
         points = [
             PointStruct(
                 id=str(uuid.uuid4()),
@@ -157,35 +303,49 @@ class RAGEngine:
                 payload={
                     "text": doc["text"],
                     "source_file": doc["source_file"],
-                    "chunk_id": doc["id"]
+                    "doc_id": doc.get("doc_id", doc["source_file"]),
+                    "tags": doc.get("tags", []),
+                    "chunk_id": doc["id"],
+                    "ingested_at": now
                 }
             )
             for doc in chunked_documents
         ]
         self.qdrant_client.upsert(
-            collection_name=settings.qdrant_collection_name,
-            points=points
+            collection_name=self.collection_for(tenant_id),
+            points=points,
+            shard_key_selector=self.shard_key_for(tenant_id)
         )
 
 
-    def add_document(self, file_path: str, filename: str) -> Tuple[str, int]:
-        """Process and add a document to Qdrant."""
+    def add_document(self, file_path: str, filename: str, tags: Optional[List[str]] = None,
+                     tenant_id: Optional[str] = None) -> Tuple[str, int]:
+        """Process and add a document to Qdrant; returns the doc_id stored on every chunk."""
+        document = self.parse_document(file_path, filename, tags)
+        chunks = self.embed_chunks(self.preprocess_document(document))
+        self.add_documents_to_qdrant(chunks, tenant_id=tenant_id)
+        return document["doc_id"], document["page_count"]
+
+
+    def parse_document(self, file_path: str, filename: str, tags: Optional[List[str]] = None) -> dict:
+        """Extract a file's text and give it a new doc_id; raises ValueError when it has no text."""
         document = self.load_document_from_upload(file_path, filename)
         if not document:
             raise ValueError("No content to add")
-        chunks = self.preprocess_document(document)
-        chunks = self.generate_embeddings(chunks)
-        self.add_documents_to_qdrant(chunks)
-        return str(uuid.uuid4()), document["page_count"]
+        document["doc_id"] = str(uuid.uuid4())
+        document["tags"] = tags or []
+        return document
 
 
-    def query_documents(self, query: str, n_results: int = 2):
+    def query_documents(self, query: str, n_results: int = 2, tenant_id: Optional[str] = None):
         """Search Qdrant for relevant chunks."""
         query_embedding = self.get_openai_embedding(query)
         search_result = self.qdrant_client.search(
-            collection_name=settings.qdrant_collection_name,
+            collection_name=self.collection_for(tenant_id),
+            shard_key_selector=self.shard_key_for(tenant_id),
             query_vector=query_embedding,
-            limit=n_results
+            limit=n_results,
+            search_params=search_params()
         )
         return [hit.payload["text"] for hit in search_result]
 
@@ -198,36 +358,63 @@ class RAGEngine:
             "Use the retrieved context to answer the question concisely.\n\n"
             f"Context:\n{context}\n\nQuestion:\n{question}"
         )
-        response = self.openai_client.chat.completions.create(
-            model=settings.openai_chat_model,
-            messages=[
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": question}
-            ]
+        response = openai_scheduler.call(
+            lambda: self.openai_client.chat.completions.create(
+                model=settings.openai_chat_model,
+                messages=[
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": question}
+                ]
+            ),
+            tokens=estimate_tokens(prompt) + estimate_tokens(question)
         )
         return response.choices[0].message.content
 
 
-    def search_documents(self, query: str, top_k: int = 5) -> List[RetrievalRef]:
-        """Search for relevant document chunks and return with actual content."""
+    def search_documents(self, query: str, top_k: int = 5, doc_ids: Optional[List[str]] = None,
+                         tags: Optional[List[str]] = None, tenant_id: Optional[str] = None,
+                         query_embedding: Optional[List[float]] = None) -> List[RetrievalRef]:
+        """Search the tenant's document chunks, optionally scoped to documents or tags.
+
+        Pass ``query_embedding`` when the query was already embedded (e.g. for FAQ matching).
+        Concurrent identical searches within a tenant share one Qdrant query.
+        """
+        def search():
+            return self.run_search(query, top_k, doc_ids, tags, tenant_id, query_embedding)
+
+        if not settings.coalesce_requests:
+            return search()
+        key = (tenant_id or settings.default_tenant, query, top_k,
+               tuple(doc_ids) if doc_ids is not None else None, tuple(tags) if tags is not None else None)
+        return list(self.search_flight.do(key, search))
+
+    def run_search(self, query: str, top_k: int, doc_ids: Optional[List[str]], tags: Optional[List[str]],
+                   tenant_id: Optional[str], query_embedding: Optional[List[float]]) -> List[RetrievalRef]:
+        # Embedding failures propagate so the caller can fall back to keyword_search
+        query_embedding = query_embedding or self.get_openai_embedding(query)
         try:
-            # Get query embedding
-            query_embedding = self.get_openai_embedding(query)
+            self.ensure_tenant(tenant_id)
+            query_filter = scope_filter(doc_ids, tags)
+            collection_name = self.collection_for(tenant_id)
+            shard_key = self.shard_key_for(tenant_id)
             
             # Search in Qdrant with lower score threshold
-            search_result = self.qdrant_client.search(
-                collection_name=settings.qdrant_collection_name,
+            search_result = qdrant_breaker.call(lambda: self.qdrant_client.search(
+                collection_name=collection_name,
+                shard_key_selector=shard_key,
                 query_vector=query_embedding,  # Use default vector field
+                query_filter=query_filter,
                 limit=top_k,
-                score_threshold=0.1  # Lower threshold to get more results
-            )
+                score_threshold=0.1,  # Lower threshold to get more results
+                search_params=search_params()
+            ))
             
             # Convert to RetrievalRef with actual content
             retrieval_refs = []
             for i, hit in enumerate(search_result):
                 if hit.payload.get("text", "").strip():
                     retrieval_refs.append(RetrievalRef(
-                        doc_id=hit.payload.get("source_file", f"chunk_{i}"),
+                        doc_id=hit.payload.get("doc_id") or hit.payload.get("source_file", f"chunk_{i}"),
                         filename=hit.payload.get("source_file", f"chunk_{i}"),
                         page=1,  # Default page
                         chunk_id=hit.id,
@@ -236,16 +423,19 @@ class RAGEngine:
             
             # If no results with threshold, try without threshold
             if not retrieval_refs:
-                search_result = self.qdrant_client.search(
-                    collection_name=settings.qdrant_collection_name,
+                search_result = qdrant_breaker.call(lambda: self.qdrant_client.search(
+                    collection_name=collection_name,
+                    shard_key_selector=shard_key,
                     query_vector=query_embedding,  # Use default vector field
-                    limit=top_k
-                )
+                    query_filter=query_filter,
+                    limit=top_k,
+                    search_params=search_params()
+                ))
                 
                 for i, hit in enumerate(search_result):
                     if hit.payload.get("text", "").strip():
                         retrieval_refs.append(RetrievalRef(
-                            doc_id=hit.payload.get("source_file", f"chunk_{i}"),
+                            doc_id=hit.payload.get("doc_id") or hit.payload.get("source_file", f"chunk_{i}"),
                             filename=hit.payload.get("source_file", f"chunk_{i}"),
                             page=1,  # Default page
                             chunk_id=hit.id,
@@ -254,22 +444,57 @@ class RAGEngine:
             
             return retrieval_refs
             
+        except CircuitOpenError:
+            raise
         except Exception as e:
             print(f"Search error: {e}")
             return []
 
-    def get_document_chunks(self, doc_id: str) -> List[dict]:
+    def keyword_search(self, query: str, top_k: int = 5, doc_ids: Optional[List[str]] = None,
+                       tags: Optional[List[str]] = None, tenant_id: Optional[str] = None) -> List[dict]:
+        """Chunks sharing the most words with ``query``, found without an embedding.
+
+        Used when OpenAI is unavailable; returns ``{"text", "filename", "doc_id", "chunk_id"}`` dicts.
+        """
+        words = list(dict.fromkeys(KEYWORD.findall(query.lower())))
+        if not words:
+            return []
+        conditions = [FieldCondition(key="text", match=MatchText(text=word)) for word in words]
+        scope = scope_filter(doc_ids, tags)
+        points, _ = qdrant_breaker.call(lambda: self.qdrant_client.scroll(
+            collection_name=self.collection_for(tenant_id),
+            shard_key_selector=self.shard_key_for(tenant_id),
+            scroll_filter=Filter(should=conditions, must=[scope] if scope else None),
+            limit=top_k * 4,
+            with_vectors=False
+        ))
+
+        def matches(point):
+            text = point.payload.get("text", "").lower()
+            return sum(word in text for word in words)
+
+        return [
+            {
+                "text": point.payload["text"],
+                "filename": point.payload.get("source_file"),
+                "doc_id": point.payload.get("doc_id") or point.payload.get("source_file"),
+                "chunk_id": str(point.id)
+            }
+            for point in sorted(points, key=matches, reverse=True)[:top_k]
+            if point.payload.get("text", "").strip()
+        ]
+
+    def get_document_chunks(self, doc_id: str, tenant_id: Optional[str] = None) -> List[dict]:
         """Get all chunks for a specific document."""
         try:
-            # Search for documents by source_file in payload
+            # Match the stable doc_id, or source_file for chunks stored before doc_id existed
             search_result = self.qdrant_client.scroll(
-                collection_name=settings.qdrant_collection_name,
+                collection_name=self.collection_for(tenant_id),
+                shard_key_selector=self.shard_key_for(tenant_id),
                 scroll_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="source_file",
-                            match=MatchValue(value=doc_id)
-                        )
+                    should=[
+                        FieldCondition(key="doc_id", match=MatchValue(value=doc_id)),
+                        FieldCondition(key="source_file", match=MatchValue(value=doc_id))
                     ]
                 ),
                 limit=100
@@ -287,29 +512,74 @@ class RAGEngine:
         except Exception as e:
             return []
 
-    def delete_document(self, doc_id: str) -> bool:
-        """Delete all chunks for a specific document."""
+    def delete_document(self, doc_id: str, tenant_id: Optional[str] = None, filename: Optional[str] = None) -> bool:
+        """Delete all chunks for a specific document.
+
+        Pass ``filename`` so older chunks are found too: some carry the filename
+        as their doc_id, and the oldest have no doc_id, only ``source_file``.
+        """
         try:
             # Validate doc_id
             if not doc_id or doc_id is None:
                 return False
             
-            # Delete points by source_file filter
-            self.qdrant_client.delete(
-                collection_name=settings.qdrant_collection_name,
-                points_selector=Filter(
-                    must=[
-                        FieldCondition(
-                            key="source_file",
-                            match=MatchValue(value=doc_id)
-                        )
-                    ]
+            collection_name = self.collection_for(tenant_id)
+            shard_key = self.shard_key_for(tenant_id)
+            keys = [doc_id]
+            if filename:
+                stable = self.qdrant_client.count(
+                    collection_name=collection_name,
+                    shard_key_selector=shard_key,
+                    count_filter=Filter(must=[FieldCondition(key="doc_id", match=MatchValue(value=doc_id))]),
+                    exact=True
                 )
+                if not stable.count:
+                    keys.append(filename)
+            
+            conditions = [FieldCondition(key="doc_id", match=MatchAny(any=keys))]
+            if filename:
+                # Chunks without a doc_id are matched by file; later uploads of the same file have one
+                conditions.append(Filter(must=[
+                    FieldCondition(key="source_file", match=MatchValue(value=filename)),
+                    IsEmptyCondition(is_empty=PayloadField(key="doc_id"))
+                ]))
+            
+            self.qdrant_client.delete(
+                collection_name=collection_name,
+                shard_key_selector=shard_key,
+                points_selector=Filter(should=conditions)
             )
             return True
         except Exception as e:
             return False
 
+    def scroll_point_doc_ids(self, tenant_id: Optional[str] = None, offset=None, limit: int = 500,
+                             ingested_before: Optional[float] = None):
+        """One page of (point id, doc_id) pairs; returns (pairs, next offset).
+
+        Chunks stored before doc_id existed report their ``source_file`` instead.
+        With ``ingested_before`` (epoch seconds), newer points are left out;
+        chunks stored before ingestion times were recorded count as old.
+        """
+        points, next_offset = self.qdrant_client.scroll(
+            collection_name=self.collection_for(tenant_id),
+            shard_key_selector=self.shard_key_for(tenant_id),
+            with_payload=["doc_id", "source_file", "ingested_at"],
+            with_vectors=False,
+            offset=offset,
+            limit=limit
+        )
+        return [
+            (point.id, point.payload.get("doc_id") or point.payload.get("source_file"))
+            for point in points
+            if ingested_before is None or point.payload.get("ingested_at", 0) < ingested_before
+        ], next_offset
+
+    def delete_points(self, point_ids: List, tenant_id: Optional[str] = None):
+        """Delete points by id."""
+        self.qdrant_client.delete(
+            collection_name=self.collection_for(tenant_id),
+            shard_key_selector=self.shard_key_for(tenant_id),
+            points_selector=models.PointIdsList(points=point_ids)
+        )
 
-# Global RAG engine instance
-rag_engine = RAGEngine()
@@ -0,0 +1,198 @@
+"""
+Per-user, per-route token-bucket rate limiting.
+
+Each route limited with ``RateLimiter`` gets a bucket per user, configured as
+``"<count>/<second|minute|hour>"``. A full bucket holds ``count`` requests.
+The bucket refills continuously at ``count`` per period, so a user can burst up
+to ``count`` requests and then goes at the steady rate.
+
+Two backends keep the buckets:
+
+- ``MemoryBackend`` (RATE_LIMIT_BACKEND=memory): a dict in the worker. The
+  check runs on the event loop with no await between reading and writing a
+  bucket, so it is atomic without a lock and costs a few microseconds. Limits
+  are per worker.
+- ``RedisBackend`` (RATE_LIMIT_BACKEND=redis): one hash per bucket, updated
+  by a Lua script in a single round trip, so every worker shares the same
+  limits. It uses the Redis server's clock. If Redis cannot be reached the
+  request is allowed: rate limiting never takes chat down.
+
+Responses carry ``RateLimit-Limit``, ``RateLimit-Remaining`` and
+``RateLimit-Reset`` (plus the ``X-RateLimit-*`` spellings). A request over the
+limit gets 429 with ``Retry-After``.
+"""
+
+import importlib.util
+import math
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple
+from fastapi import Depends, HTTPException, Response, status
+from app.auth import get_current_user
+from app.config import settings
+
+PERIODS = {"second": 1.0, "minute": 60.0, "hour": 3600.0}
+SWEEP_EVERY = 10000                       # memory checks between evictions of idle buckets
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+return {allowed, tostring(tokens)}
+"""
+
+
+class Limit(NamedTuple):
+    capacity: int
+    rate: float                           # tokens per second
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    reset: float                          # seconds until the bucket is full again
+    retry_after: float                    # seconds until the next request would be allowed
+
+
+@lru_cache(maxsize=None)
+def parse_limit(value: str) -> Limit:
+    """``"20/minute"`` -> Limit(capacity=20, rate=20/60)."""
+    count, _, period = value.partition("/")
+    if period.strip() not in PERIODS or int(count) < 1:
+        raise ValueError(f"Rate limit must look like '20/minute', got {value!r}")
+    return Limit(int(count), int(count) / PERIODS[period.strip()])
+
+
+def decide(limit: Limit, tokens: float, allowed: bool) -> Decision:
+    """Turn a bucket's level after the check into the values reported to the client."""
+    return Decision(
+        allowed=allowed,
+        limit=limit.capacity,
+        remaining=int(tokens),
+        reset=(limit.capacity - tokens) / limit.rate,
+        retry_after=0.0 if allowed else (1 - tokens) / limit.rate
+    )
+
+
+class MemoryBackend:
+    """Buckets in this worker's memory; ``[tokens, last refill time, time it is full again]`` per key."""
+
+    def __init__(self):
+        self.buckets: Dict[str, List[float]] = {}
+        self.checks = 0
+
+    def take(self, key: str, limit: Limit) -> Decision:
+        now = time.monotonic()
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = [float(limit.capacity), now, now]
+        tokens = min(limit.capacity, bucket[0] + (now - bucket[1]) * limit.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        bucket[0], bucket[1], bucket[2] = tokens, now, now + (limit.capacity - tokens) / limit.rate
+        self.checks += 1
+        if self.checks % SWEEP_EVERY == 0:
+            self.sweep(now)
+        return decide(limit, tokens, allowed)
+
+    def sweep(self, now: float):
+        # A bucket that has refilled is the same as a missing one
+        for key in [key for key, bucket in self.buckets.items() if bucket[2] <= now]:
+            del self.buckets[key]
+
+    async def check(self, key: str, limit: Limit) -> Decision:
+        return self.take(key, limit)
+
+
+class RedisBackend:
+    """Buckets in Redis (or any server speaking its protocol and running Lua scripts)."""
+
+    def __init__(self, client):
+        self.client = client
+        self.script = client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def check(self, key: str, limit: Limit) -> Decision:
+        try:
+            allowed, tokens = await self.script(keys=[key], args=[limit.capacity, limit.rate])
+        except Exception as e:
+            print(f"Rate limit backend error, allowing request: {e}")
+            return Decision(True, limit.capacity, limit.capacity, 0.0, 0.0)
+        return decide(limit, float(tokens), bool(allowed))
+
+
+class RateLimits:
+    backend = None
+
+
+def get_rate_limit_backend():
+    """The configured backend, created on first use."""
+    if RateLimits.backend is None:
+        if settings.rate_limit_backend == "redis" and importlib.util.find_spec("redis") is not None:
+            import redis.asyncio
+
+            RateLimits.backend = RedisBackend(redis.asyncio.from_url(settings.redis_url))
+        else:
+            if settings.rate_limit_backend == "redis":
+                print("redis package not installed; rate limits are kept per worker")
+            RateLimits.backend = MemoryBackend()
+    return RateLimits.backend
+
+
+async def close_rate_limit_backend():
+    """Close the shared backend's connections."""
+    backend, RateLimits.backend = RateLimits.backend, None
+    if isinstance(backend, RedisBackend):
+        await backend.client.close()
+
+
+def rate_limit_headers(decision: Decision) -> Dict[str, str]:
+    values = {"Limit": str(decision.limit), "Remaining": str(decision.remaining), "Reset": str(math.ceil(decision.reset))}
+    headers = {f"RateLimit-{name}": value for name, value in values.items()}
+    headers.update({f"X-RateLimit-{name}": value for name, value in values.items()})
+    return headers
+
+
+class RateLimiter:
+    """FastAPI dependency enforcing a route's per-user token bucket.
+
+    ``setting`` names the Settings field holding the limit, so it can be changed at runtime.
+    """
+
+    def __init__(self, route: str, setting: str):
+        self.route = route
+        self.setting = setting
+
+    async def check(self, user_id: str) -> Decision:
+        limit = parse_limit(getattr(settings, self.setting))
+        return await get_rate_limit_backend().check(f"ratelimit:{self.route}:{user_id}", limit)
+
+    async def __call__(self, response: Response, current_user = Depends(get_current_user)):
+        if not settings.rate_limit_enabled:
+            return
+        decision = await self.check(current_user.id)
+        headers = rate_limit_headers(decision)
+        if not decision.allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Rate limit exceeded",
+                headers={**headers, "Retry-After": str(math.ceil(decision.retry_after))}
+            )
+        response.headers.update(headers)
+
+
+chat_rate_limit = RateLimiter("chat", "rate_limit_chat")
+upload_rate_limit = RateLimiter("upload", "rate_limit_upload")
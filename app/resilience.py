@@ -0,0 +1,174 @@
+"""
+Circuit breakers and load shedding around upstream dependencies.
+
+Each dependency (OpenAI, Qdrant) has a breaker. After
+BREAKER_FAILURE_THRESHOLD consecutive failures (timeouts, connection errors,
+5xx) it opens: calls fail at once with ``CircuitOpenError`` instead of waiting
+on a service that is down. After BREAKER_RESET_TIMEOUT seconds one trial call
+is let through (half-open); its success closes the breaker, its failure opens
+it again. Other errors (4xx, a missing collection, a bad request) are answers
+from a working service and count as successes.
+
+Chat turns are admitted through ``chat_admission``; once CHAT_MAX_QUEUE_DEPTH
+turns are in progress, new ones get 503 with Retry-After instead of queueing
+behind the upstream calls of the others.
+
+Breakers are called from worker threads, so their state is guarded by a lock.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+import grpc
+import httpx
+from fastapi import HTTPException, status
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from app.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(Exception):
+    """A dependency's breaker is open; retry after ``retry_after`` seconds."""
+
+    def __init__(self, dependency: str, retry_after: float):
+        super().__init__(f"{dependency} is unavailable")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+
+def is_transport_failure(error: Exception) -> bool:
+    """Whether ``error`` is a timeout or a connection error."""
+    return isinstance(error, (TimeoutError, ConnectionError, httpx.TransportError))
+
+
+def is_qdrant_failure(error: Exception) -> bool:
+    """Whether ``error`` means Qdrant is unreachable or failing (what trips its breaker)."""
+    if isinstance(error, UnexpectedResponse):
+        return error.status_code is not None and error.status_code >= 500
+    if isinstance(error, ResponseHandlingException):
+        # The REST client wraps transport errors (and unparseable responses) in this
+        return is_transport_failure(error.source)
+    if isinstance(error, grpc.RpcError):
+        return error.code() in (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED, grpc.StatusCode.INTERNAL)
+    return is_transport_failure(error)
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, is_failure: Callable[[Exception], bool] = is_transport_failure):
+        self.name = name
+        self.is_failure = is_failure
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0                 # consecutive
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.opens = 0
+        self.rejected = 0
+
+    def retry_after(self, now: float) -> float:
+        return max(0.0, self.opened_at + settings.breaker_reset_timeout - now)
+
+    def check(self):
+        """Raise ``CircuitOpenError`` unless a call may go ahead now."""
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN and self.retry_after(now) <= 0:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return
+            if self.state != CLOSED:
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self.retry_after(now) or settings.breaker_reset_timeout)
+
+    def record_success(self):
+        with self.lock:
+            self.state = CLOSED
+            self.failures = 0
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= settings.breaker_failure_threshold):
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+                self.opens += 1
+
+    def call(self, fn: Callable[[], T]) -> T:
+        """Run ``fn`` through the breaker; only exceptions ``is_failure`` accepts count as failures."""
+        self.check()
+        try:
+            result = fn()
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def stats(self) -> dict:
+        with self.lock:
+            now = time.monotonic()
+            if self.state == OPEN and self.retry_after(now) <= 0:
+                state = HALF_OPEN
+            else:
+                state = self.state
+            return {
+                "state": state,
+                "consecutive_failures": self.failures,
+                "opens": self.opens,
+                "rejected": self.rejected,
+                "retry_after": round(self.retry_after(now), 1) if state == OPEN else 0
+            }
+
+
+openai_breaker = CircuitBreaker("openai")
+qdrant_breaker = CircuitBreaker("qdrant", is_qdrant_failure)
+breakers = {breaker.name: breaker for breaker in (openai_breaker, qdrant_breaker)}
+
+
+def breaker_stats() -> dict:
+    return {name: breaker.stats() for name, breaker in breakers.items()}
+
+
+def service_unavailable(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(max(1, round(retry_after)))}
+    )
+
+
+class LoadShedder:
+    """Count chat turns in progress and refuse new ones past the configured depth."""
+
+    def __init__(self):
+        self.depth = 0
+        self.shed = 0
+
+    @contextmanager
+    def admit(self):
+        if settings.chat_max_queue_depth and self.depth >= settings.chat_max_queue_depth:
+            self.shed += 1
+            raise service_unavailable("Server is busy, please retry shortly", settings.shed_retry_after)
+        self.depth += 1
+        try:
+            yield
+        finally:
+            self.depth -= 1
+
+    def stats(self) -> dict:
+        return {"depth": self.depth, "max_depth": settings.chat_max_queue_depth, "shed": self.shed}
+
+
+chat_admission = LoadShedder()
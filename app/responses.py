@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import json
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional codec
+    brotli = None
+
+CODECS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def choose_encoding(accept_encoding: str, available) -> str:
+    """Best of brotli and gzip that the client accepts and ``available`` offers, or None."""
+    accepted = {part.split(";")[0].strip() for part in accept_encoding.lower().split(",")}
+    for encoding in ("br", "gzip"):
+        if encoding in accepted and encoding in available:
+            return encoding
+    return None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response for trusted database rows: no model validation, orjson when installed."""
+
+    def render(self, content) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def weak_etag(*parts) -> str:
+    """Weak ETag over the values that change whenever a listing changes."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against ``etag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str) -> dict:
+    """Per-user responses: cache privately but always revalidate."""
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
+
+
+def serialize_message(message: dict) -> dict:
+    """Message row as returned by the API (MessageResponse shape)."""
+    return {
+        "id": str(message["_id"]),
+        "thread_id": message["thread_id"],
+        "role": message["role"],
+        "content": message["content"],
+        "created_at": message["created_at"],
+        "retrieval_refs": message.get("retrieval_refs")
+    }
+
+
+def serialize_thread(thread: dict) -> dict:
+    """Thread row as returned by the API (ThreadResponse shape)."""
+    return {
+        "id": str(thread["_id"]),
+        "title": thread["title"],
+        "owner_user_id": thread["owner_user_id"],
+        "tenant_id": thread.get("tenant_id"),
+        "created_at": thread["created_at"],
+        "updated_at": thread["updated_at"],
+        "doc_ids": thread.get("doc_ids"),
+        "tags": thread.get("tags"),
+        "message_count": thread.get("message_count", 0),
+        "last_message_preview": thread.get("last_message_preview"),
+        "last_activity_at": thread.get("last_activity_at")
+    }
+
+
+class CompressionMiddleware:
+    """Compress complete (non-streamed) responses with brotli or gzip.
+
+    Streamed bodies, event streams and responses that already carry a
+    Content-Encoding are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = choose_encoding(Headers(scope=scope).get("Accept-Encoding", ""), CODECS)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Message = {}
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                headers = Headers(raw=message["headers"])
+                passthrough = (
+                    "content-encoding" in headers
+                    or headers.get("content-type", "").startswith("text/event-stream")
+                )
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            if start_message:
+                body = message.get("body", b"")
+                if passthrough or message.get("more_body", False) or len(body) < self.minimum_size:
+                    passthrough = True
+                else:
+                    body = self.compress(body, encoding)
+                    headers = MutableHeaders(raw=start_message["headers"])
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    message = {**message, "body": body}
+                await send(start_message)
+                start_message = {}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
@@ -1,9 +1,23 @@
 from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form
-from app.models import UserResponse, UserUpdate, DocumentResponse
+from app.models import (
+    UserResponse, UserUpdate, UserImportResponse, UserImportResult, DocumentResponse,
+    BulkUploadItem, BulkUploadResponse, FAQCreate, FAQUpdate, FAQResponse
+)
 from app.auth import get_current_admin_user, get_current_user
+from app.config import settings
 from app.database import get_collection
-from app.rag import rag_engine
+from app.faq import bump_revision
+from app.ingest import IngestPipeline
+from app.messages import get_message_repository
+from app.query_router import QueryRouter
+from app.rag import RAGEngine
+from app.ratelimit import upload_rate_limit
+from app.services import get_query_router, get_rag_engine, pool_stats, wake_collector
+from app.tenants import admin_tenant, is_platform_admin, tenant_filter, tenant_of
+from app.user_import import import_users, parse_rows
+from app.responses import FastJSONResponse
 from typing import List, Optional
+import asyncio
 import os
 import tempfile
 from datetime import datetime, timezone
@@ -12,17 +26,32 @@ from bson import ObjectId
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
 
+async def get_tenant_user(user_id: str, current_admin) -> dict:
+    """Load a user the admin may manage (their own tenant, any tenant for platform admins)."""
+    users_collection = get_collection("users")
+    user = await users_collection.find_one({"_id": ObjectId(user_id), "deleted_at": None})
+    # Users of other tenants are reported as missing rather than forbidden
+    if not user or (not is_platform_admin(current_admin) and tenant_of(user) != tenant_of(current_admin)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+    return user
+
+
 # User Management Endpoints
 @router.get("/users", response_model=List[UserResponse])
 async def list_users(
     search: Optional[str] = None,
+    tenant_id: Optional[str] = None,
     current_admin: UserResponse = Depends(get_current_admin_user)
 ):
-    """List all users (admin only)."""
+    """List the users of the admin's tenant (platform admins may pass ``tenant_id``)."""
     users_collection = get_collection("users")
     
     # Build query
-    query = {}
+    query = tenant_filter(admin_tenant(current_admin, tenant_id))
+    query["deleted_at"] = None
     if search:
         query["email"] = {"$regex": search, "$options": "i"}
     
@@ -36,6 +65,7 @@ async def list_users(
             email=user["email"],
             role=user["role"],
             is_active=user["is_active"],
+            tenant_id=user.get("tenant_id"),
             created_at=user["created_at"]
         ))
     
@@ -48,21 +78,18 @@ async def get_user_chat_history(
     current_admin: UserResponse = Depends(get_current_admin_user)
 ):
     """Get chat history for a specific user (admin only)."""
+    await get_tenant_user(user_id, current_admin)
     threads_collection = get_collection("threads")
-    messages_collection = get_collection("messages")
+    message_repository = get_message_repository()
     
     # Get all threads for the user
-    cursor = threads_collection.find({"owner_user_id": user_id}).sort("created_at", -1)
+    cursor = threads_collection.find({"owner_user_id": user_id, "deleted_at": None}).sort("created_at", -1)
     threads = []
     
     async for thread in cursor:
         # Get messages for this thread (limit to last 50 for preview)
-        messages_cursor = messages_collection.find(
-            {"thread_id": str(thread["_id"])}
-        ).sort("created_at", 1).limit(50)
-        
         messages = []
-        async for message in messages_cursor:
+        for message in await message_repository.page(str(thread["_id"]), limit=50):
             messages.append({
                 "id": str(message["_id"]),
                 "role": message["role"],
@@ -78,7 +105,7 @@ async def get_user_chat_history(
             "messages": messages
         })
     
-    return threads
+    return FastJSONResponse(threads)
 
 
 @router.post("/users", response_model=UserResponse)
@@ -112,6 +139,8 @@ async def create_user(
             detail="Email already registered"
         )
     
+    tenant_id = admin_tenant(current_admin, user_data.get("tenant_id"))
+    
     # Hash password
     password_hash = get_password_hash(user_data["password"])
     
@@ -120,6 +149,7 @@ async def create_user(
         "email": user_data["email"],
         "hashed_password": password_hash,  # Use consistent field name
         "role": user_data.get("role", "user"),
+        "tenant_id": tenant_id,
         "is_active": True,
         "created_at": datetime.now(timezone.utc),
         "updated_at": datetime.now(timezone.utc)  # Add missing updated_at field
@@ -134,10 +164,32 @@ async def create_user(
         email=user_doc["email"],
         role=user_doc["role"],
         is_active=user_doc["is_active"],
+        tenant_id=tenant_id,
         created_at=user_doc["created_at"]
     )
 
 
+@router.post("/users/import", response_model=UserImportResponse)
+async def import_users_file(
+    file: UploadFile = File(...),
+    current_admin = Depends(get_current_admin_user)
+):
+    """Create users in bulk from a CSV or JSON file (admin only).
+
+    Columns/keys: email, password, and optionally role and tenant_id. Each row
+    is reported as created, duplicate or error.
+    """
+    rows = parse_rows(file.filename or "", await file.read())
+    results = await import_users(rows, current_admin)
+    created = sum(1 for result in results if result["status"] == "created")
+    
+    return UserImportResponse(
+        results=[UserImportResult(**result) for result in results],
+        created=created,
+        failed=len(results) - created
+    )
+
+
 @router.patch("/users/{user_id}", response_model=UserResponse)
 async def update_user(
     user_id: str,
@@ -148,12 +200,7 @@ async def update_user(
     users_collection = get_collection("users")
     
     # Check if user exists
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    await get_tenant_user(user_id, current_admin)
     
     # Build update data
     update_data = {}
@@ -163,6 +210,9 @@ async def update_user(
         update_data["role"] = user_update.role
     if user_update.is_active is not None:
         update_data["is_active"] = user_update.is_active
+    if user_update.tenant_id is not None:
+        # Only platform admins can move users between tenants
+        update_data["tenant_id"] = admin_tenant(current_admin, user_update.tenant_id)
     
     if not update_data:
         raise HTTPException(
@@ -190,6 +240,7 @@ async def update_user(
         email=updated_user["email"],
         role=updated_user["role"],
         is_active=updated_user["is_active"],
+        tenant_id=updated_user.get("tenant_id"),
         created_at=updated_user["created_at"]
     )
 
@@ -199,36 +250,42 @@ async def delete_user(
     user_id: str,
     current_admin: UserResponse = Depends(get_current_admin_user)
 ):
-    """Delete user (admin only)."""
+    """Delete user (admin only); their threads and messages are removed in the background."""
     users_collection = get_collection("users")
     
     # Check if user exists
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found"
-        )
+    await get_tenant_user(user_id, current_admin)
     
-    # Delete user
-    result = await users_collection.delete_one({"_id": ObjectId(user_id)})
+    # Tombstone the user; the garbage collector removes them with their threads
+    result = await users_collection.update_one(
+        {"_id": ObjectId(user_id), "deleted_at": None},
+        {"$set": {"deleted_at": datetime.now(timezone.utc), "is_active": False}}
+    )
     
-    if result.deleted_count == 0:
+    if result.modified_count == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to delete user"
         )
     
+    wake_collector()
     return {"message": "User deleted successfully"}
 
 
 # Document Management Endpoints
-@router.post("/documents/upload", response_model=DocumentResponse)
+@router.post("/documents/upload", response_model=DocumentResponse, dependencies=[Depends(upload_rate_limit)])
 async def upload_document(
     file: UploadFile = File(...),
-    current_admin: UserResponse = Depends(get_current_admin_user)
+    tags: Optional[str] = Form(None),
+    tenant_id: Optional[str] = Form(None),
+    current_admin: UserResponse = Depends(get_current_admin_user),
+    rag_engine: RAGEngine = Depends(get_rag_engine)
 ):
-    """Upload PDF or Word document (admin only)."""
+    """Upload PDF or Word document into the admin's tenant (admin only).
+
+    ``tags`` is a comma-separated list for scoped retrieval; platform admins may
+    pass ``tenant_id`` to load another tenant's knowledge base.
+    """
     # Validate file type
     file_extension = file.filename.lower()
     if not (file_extension.endswith('.pdf') or file_extension.endswith('.docx')):
@@ -237,6 +294,9 @@ async def upload_document(
             detail="Only PDF (.pdf) and Word (.docx) files are allowed"
         )
     
+    tag_list = [tag.strip() for tag in (tags or "").split(",") if tag.strip()]
+    tenant_id = admin_tenant(current_admin, tenant_id)
+    
     # Save file temporarily with appropriate extension
     file_extension = '.pdf' if file.filename.lower().endswith('.pdf') else '.docx'
     with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
@@ -251,7 +311,10 @@ async def upload_document(
         rag_success = False
         
         try:
-            doc_id, page_count = rag_engine.add_document(temp_file_path, file.filename)
+            # Embedding waits on the OpenAI scheduler; keep that off the event loop
+            doc_id, page_count = await asyncio.to_thread(
+                rag_engine.add_document, temp_file_path, file.filename, tags=tag_list, tenant_id=tenant_id
+            )
             rag_success = True
         except Exception as rag_error:
             # Generate a fallback doc_id if RAG fails
@@ -281,6 +344,8 @@ async def upload_document(
             "filename": file.filename,
             "size_bytes": len(content),
             "page_count": page_count,
+            "tags": tag_list,
+            "tenant_id": tenant_id,
             "rag_processed": rag_success,  # Track if RAG processing was successful
             "created_at": datetime.now(timezone.utc)
         }
@@ -299,6 +364,8 @@ async def upload_document(
             filename=file.filename,
             size_bytes=len(content),
             page_count=page_count,
+            tags=tag_list,
+            tenant_id=tenant_id,
             created_at=doc_doc["created_at"]
         )
     
@@ -315,14 +382,68 @@ async def upload_document(
             pass
 
 
+@router.post("/documents/bulk-upload", response_model=BulkUploadResponse, dependencies=[Depends(upload_rate_limit)])
+async def bulk_upload_documents(
+    files: List[UploadFile] = File(...),
+    tags: Optional[str] = Form(None),
+    tenant_id: Optional[str] = Form(None),
+    current_admin: UserResponse = Depends(get_current_admin_user),
+    rag_engine: RAGEngine = Depends(get_rag_engine)
+):
+    """Upload many PDF/Word files or zip archives of them in one request (admin only).
+
+    Every file and archive member gets its own result; one bad file does not
+    fail the rest.
+    """
+    tag_list = [tag.strip() for tag in (tags or "").split(",") if tag.strip()]
+    tenant_id = admin_tenant(current_admin, tenant_id)
+    
+    results = await IngestPipeline(rag_engine, tags=tag_list, tenant_id=tenant_id).run(files)
+    
+    # Save metadata for every ingested item in one round trip
+    created_at = datetime.now(timezone.utc)
+    ingested = [result for result in results if result["status"] == "ok"]
+    if ingested:
+        documents_collection = get_collection("documents")
+        doc_docs = [
+            {
+                "doc_id": result["doc_id"],
+                "filename": result["filename"],
+                "size_bytes": result["size_bytes"],
+                "page_count": result["page_count"],
+                "tags": tag_list,
+                "tenant_id": tenant_id,
+                "rag_processed": True,
+                "created_at": created_at
+            }
+            for result in ingested
+        ]
+        try:
+            insert_result = await documents_collection.insert_many(doc_docs, ordered=False)
+        except Exception as db_error:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to save document metadata: {str(db_error)}"
+            )
+        for result, inserted_id in zip(ingested, insert_result.inserted_ids):
+            result["id"] = str(inserted_id)
+    
+    return BulkUploadResponse(
+        items=[BulkUploadItem(**result) for result in results],
+        succeeded=len(ingested),
+        failed=len(results) - len(ingested)
+    )
+
+
 @router.get("/documents", response_model=List[DocumentResponse])
 async def list_documents(
+    tenant_id: Optional[str] = None,
     current_admin: UserResponse = Depends(get_current_admin_user)
 ):
-    """List all documents (admin only)."""
+    """List the documents of the admin's tenant (platform admins may pass ``tenant_id``)."""
     documents_collection = get_collection("documents")
     
-    cursor = documents_collection.find({})
+    cursor = documents_collection.find({**tenant_filter(admin_tenant(current_admin, tenant_id)), "deleted_at": None})
     documents = []
     
     async for doc in cursor:
@@ -333,6 +454,8 @@ async def list_documents(
             filename=doc.get("filename", "Unknown"),
             size_bytes=doc.get("size_bytes", 0),
             page_count=doc.get("page_count", 0),
+            tags=doc.get("tags", []),
+            tenant_id=doc.get("tenant_id"),
             created_at=doc.get("created_at", datetime.now(timezone.utc))
         ))
     
@@ -344,7 +467,7 @@ async def delete_document(
     doc_id: str,
     current_admin: UserResponse = Depends(get_current_admin_user)
 ):
-    """Delete document (admin only)."""
+    """Delete document (admin only); its vector points are removed in the background."""
     documents_collection = get_collection("documents")
     
     # Validate doc_id
@@ -355,28 +478,161 @@ async def delete_document(
         )
     
     # Get document metadata
-    doc = await documents_collection.find_one({"doc_id": doc_id})
-    if not doc:
+    doc = await documents_collection.find_one({"doc_id": doc_id, "deleted_at": None})
+    if not doc or (not is_platform_admin(current_admin) and tenant_of(doc) != tenant_of(current_admin)):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Document not found"
         )
     
-    # Delete from Qdrant vector store
-    success = rag_engine.delete_document(doc_id)
-    if not success:
+    # Tombstone the document; the garbage collector removes its points from the tenant's collection
+    result = await documents_collection.update_one(
+        {"_id": doc["_id"], "deleted_at": None},
+        {"$set": {"deleted_at": datetime.now(timezone.utc)}}
+    )
+    
+    if result.modified_count == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Failed to delete document metadata"
+        )
+    
+    wake_collector()
+    return {"message": "Document deleted successfully"}
+
+
+# FAQ Management Endpoints
+def faq_response(entry: dict) -> FAQResponse:
+    return FAQResponse(
+        id=str(entry["_id"]),
+        questions=entry["questions"],
+        answer=entry["answer"],
+        doc_ids=entry.get("doc_ids", []),
+        tenant_id=entry.get("tenant_id"),
+        created_at=entry["created_at"],
+        updated_at=entry["updated_at"]
+    )
+
+
+async def embed_questions(rag_engine: RAGEngine, questions: List[str]) -> dict:
+    """Embed FAQ question variants once, at save time."""
+    try:
+        embeddings = await asyncio.to_thread(rag_engine.get_openai_embeddings, questions)
+    except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to delete document from vector store"
+            detail=f"Failed to embed FAQ questions: {str(e)}"
+        )
+    return {"embeddings": embeddings, "embedding_model": settings.embedding_model}
+
+
+async def get_tenant_faq(faq_id: str, current_admin) -> dict:
+    """Load an FAQ entry the admin may manage."""
+    faqs_collection = get_collection("faqs")
+    entry = await faqs_collection.find_one({"_id": ObjectId(faq_id)})
+    if not entry or (not is_platform_admin(current_admin) and tenant_of(entry) != tenant_of(current_admin)):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="FAQ entry not found"
         )
+    return entry
+
+
+async def publish_faq_change(tenant_id: str, query_router: QueryRouter):
+    """Reload this worker's FAQ now and tell the others to reload theirs."""
+    await bump_revision(tenant_id)
+    await query_router.faq_index.refresh(tenant_id)
+
+
+@router.get("/faqs", response_model=List[FAQResponse])
+async def list_faqs(
+    tenant_id: Optional[str] = None,
+    current_admin: UserResponse = Depends(get_current_admin_user)
+):
+    """List the FAQ entries of the admin's tenant (platform admins may pass ``tenant_id``)."""
+    faqs_collection = get_collection("faqs")
+    cursor = faqs_collection.find(tenant_filter(admin_tenant(current_admin, tenant_id)), {"embeddings": 0})
+    return [faq_response(entry) async for entry in cursor.sort("created_at", 1)]
+
+
+@router.post("/faqs", response_model=FAQResponse)
+async def create_faq(
+    faq_data: FAQCreate,
+    current_admin: UserResponse = Depends(get_current_admin_user),
+    rag_engine: RAGEngine = Depends(get_rag_engine),
+    query_router: QueryRouter = Depends(get_query_router)
+):
+    """Create an FAQ entry; its question variants are embedded once here (admin only)."""
+    faqs_collection = get_collection("faqs")
+    tenant_id = admin_tenant(current_admin, faq_data.tenant_id)
+    
+    current_time = datetime.now(timezone.utc)
+    entry = {
+        "tenant_id": tenant_id,
+        "questions": faq_data.questions,
+        "answer": faq_data.answer,
+        "doc_ids": faq_data.doc_ids,
+        "created_at": current_time,
+        "updated_at": current_time,
+        **await embed_questions(rag_engine, faq_data.questions)
+    }
+    
+    result = await faqs_collection.insert_one(entry)
+    entry["_id"] = result.inserted_id
+    await publish_faq_change(tenant_id, query_router)
     
-    # Delete from MongoDB
-    result = await documents_collection.delete_one({"doc_id": doc_id})
+    return faq_response(entry)
+
+
+@router.patch("/faqs/{faq_id}", response_model=FAQResponse)
+async def update_faq(
+    faq_id: str,
+    faq_update: FAQUpdate,
+    current_admin: UserResponse = Depends(get_current_admin_user),
+    rag_engine: RAGEngine = Depends(get_rag_engine),
+    query_router: QueryRouter = Depends(get_query_router)
+):
+    """Update an FAQ entry, re-embedding its questions if they changed (admin only)."""
+    faqs_collection = get_collection("faqs")
+    entry = await get_tenant_faq(faq_id, current_admin)
     
-    if result.deleted_count == 0:
+    update_data = faq_update.model_dump(exclude_none=True)
+    if not update_data:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Failed to delete document metadata"
+            detail="No fields to update"
         )
+    if "questions" in update_data:
+        update_data.update(await embed_questions(rag_engine, update_data["questions"]))
+    update_data["updated_at"] = datetime.now(timezone.utc)
     
-    return {"message": "Document deleted successfully"}
+    await faqs_collection.update_one({"_id": entry["_id"]}, {"$set": update_data})
+    await publish_faq_change(tenant_of(entry), query_router)
+    
+    entry.update(update_data)
+    return faq_response(entry)
+
+
+@router.delete("/faqs/{faq_id}")
+async def delete_faq(
+    faq_id: str,
+    current_admin: UserResponse = Depends(get_current_admin_user),
+    query_router: QueryRouter = Depends(get_query_router)
+):
+    """Delete an FAQ entry (admin only)."""
+    faqs_collection = get_collection("faqs")
+    entry = await get_tenant_faq(faq_id, current_admin)
+    
+    await faqs_collection.delete_one({"_id": entry["_id"]})
+    await publish_faq_change(tenant_of(entry), query_router)
+    
+    return {"message": "FAQ entry deleted successfully"}
+
+
+# System Endpoints
+@router.get("/pools")
+async def get_pool_stats(
+    current_admin: UserResponse = Depends(get_current_admin_user)
+):
+    """Connection pool statistics for MongoDB, OpenAI and Qdrant (admin only)."""
+    return pool_stats()
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, status, Depends
+from pymongo.errors import DuplicateKeyError
 from app.models import LoginRequest, SignupRequest, Token, UserResponse
 from app.auth import authenticate_user, create_access_token, get_password_hash, get_current_admin_user, get_current_user
 from app.database import get_collection
 from datetime import timedelta
 from app.config import settings
+from app.tenants import tenant_of
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -37,6 +39,7 @@ async def get_current_user_info(current_user = Depends(get_current_user)):
         email=current_user.email,
         role=current_user.role,
         is_active=current_user.is_active,
+        tenant_id=current_user.tenant_id,
         created_at=current_user.created_at
     )
 
@@ -64,13 +67,20 @@ async def signup(signup_data: SignupRequest, current_admin: UserResponse = Depen
         "email": signup_data.email,
         "hashed_password": password_hash,
         "role": signup_data.role,
+        "tenant_id": tenant_of(current_admin),
         "is_active": True,
         "created_at": current_time,
         "updated_at": current_time
     }
     
-    # Insert user
-    result = await users_collection.insert_one(user_doc)
+    # Insert user; the unique email index catches a concurrent signup or import
+    try:
+        result = await users_collection.insert_one(user_doc)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Email already registered"
+        )
     
     # Return user response (without password)
     user_response = UserResponse(
@@ -1,118 +1,360 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+import json
+import math
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status, Depends
+from fastapi.encoders import jsonable_encoder
+from pydantic import ValidationError
 from app.models import ChatRequest, ChatResponse, MessageResponse, MessageRole
-from app.auth import get_current_user
+from app.auth import get_current_user, user_from_token
+from app.config import settings
 from app.database import get_collection
-from app.chat import chat_service
-from app.rag import rag_engine
-from typing import List, Optional
+from app.chat import ERROR_REPLY, ChatService, llm_unavailable
+from app.messages import append_messages, ensure_summary, get_message_repository, remove_message, summary_update
+from app.query_router import QueryRouter
+from app.ratelimit import chat_rate_limit
+from app.resilience import CircuitOpenError, chat_admission
+from app.services import get_chat_service, get_query_router
+from app.tenants import can_access_thread, tenant_of
+from app.responses import FastJSONResponse, cache_headers, etag_matches, not_modified, serialize_message, weak_etag
+from typing import Awaitable, Callable, Dict, List, Optional
 from datetime import datetime, timezone
 from bson import ObjectId
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
 
-@router.post("/{thread_id}/message", response_model=ChatResponse)
-async def send_message(
-    thread_id: str,
-    chat_request: ChatRequest,
-    current_user = Depends(get_current_user)
-):
-    """Send a message in a thread and get RAG-powered response."""
+async def prepare_query(message: str, tenant_id: str, query_router: QueryRouter, chat_service: ChatService,
+                        query_embedding: Optional[List[float]] = None):
+    """Fast-path answer for ``message``, or the query embedding RAG will search with."""
+    await query_router.faq_index.maybe_refresh(tenant_id)
+    chat_response = query_router.route(message, tenant_id)
+    if chat_response is not None:
+        return chat_response, None
+    try:
+        if query_embedding is None:
+            query_embedding = await asyncio.to_thread(chat_service.rag_engine.get_openai_embedding, message)
+        # One embedding serves both the FAQ similarity check and retrieval
+        if query_router.wants_embedding(tenant_id):
+            chat_response = query_router.match_faq(query_embedding, tenant_id)
+    except Exception as e:
+        print(f"Error matching FAQ: {e}")
+    return chat_response, query_embedding
+
+
+async def chat_turn(thread_id: str, chat_request: ChatRequest, current_user, chat_service: ChatService,
+                    query_router: QueryRouter, generate: Callable[..., Awaitable[ChatResponse]]) -> ChatResponse:
+    """Check the thread, answer ``chat_request`` and store both messages.
+
+    ``generate(message, doc_ids, tags, tenant_id, query_embedding)`` produces the
+    RAG answer when the fast path does not; cancelling the turn keeps the question.
+    """
     threads_collection = get_collection("threads")
-    messages_collection = get_collection("messages")
     
-    # Verify thread exists and user has access
-    thread = await threads_collection.find_one({"_id": ObjectId(thread_id)})
-    if not thread:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Thread not found"
-        )
-    
-    # Check if user owns the thread or is admin
-    if thread["owner_user_id"] != current_user.id and current_user.role != "admin":
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
-        )
+    # Embed the question while the thread is checked; threads belong to their owner's tenant
+    guessed_tenant = tenant_of(current_user)
+    prepared = asyncio.create_task(
+        prepare_query(chat_request.message, guessed_tenant, query_router, chat_service)
+    )
+    try:
+        # Verify thread exists and user has access
+        thread = await threads_collection.find_one({"_id": ObjectId(thread_id), "deleted_at": None})
+        if not thread:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Thread not found"
+            )
+        
+        # Check if user owns the thread or is an admin of its tenant
+        if not can_access_thread(thread, current_user):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not enough permissions"
+            )
+        thread = await ensure_summary(thread)
+    except BaseException:
+        prepared.cancel()
+        raise
     
-    # Save user message
-    user_message_doc = {
-        "thread_id": thread_id,
+    # Save user message while retrieval and generation run; the thread is updated once per turn
+    user_message = {
         "role": MessageRole.USER,
         "content": chat_request.message,
         "created_at": datetime.now(timezone.utc),
         "retrieval_refs": None
     }
+    user_write = asyncio.create_task(get_message_repository().add(thread_id, [user_message]))
     
-    await messages_collection.insert_one(user_message_doc)
+    try:
+        # Per-message scope wins over the thread's scope
+        if chat_request.doc_ids is not None or chat_request.tags is not None:
+            doc_ids, tags = chat_request.doc_ids, chat_request.tags
+        else:
+            doc_ids, tags = thread.get("doc_ids"), thread.get("tags")
+        
+        # Answer small talk and FAQ questions directly; everything else goes through RAG
+        tenant_id = tenant_of(thread)
+        chat_response, query_embedding = await prepared
+        if tenant_id != guessed_tenant:
+            # A platform admin writing in another tenant's thread gets that tenant's FAQ
+            chat_response, query_embedding = await prepare_query(
+                chat_request.message, tenant_id, query_router, chat_service, query_embedding
+            )
+        if chat_response is None:
+            chat_response = await generate(chat_request.message, doc_ids, tags, tenant_id, query_embedding)
+    except BaseException:
+        # Keep the thread's summary in step with the stored question
+        await user_write
+        await threads_collection.update_one({"_id": ObjectId(thread_id)}, summary_update([user_message]))
+        raise
     
-    # Process message with RAG
-    chat_response = await chat_service.process_chat_message(chat_request.message)
-    
-    # Save assistant message
-    assistant_message_doc = {
-        "thread_id": thread_id,
+    # Save assistant message and update the thread's summary and updated_at in one step
+    await append_messages(thread_id, [{
         "role": MessageRole.ASSISTANT,
         "content": chat_response.message,
         "created_at": datetime.now(timezone.utc),
         "retrieval_refs": [ref.model_dump() for ref in chat_response.retrieval_refs] if chat_response.retrieval_refs else []
-    }
+    }], written=await user_write)
     
-    await messages_collection.insert_one(assistant_message_doc)
+    return chat_response
+
+
+@router.post("/{thread_id}/message", response_model=ChatResponse, dependencies=[Depends(chat_rate_limit)])
+async def send_message(
+    thread_id: str,
+    chat_request: ChatRequest,
+    current_user = Depends(get_current_user),
+    chat_service: ChatService = Depends(get_chat_service),
+    query_router: QueryRouter = Depends(get_query_router)
+):
+    """Send a message in a thread and get RAG-powered response (small talk and FAQ hits skip RAG).
+
+    Limited per user (429 with Retry-After), and answered with 503 and
+    Retry-After while too many turns are in progress.
+    """
+    async def generate(message, doc_ids, tags, tenant_id, query_embedding):
+        return await chat_service.process_chat_message(
+            message, doc_ids=doc_ids, tags=tags, tenant_id=tenant_id, query_embedding=query_embedding
+        )
     
-    # Update thread timestamp
-    await threads_collection.update_one(
-        {"_id": ObjectId(thread_id)},
-        {"$set": {"updated_at": datetime.now(timezone.utc)}}
-    )
+    with chat_admission.admit():
+        return await chat_turn(thread_id, chat_request, current_user, chat_service, query_router, generate)
+
+
+class ChatChannel:
+    """One authenticated WebSocket carrying chat turns for any number of threads.
+
+    Client frames are ``{"type": "send", "ref", "thread_id", "message", "doc_ids"?, "tags"?}``
+    and ``{"type": "cancel", "ref"}``. Each turn answers with ``refs`` and
+    ``token`` frames while the answer streams, then ``done`` (or ``cancelled`` /
+    ``error``), all tagged with the client's ``ref``.
+    """
+
+    def __init__(self, websocket: WebSocket, user, chat_service: ChatService, query_router: QueryRouter):
+        self.websocket = websocket
+        self.user = user
+        self.chat_service = chat_service
+        self.query_router = query_router
+        self.turns: Dict[str, asyncio.Task] = {}
+        self.send_lock = asyncio.Lock()
+
+    async def send(self, payload: dict):
+        # Turns stream concurrently; frames must not interleave on the socket
+        async with self.send_lock:
+            await self.websocket.send_text(json.dumps(jsonable_encoder(payload)))
+
+    async def error(self, ref, status_code: int, detail, retry_after: Optional[int] = None):
+        frame = {"type": "error", "ref": ref, "status": status_code, "detail": detail}
+        if retry_after is not None:
+            frame["retry_after"] = retry_after
+        await self.send(frame)
+
+    def handle(self, frame: dict):
+        ref = frame.get("ref")
+        if frame.get("type") == "cancel":
+            if ref in self.turns:
+                self.turns[ref].cancel()
+            return None
+        if frame.get("type") != "send":
+            return self.error(ref, status.HTTP_400_BAD_REQUEST, "Unknown frame type")
+        if not isinstance(ref, str) or ref in self.turns:
+            return self.error(ref, status.HTTP_400_BAD_REQUEST, "Each send needs a new string ref")
+        if len(self.turns) >= settings.ws_max_concurrent_turns:
+            return self.error(ref, status.HTTP_429_TOO_MANY_REQUESTS, "Too many answers in progress")
+        self.turns[ref] = asyncio.create_task(self.run_turn(ref, frame))
+        return None
+
+    async def run_turn(self, ref: str, frame: dict):
+        try:
+            thread_id = frame.get("thread_id")
+            if not isinstance(thread_id, str) or not ObjectId.is_valid(thread_id):
+                return await self.error(ref, status.HTTP_404_NOT_FOUND, "Thread not found")
+            try:
+                chat_request = ChatRequest(**{key: frame[key] for key in ("message", "doc_ids", "tags") if key in frame})
+            except ValidationError as e:
+                return await self.error(ref, status.HTTP_422_UNPROCESSABLE_ENTITY, e.errors(include_url=False, include_context=False))
+            
+            if settings.rate_limit_enabled:
+                decision = await chat_rate_limit.check(self.user.id)
+                if not decision.allowed:
+                    return await self.error(ref, status.HTTP_429_TOO_MANY_REQUESTS, "Rate limit exceeded",
+                                            math.ceil(decision.retry_after))
+            
+            async def generate(message, doc_ids, tags, tenant_id, query_embedding):
+                plan = None
+                try:
+                    plan = await asyncio.to_thread(self.chat_service.plan_answer, message, doc_ids, tags, tenant_id, query_embedding)
+                    await self.send({"type": "refs", "ref": ref, "retrieval_refs": plan.retrieval_refs})
+                    if plan.reply is not None:
+                        return ChatResponse(message=plan.reply, retrieval_refs=plan.retrieval_refs)
+                    tokens = []
+                    async for token in self.chat_service.stream_answer(plan):
+                        tokens.append(token)
+                        await self.send({"type": "token", "ref": ref, "text": token})
+                    return ChatResponse(message="".join(tokens).strip(), retrieval_refs=plan.retrieval_refs)
+                except Exception as e:
+                    if llm_unavailable(e):
+                        print(f"LLM unavailable, answering from retrieval alone: {e}")
+                        return await asyncio.to_thread(self.chat_service.retrieval_only_answer, message, plan, doc_ids, tags, tenant_id)
+                    if isinstance(e, CircuitOpenError):
+                        raise
+                    print(f"Error streaming answer: {e}")
+                    return ChatResponse(message=ERROR_REPLY, retrieval_refs=[])
+            
+            with chat_admission.admit():
+                chat_response = await chat_turn(thread_id, chat_request, self.user, self.chat_service, self.query_router, generate)
+            await self.send({"type": "done", "ref": ref, "thread_id": thread_id, **chat_response.model_dump()})
+        except asyncio.CancelledError:
+            # Stopping the stream has already closed the upstream request
+            try:
+                await self.send({"type": "cancelled", "ref": ref})
+            except Exception:
+                pass
+        except HTTPException as e:
+            retry_after = (e.headers or {}).get("Retry-After")
+            await self.error(ref, e.status_code, e.detail, int(retry_after) if retry_after else None)
+        except CircuitOpenError as e:
+            await self.error(ref, status.HTTP_503_SERVICE_UNAVAILABLE, str(e), max(1, round(e.retry_after)))
+        except Exception as e:
+            print(f"Error in chat turn: {e}")
+            await self.error(ref, status.HTTP_500_INTERNAL_SERVER_ERROR, ERROR_REPLY)
+        finally:
+            self.turns.pop(ref, None)
+
+    async def close(self):
+        """Cancel every turn still running, aborting their LLM requests."""
+        turns = list(self.turns.values())
+        for turn in turns:
+            turn.cancel()
+        await asyncio.gather(*turns, return_exceptions=True)
+
+
+@router.websocket("/ws")
+async def chat_socket(
+    websocket: WebSocket,
+    chat_service: ChatService = Depends(get_chat_service),
+    query_router: QueryRouter = Depends(get_query_router)
+):
+    """Streaming chat over one WebSocket; the first frame must be ``{"type": "auth", "token"}``."""
+    await websocket.accept()
+    try:
+        frame = json.loads(await asyncio.wait_for(websocket.receive_text(), settings.ws_auth_timeout))
+        if frame.get("type") != "auth" or not isinstance(frame.get("token"), str):
+            raise ValueError("first frame must authenticate")
+        user = await user_from_token(frame["token"])
+    except WebSocketDisconnect:
+        return
+    except (HTTPException, asyncio.TimeoutError, ValueError, AttributeError):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
     
-    return chat_response
+    channel = ChatChannel(websocket, user, chat_service, query_router)
+    await channel.send({"type": "ready", "user_id": user.id})
+    try:
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+                reply = channel.handle(frame) if isinstance(frame, dict) else channel.error(None, status.HTTP_400_BAD_REQUEST, "Frames are JSON objects")
+            except ValueError:
+                reply = channel.error(None, status.HTTP_400_BAD_REQUEST, "Frames are JSON objects")
+            if reply is not None:
+                await reply
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await channel.close()
 
 
 @router.get("/{thread_id}/messages", response_model=List[MessageResponse])
 async def get_messages(
     thread_id: str,
+    request: Request,
     skip: int = 0,
     limit: int = 50,
     current_user = Depends(get_current_user)
 ):
     """Get paginated messages from a thread."""
     threads_collection = get_collection("threads")
-    messages_collection = get_collection("messages")
+    message_repository = get_message_repository()
     
     # Verify thread exists and user has access
-    thread = await threads_collection.find_one({"_id": ObjectId(thread_id)})
+    thread = await threads_collection.find_one({"_id": ObjectId(thread_id), "deleted_at": None})
     if not thread:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Thread not found"
         )
     
-    # Check if user owns the thread or is admin
-    if thread["owner_user_id"] != current_user.id and current_user.role != "admin":
+    # Check if user owns the thread or is an admin of its tenant
+    if not can_access_thread(thread, current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
+    # Sends and deletes bump updated_at and the thread's message count, so the page is unchanged when both match
+    thread = await ensure_summary(thread)
+    etag = weak_etag(thread["updated_at"].isoformat(), thread["message_count"], skip, limit)
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    
     # Get messages with pagination
-    cursor = messages_collection.find(
-        {"thread_id": thread_id}
-    ).sort("created_at", 1).skip(skip).limit(limit)
+    page = await message_repository.page(thread_id, skip, limit)
     
-    messages = []
-    async for message in cursor:
-        messages.append(MessageResponse(
-            id=str(message["_id"]),
-            thread_id=message["thread_id"],
-            role=message["role"],
-            content=message["content"],
-            created_at=message["created_at"],
-            retrieval_refs=message.get("retrieval_refs")
-        ))
+    # Rows come from our own writes, so skip re-validating them into models
+    messages = [serialize_message(message) for message in page]
     
-    return messages
+    return FastJSONResponse(messages, headers=cache_headers(etag))
+
+
+@router.get("/{thread_id}/messages/since", response_model=List[MessageResponse])
+async def get_messages_since(
+    thread_id: str,
+    message_id: Optional[str] = None,
+    limit: int = 100,
+    current_user = Depends(get_current_user)
+):
+    """Get messages newer than ``message_id`` (from the start when omitted)."""
+    threads_collection = get_collection("threads")
+    message_repository = get_message_repository()
+    
+    # Verify thread exists and user has access
+    thread = await threads_collection.find_one({"_id": ObjectId(thread_id), "deleted_at": None})
+    if not thread:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Thread not found"
+        )
+    
+    # Check if user owns the thread or is an admin of its tenant
+    if not can_access_thread(thread, current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    
+    messages = [serialize_message(message) for message in await message_repository.since(thread_id, message_id, limit)]
+    
+    return FastJSONResponse(messages)
 
 
 @router.delete("/messages/{message_id}")
@@ -122,10 +364,10 @@ async def delete_message(
 ):
     """Delete a specific message (owner or admin only)."""
     threads_collection = get_collection("threads")
-    messages_collection = get_collection("messages")
+    message_repository = get_message_repository()
     
     # Get message
-    message = await messages_collection.find_one({"_id": ObjectId(message_id)})
+    message = await message_repository.get(message_id)
     if not message:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -133,24 +375,23 @@ async def delete_message(
         )
     
     # Get thread to check ownership
-    thread = await threads_collection.find_one({"_id": ObjectId(message["thread_id"])})
+    thread = await threads_collection.find_one({"_id": ObjectId(message["thread_id"]), "deleted_at": None})
     if not thread:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Thread not found"
         )
     
-    # Check permissions (thread owner or admin)
-    if thread["owner_user_id"] != current_user.id and current_user.role != "admin":
+    # Check permissions (thread owner or tenant admin)
+    if not can_access_thread(thread, current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
-    # Delete message
-    result = await messages_collection.delete_one({"_id": ObjectId(message_id)})
-    
-    if result.deleted_count == 0:
+    # Delete message; a thread without a summary gets one first so the count starts right
+    await ensure_summary(thread)
+    if not await remove_message(message):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to delete message"
@@ -166,24 +407,23 @@ async def get_message_count(
 ):
     """Get total message count for a thread."""
     threads_collection = get_collection("threads")
-    messages_collection = get_collection("messages")
     
     # Verify thread exists and user has access
-    thread = await threads_collection.find_one({"_id": ObjectId(thread_id)})
+    thread = await threads_collection.find_one({"_id": ObjectId(thread_id), "deleted_at": None})
     if not thread:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Thread not found"
         )
     
-    # Check if user owns the thread or is admin
-    if thread["owner_user_id"] != current_user.id and current_user.role != "admin":
+    # Check if user owns the thread or is an admin of its tenant
+    if not can_access_thread(thread, current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
-    # Count messages
-    count = await messages_collection.count_documents({"thread_id": thread_id})
+    # The thread keeps its own count
+    thread = await ensure_summary(thread)
     
-    return {"count": count}
+    return {"count": thread["message_count"]}
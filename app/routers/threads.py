@@ -1,9 +1,14 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+import asyncio
+from fastapi import APIRouter, HTTPException, Request, status, Depends
 from app.models import ThreadCreate, ThreadUpdate, ThreadResponse
 from app.auth import get_current_user, get_current_admin_user
 from app.database import get_collection
+from app.messages import ensure_summary
+from app.services import wake_collector
+from app.tenants import can_access_thread, tenant_filter, tenant_of
+from app.responses import FastJSONResponse, cache_headers, etag_matches, not_modified, serialize_thread, weak_etag
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from bson import ObjectId
 
 router = APIRouter(prefix="/threads", tags=["Threads"])
@@ -29,8 +34,14 @@ async def create_thread(
     thread_doc = {
         "title": title,
         "owner_user_id": current_user.id,
+        "tenant_id": tenant_of(current_user),
         "created_at": current_time,
-        "updated_at": current_time
+        "updated_at": current_time,
+        "doc_ids": thread_data.doc_ids,
+        "tags": thread_data.tags,
+        "message_count": 0,
+        "last_message_preview": None,
+        "last_activity_at": None
     }
     
     # Insert thread
@@ -40,40 +51,47 @@ async def create_thread(
         id=str(result.inserted_id),
         title=title,
         owner_user_id=current_user.id,
+        tenant_id=thread_doc["tenant_id"],
         created_at=thread_doc["created_at"],
-        updated_at=thread_doc["updated_at"]
+        updated_at=thread_doc["updated_at"],
+        doc_ids=thread_doc["doc_ids"],
+        tags=thread_doc["tags"]
     )
 
 
 @router.get("", response_model=List[ThreadResponse])
 async def list_threads(
+    request: Request,
     current_user = Depends(get_current_user)
 ):
-    """List threads (users see their own, admins see all)."""
+    """List threads (users see their own, admins see all of their tenant's)."""
     threads_collection = get_collection("threads")
     
     # Build query based on user role
     if current_user.role == "admin":
-        # Admin sees all threads
-        query = {}
+        # Admin sees all threads of their tenant
+        query = tenant_filter(tenant_of(current_user))
     else:
         # Regular user sees only their threads
         query = {"owner_user_id": current_user.id}
+    query["deleted_at"] = None
     
-    # Get threads
+    # Any create, rename, delete or new message changes the count or the newest updated_at
+    latest_cursor = threads_collection.find(query, {"updated_at": 1}).sort("updated_at", -1).limit(1)
+    count, latest = await asyncio.gather(
+        threads_collection.count_documents(query),
+        latest_cursor.to_list(1)
+    )
+    etag = weak_etag(current_user.id, count, latest[0]["updated_at"].isoformat() if latest else "")
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return not_modified(etag)
+    
+    # Get threads; each carries its own message summary, so no message is read
     cursor = threads_collection.find(query).sort("updated_at", -1)
-    threads = []
-    
-    async for thread in cursor:
-        threads.append(ThreadResponse(
-            id=str(thread["_id"]),
-            title=thread["title"],
-            owner_user_id=thread["owner_user_id"],
-            created_at=thread["created_at"],
-            updated_at=thread["updated_at"]
-        ))
-    
-    return threads
+    # Rows come from our own writes, so skip re-validating them into models
+    threads = [serialize_thread(await ensure_summary(thread)) async for thread in cursor]
+    
+    return FastJSONResponse(threads, headers=cache_headers(etag))
 
 
 @router.patch("/{thread_id}", response_model=ThreadResponse)
@@ -82,34 +100,38 @@ async def update_thread(
     thread_update: ThreadUpdate,
     current_user = Depends(get_current_user)
 ):
-    """Update thread title (owner or admin only)."""
+    """Update thread title or retrieval scope (owner or admin only)."""
     threads_collection = get_collection("threads")
     
     # Get thread
-    thread = await threads_collection.find_one({"_id": ObjectId(thread_id)})
+    thread = await threads_collection.find_one({"_id": ObjectId(thread_id), "deleted_at": None})
     if not thread:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Thread not found"
         )
     
-    # Check permissions (owner or admin)
-    if thread["owner_user_id"] != current_user.id and current_user.role != "admin":
+    # Check permissions (owner or tenant admin)
+    if not can_access_thread(thread, current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
+    # Build update data; an empty list clears the scope
+    update_data = thread_update.model_dump(exclude_none=True)
+    if not update_data:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="No fields to update"
+        )
+    
     # Update thread
     from datetime import timezone
+    update_data["updated_at"] = datetime.now(timezone.utc)
     result = await threads_collection.update_one(
         {"_id": ObjectId(thread_id)},
-        {
-            "$set": {
-                "title": thread_update.title,
-                "updated_at": datetime.now(timezone.utc)
-            }
-        }
+        {"$set": update_data}
     )
     
     if result.modified_count == 0:
@@ -121,13 +143,7 @@ async def update_thread(
     # Get updated thread
     updated_thread = await threads_collection.find_one({"_id": ObjectId(thread_id)})
     
-    return ThreadResponse(
-        id=str(updated_thread["_id"]),
-        title=updated_thread["title"],
-        owner_user_id=updated_thread["owner_user_id"],
-        created_at=updated_thread["created_at"],
-        updated_at=updated_thread["updated_at"]
-    )
+    return ThreadResponse(**serialize_thread(await ensure_summary(updated_thread)))
 
 
 @router.delete("/{thread_id}")
@@ -135,35 +151,35 @@ async def delete_thread(
     thread_id: str,
     current_user = Depends(get_current_user)
 ):
-    """Delete thread (owner or admin only)."""
+    """Delete thread (owner or admin only); its messages are removed in the background."""
     threads_collection = get_collection("threads")
-    messages_collection = get_collection("messages")
     
     # Get thread
-    thread = await threads_collection.find_one({"_id": ObjectId(thread_id)})
+    thread = await threads_collection.find_one({"_id": ObjectId(thread_id), "deleted_at": None})
     if not thread:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Thread not found"
         )
     
-    # Check permissions (owner or admin)
-    if thread["owner_user_id"] != current_user.id and current_user.role != "admin":
+    # Check permissions (owner or tenant admin)
+    if not can_access_thread(thread, current_user):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not enough permissions"
         )
     
-    # Delete all messages in the thread
-    await messages_collection.delete_many({"thread_id": thread_id})
-    
-    # Delete thread
-    result = await threads_collection.delete_one({"_id": ObjectId(thread_id)})
+    # Tombstone the thread; the garbage collector deletes it and its messages
+    result = await threads_collection.update_one(
+        {"_id": ObjectId(thread_id), "deleted_at": None},
+        {"$set": {"deleted_at": datetime.now(timezone.utc)}}
+    )
     
-    if result.deleted_count == 0:
+    if result.modified_count == 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Failed to delete thread"
         )
     
+    wake_collector()
     return {"message": "Thread deleted successfully"}
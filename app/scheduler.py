@@ -0,0 +1,219 @@
+"""
+Scheduler for OpenAI calls.
+
+Every embedding and completion request goes through ``openai_scheduler.call``
+so the process shares one view of the account's rate limits:
+
+- requests and tokens sent in the last minute are counted against
+  OPENAI_RPM_LIMIT / OPENAI_TPM_LIMIT (0 = only the server's headers count)
+- ``x-ratelimit-remaining-*`` / ``x-ratelimit-reset-*`` headers of every
+  response (seen through an httpx hook) pause callers until the reset
+  when the server says the budget is spent
+- 429s pause everyone for ``retry-after`` (or a backoff); 429s, timeouts,
+  connection errors and 5xx are retried with jittered exponential backoff,
+  except a 429 for an exhausted quota (``insufficient_quota``), which is
+  raised at once since waiting does not fix it
+- interactive calls (chat, query embeddings) go before background ones
+  (ingestion embeddings), and background calls leave OPENAI_INTERACTIVE_RESERVE
+  of the local budget unused so chat keeps headroom during large uploads
+- while the OpenAI circuit breaker (app.resilience) is open calls fail at
+  once; timeouts, connection errors and 5xx count towards opening it
+
+Calls are blocking and made from worker threads, so waiting uses a
+threading.Condition rather than the event loop.
+"""
+
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, TypeVar
+import httpx
+from openai import APIConnectionError, APIStatusError, APITimeoutError, RateLimitError
+from app.config import settings
+from app.resilience import openai_breaker
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+WINDOW = 60.0
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+T = TypeVar("T")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Seconds in a rate-limit reset header such as ``"1s"``, ``"6m0s"`` or ``"120ms"``."""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token) for budgeting."""
+    return len(text) // 4 + 1
+
+
+def completion_tokens(request: dict) -> int:
+    """Tokens a chat completion request counts against the TPM limit (prompt plus max_tokens)."""
+    prompt = sum(estimate_tokens(message["content"] or "") for message in request["messages"])
+    return prompt + request.get("max_tokens", 0)
+
+
+def is_failure(error: Exception) -> bool:
+    """Whether ``error`` means OpenAI is unreachable or failing (what trips the breaker)."""
+    if isinstance(error, (APIConnectionError, APITimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code >= 500
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, RateLimitError):
+        return error.code != "insufficient_quota"
+    return is_failure(error)
+
+
+class OpenAIScheduler:
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.requests = deque()           # monotonic times of requests in the last WINDOW seconds
+        self.tokens = deque()             # (time, tokens) of the same requests
+        self.token_total = 0
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self.paused_until = 0.0           # set by 429s
+        self.remaining_requests: Optional[int] = None
+        self.remaining_tokens: Optional[int] = None
+        self.requests_reset_at = 0.0
+        self.tokens_reset_at = 0.0
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "failed": 0}
+
+    def prune(self, now: float):
+        while self.requests and now - self.requests[0] >= WINDOW:
+            self.requests.popleft()
+        while self.tokens and now - self.tokens[0][0] >= WINDOW:
+            self.token_total -= self.tokens.popleft()[1]
+
+    def wait_time(self, priority: int, tokens: int, now: float) -> float:
+        """Seconds until a call of ``priority`` costing ``tokens`` may start (0 = now)."""
+        if any(count for other, count in self.waiting.items() if other < priority):
+            # Let the higher-priority callers go first; they notify when they start
+            return 1.0
+        waits = [self.paused_until - now]
+        if self.remaining_requests is not None and self.remaining_requests <= 0:
+            waits.append(self.requests_reset_at - now)
+        if self.remaining_tokens is not None and self.remaining_tokens < tokens:
+            waits.append(self.tokens_reset_at - now)
+
+        share = 1.0 - settings.openai_interactive_reserve if priority > INTERACTIVE else 1.0
+        if settings.openai_rpm_limit and self.requests and len(self.requests) + 1 > settings.openai_rpm_limit * share:
+            waits.append(self.requests[0] + WINDOW - now)
+        if settings.openai_tpm_limit and self.tokens and self.token_total + tokens > settings.openai_tpm_limit * share:
+            waits.append(self.tokens[0][0] + WINDOW - now)
+        return max(0.0, *waits)
+
+    def acquire(self, priority: int, tokens: int):
+        with self.condition:
+            self.waiting[priority] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.prune(now)
+                    delay = self.wait_time(priority, tokens, now)
+                    if delay <= 0:
+                        break
+                    self.condition.wait(min(delay, 1.0))
+            finally:
+                self.waiting[priority] -= 1
+            self.requests.append(now)
+            self.tokens.append((now, tokens))
+            self.token_total += tokens
+            # Spend the server's budget optimistically until the response reports it
+            if self.remaining_requests is not None:
+                self.remaining_requests -= 1
+            if self.remaining_tokens is not None:
+                self.remaining_tokens -= tokens
+            self.condition.notify_all()
+
+    def observe(self, response: httpx.Response):
+        """httpx response hook: record the rate-limit headers OpenAI sends back."""
+        headers = response.headers
+        if "x-ratelimit-remaining-requests" not in headers and "x-ratelimit-remaining-tokens" not in headers:
+            return
+        now = time.monotonic()
+        with self.condition:
+            if "x-ratelimit-remaining-requests" in headers:
+                self.remaining_requests = int(headers["x-ratelimit-remaining-requests"])
+                self.requests_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-requests")) or 0.0)
+            if "x-ratelimit-remaining-tokens" in headers:
+                self.remaining_tokens = int(headers["x-ratelimit-remaining-tokens"])
+                self.tokens_reset_at = now + (parse_duration(headers.get("x-ratelimit-reset-tokens")) or 0.0)
+            self.condition.notify_all()
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(settings.openai_backoff_max, settings.openai_backoff_base * 2 ** attempt))
+
+    def pause(self, seconds: float):
+        """Hold every caller for ``seconds`` (the account is rate limited)."""
+        with self.condition:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def call(self, fn: Callable[[], T], priority: int = INTERACTIVE, tokens: int = 1) -> T:
+        """Run ``fn`` (one OpenAI request) once the budget allows, retrying transient failures.
+
+        Raises ``CircuitOpenError`` without calling OpenAI while its breaker is open.
+        """
+        for attempt in range(settings.openai_max_retries + 1):
+            openai_breaker.check()
+            self.acquire(priority, tokens)
+            try:
+                with self.condition:
+                    self.counters["calls"] += 1
+                result = fn()
+            except Exception as e:
+                # A 429 or 4xx is still an answer from a working service
+                if is_failure(e):
+                    openai_breaker.record_failure()
+                else:
+                    openai_breaker.record_success()
+                if not is_retryable(e) or attempt == settings.openai_max_retries:
+                    with self.condition:
+                        self.counters["failed"] += 1
+                    raise
+                delay = self.backoff(attempt)
+                with self.condition:
+                    self.counters["retries"] += 1
+                if isinstance(e, RateLimitError):
+                    retry_after = parse_duration(e.response.headers.get("retry-after"))
+                    with self.condition:
+                        self.counters["rate_limited"] += 1
+                    self.pause(retry_after if retry_after is not None else delay)
+                else:
+                    time.sleep(delay)
+            else:
+                openai_breaker.record_success()
+                return result
+
+    def stats(self) -> dict:
+        with self.condition:
+            self.prune(time.monotonic())
+            return {
+                **self.counters,
+                "waiting": {PRIORITY_NAMES[priority]: count for priority, count in self.waiting.items()},
+                "requests_last_minute": len(self.requests),
+                "tokens_last_minute": self.token_total,
+                "remaining_requests": self.remaining_requests,
+                "remaining_tokens": self.remaining_tokens
+            }
+
+
+openai_scheduler = OpenAIScheduler()
@@ -0,0 +1,151 @@
+import asyncio
+import httpx
+from app.auth import pwd_context
+from app.clients import create_openai_http_client, create_openai_client, create_qdrant_client, http_pool_stats, qdrant_pool_stats
+from app.config import settings
+from app.database import Database, get_database
+from app.rag import RAGEngine
+from app.chat import ChatService, shutdown_generation_pool
+from app.collector import GarbageCollector
+from app.query_router import QueryRouter
+from app.ratelimit import close_rate_limit_backend
+from app.resilience import breaker_stats, chat_admission
+from app.scheduler import openai_scheduler
+from app.user_import import shutdown_hash_pool
+
+
+class Services:
+    openai_http_client: httpx.Client = None
+    rag_engine: RAGEngine = None
+    chat_service: ChatService = None
+    query_router: QueryRouter = None
+    collector: GarbageCollector = None
+
+
+async def init_services():
+    """Build the shared clients, RAG engine and chat service and prepare the vector collection."""
+    Services.openai_http_client = create_openai_http_client()
+    Services.rag_engine = RAGEngine(
+        qdrant_client=create_qdrant_client(),
+        openai_client=create_openai_client(Services.openai_http_client)
+    )
+    Services.chat_service = ChatService(Services.rag_engine)
+    Services.query_router = QueryRouter.from_settings()
+    try:
+        await Services.query_router.faq_index.load()
+    except Exception as e:
+        print(f"Error loading FAQ index: {e}")
+    try:
+        await asyncio.to_thread(Services.rag_engine.ensure_collection)
+    except Exception:
+        # Keep serving; /ready reports the vector store until it recovers
+        pass
+    if settings.gc_enabled:
+        Services.collector = GarbageCollector(Services.rag_engine)
+        Services.collector.start()
+
+
+async def close_services():
+    """Release service clients."""
+    if Services.collector:
+        await Services.collector.stop()
+        Services.collector = None
+    if Services.rag_engine:
+        Services.rag_engine.qdrant_client.close()
+        Services.rag_engine.openai_client.close()
+    if Services.openai_http_client:
+        Services.openai_http_client.close()
+    Services.openai_http_client = None
+    Services.rag_engine = None
+    Services.chat_service = None
+    Services.query_router = None
+    await close_rate_limit_backend()
+    shutdown_hash_pool()
+    shutdown_generation_pool()
+
+
+def get_rag_engine() -> RAGEngine:
+    """Get the RAG engine, building it on first use outside the app lifespan."""
+    if Services.rag_engine is None:
+        Services.rag_engine = RAGEngine()
+    return Services.rag_engine
+
+
+def get_chat_service() -> ChatService:
+    """Get the chat service, building it on first use outside the app lifespan."""
+    if Services.chat_service is None:
+        Services.chat_service = ChatService(get_rag_engine())
+    return Services.chat_service
+
+
+def get_query_router() -> QueryRouter:
+    """Get the fast-path query router, building it on first use outside the app lifespan."""
+    if Services.query_router is None:
+        Services.query_router = QueryRouter.from_settings()
+    return Services.query_router
+
+
+def wake_collector():
+    """Ask the garbage collector to pick up a new tombstone now (no-op outside the app lifespan)."""
+    if Services.collector is not None:
+        Services.collector.wake()
+
+
+def pool_stats() -> dict:
+    """Connection pool statistics for MongoDB, OpenAI and Qdrant, plus coalescing, scheduling, breaker and load-shedding state."""
+    stats = {"mongodb": Database.pool_stats.snapshot(), "openai_scheduler": openai_scheduler.stats(),
+             "breakers": breaker_stats(), "chat_queue": chat_admission.stats()}
+    if Services.openai_http_client is not None:
+        stats["openai"] = http_pool_stats(Services.openai_http_client)
+    if Services.rag_engine is not None:
+        stats["qdrant"] = qdrant_pool_stats(Services.rag_engine.qdrant_client)
+        stats["coalescing"] = {
+            "embeddings": Services.rag_engine.embedding_flight.stats(),
+            "searches": Services.rag_engine.search_flight.stats()
+        }
+    if Services.chat_service is not None:
+        stats.setdefault("coalescing", {})["answers"] = Services.chat_service.answer_flight.stats()
+    return stats
+
+
+async def _check_mongo():
+    await get_database().command("ping")
+
+
+def _check_vector_store():
+    if not Services.rag_engine.collection_ready:
+        Services.rag_engine.ensure_collection()
+    Services.rag_engine.qdrant_client.get_collection(settings.qdrant_collection_name)
+
+
+def _check_llm():
+    Services.chat_service.client.models.retrieve(settings.openai_chat_model)
+
+
+async def check_readiness(timeout: float = 5.0) -> dict:
+    """Check MongoDB, the vector store and the LLM client concurrently."""
+    if get_database() is None or Services.rag_engine is None or Services.chat_service is None:
+        return {"mongodb": "not initialized", "vector_store": "not initialized", "llm": "not initialized"}
+
+    checks = {
+        "mongodb": _check_mongo(),
+        "vector_store": asyncio.to_thread(_check_vector_store),
+        "llm": asyncio.to_thread(_check_llm),
+    }
+    results = await asyncio.gather(
+        *(asyncio.wait_for(check, timeout) for check in checks.values()),
+        return_exceptions=True
+    )
+    return {
+        name: "ok" if not isinstance(result, BaseException) else f"error: {type(result).__name__}"
+        for name, result in zip(checks, results)
+    }
+
+
+async def warm_up():
+    """Open upstream connections and load lazy backends before taking traffic."""
+    await asyncio.gather(
+        check_readiness(),
+        asyncio.to_thread(pwd_context.dummy_verify),
+        return_exceptions=True
+    )
@@ -0,0 +1,75 @@
+"""
+Single-flight request coalescing.
+
+When many users ask the same question at once, only the first caller for a
+key runs the upstream call; everyone else arriving while it is in flight
+waits for and shares its result (or its exception). Nothing is cached: the
+key is forgotten as soon as the call finishes, so the next identical
+question makes a fresh call.
+
+``SingleFlight`` coalesces coroutines on the event loop; ``ThreadSingleFlight``
+coalesces blocking calls made from worker threads (embeddings and Qdrant
+searches run in ``asyncio.to_thread``).
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Share one in-flight coroutine per key among concurrent callers."""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+        self.calls_made = 0
+        self.calls_shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self.calls.get(key)
+        if task is None:
+            self.calls_made += 1
+            task = asyncio.ensure_future(fn())
+            self.calls[key] = task
+            task.add_done_callback(lambda _: self.calls.pop(key, None))
+        else:
+            self.calls_shared += 1
+        # A caller that gives up must not cancel the call the others are waiting on
+        return await asyncio.shield(task)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self.calls), "calls": self.calls_made, "shared": self.calls_shared}
+
+
+class ThreadSingleFlight:
+    """Share one in-flight blocking call per key among concurrent threads."""
+
+    def __init__(self):
+        self.calls: Dict[Hashable, Future] = {}
+        self.lock = threading.Lock()
+        self.calls_made = 0
+        self.calls_shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                self.calls_made += 1
+                future = self.calls[key] = Future()
+            else:
+                self.calls_shared += 1
+        if not leader:
+            return future.result()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self.lock:
+                self.calls.pop(key, None)
+        return future.result()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self.calls), "calls": self.calls_made, "shared": self.calls_shared}
@@ -0,0 +1,53 @@
+import re
+from typing import Optional
+from fastapi import HTTPException, status
+from app.config import settings
+
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,62}$")
+
+
+def tenant_of(item) -> str:
+    """Tenant of a user model or a user/thread/document row; rows written before tenants belong to the default."""
+    tenant_id = item.get("tenant_id") if isinstance(item, dict) else getattr(item, "tenant_id", None)
+    return tenant_id or settings.default_tenant
+
+
+def tenant_filter(tenant_id: str) -> dict:
+    """Mongo filter for one tenant's rows (the default tenant also owns rows without a tenant_id)."""
+    if tenant_id == settings.default_tenant:
+        return {"tenant_id": {"$in": [None, tenant_id]}}
+    return {"tenant_id": tenant_id}
+
+
+def validate_tenant_id(tenant_id: str) -> str:
+    """Tenant ids become collection names and shard keys, so keep them to a safe alphabet."""
+    if not TENANT_ID_PATTERN.match(tenant_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid tenant id (lowercase letters, digits, '-' and '_', max 63 characters)"
+        )
+    return tenant_id
+
+
+def is_platform_admin(user) -> bool:
+    """Admins of the default tenant operate the platform and may manage other tenants."""
+    return user.role == "admin" and tenant_of(user) == settings.default_tenant
+
+
+def admin_tenant(current_admin, requested: Optional[str] = None) -> str:
+    """Tenant an admin request acts on: their own, or ``requested`` for platform admins."""
+    if not requested or requested == tenant_of(current_admin):
+        return tenant_of(current_admin)
+    if not is_platform_admin(current_admin):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions"
+        )
+    return validate_tenant_id(requested)
+
+
+def can_access_thread(thread: dict, user) -> bool:
+    """Thread owners, and admins of the thread's tenant, may read and write it."""
+    if thread["owner_user_id"] == user.id:
+        return True
+    return user.role == "admin" and tenant_of(thread) == tenant_of(user)
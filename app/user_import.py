@@ -0,0 +1,157 @@
+"""
+Bulk user import.
+
+Rows come from a CSV file (header: email,password[,role][,tenant_id]) or a
+JSON list of objects with the same keys. Existing accounts are found with a
+single ``$in`` query, passwords are bcrypt-hashed across a process pool and
+new users are written with one unordered ``insert_many``, so a bad row never
+blocks the others. Every row gets a result.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+from fastapi import HTTPException, status
+from pydantic import BaseModel, EmailStr, Field, ValidationError
+from pymongo.errors import BulkWriteError
+from app.config import settings
+from app.database import get_collection
+from app.models import UserRole
+from app.tenants import admin_tenant
+
+DUPLICATE_KEY = 11000
+
+
+class ImportRow(BaseModel):
+    email: EmailStr
+    password: str = Field(..., min_length=1)
+    role: UserRole = UserRole.USER
+    tenant_id: Optional[str] = None
+
+
+class HashPool:
+    """Process pool for bcrypt, created on first use so idle workers cost nothing."""
+    executor: ProcessPoolExecutor = None
+
+
+def hash_batch(passwords: List[str]) -> List[str]:
+    """Hash passwords inside a pool worker."""
+    from app.auth import get_password_hash
+    return [get_password_hash(password) for password in passwords]
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """bcrypt-hash ``passwords`` across the process pool, preserving order."""
+    if not passwords:
+        return []
+    workers = settings.password_hash_workers or os.cpu_count() or 1
+    if HashPool.executor is None:
+        HashPool.executor = ProcessPoolExecutor(max_workers=workers)
+    size = -(-len(passwords) // workers)
+    loop = asyncio.get_running_loop()
+    batches = await asyncio.gather(*(
+        loop.run_in_executor(HashPool.executor, hash_batch, passwords[start:start + size])
+        for start in range(0, len(passwords), size)
+    ))
+    return [hashed for batch in batches for hashed in batch]
+
+
+def shutdown_hash_pool():
+    """Stop the hashing workers."""
+    if HashPool.executor is not None:
+        HashPool.executor.shutdown(cancel_futures=True)
+        HashPool.executor = None
+
+
+def parse_rows(filename: str, content: bytes) -> List[dict]:
+    """Read import rows from CSV or JSON (chosen by extension, JSON when it starts with '[')."""
+    text = content.decode("utf-8-sig")
+    if filename.lower().endswith(".json") or text.lstrip().startswith("["):
+        try:
+            rows = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid JSON: {e}")
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="JSON import must be a list of objects")
+    else:
+        rows = [{key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+                for row in csv.DictReader(io.StringIO(text))]
+    if len(rows) > settings.user_import_max_rows:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.user_import_max_rows} rows can be imported at once"
+        )
+    return rows
+
+
+async def import_users(rows: List[dict], current_admin) -> List[dict]:
+    """Validate, de-duplicate, hash and insert ``rows``; returns one result per row."""
+    results = [{"row": number, "email": str(row.get("email") or ""), "status": "error"}
+               for number, row in enumerate(rows, start=1)]
+    candidates = []
+    seen = set()
+    for result, row in zip(results, rows):
+        try:
+            parsed = ImportRow(**{key: value for key, value in row.items() if value not in (None, "")})
+            tenant_id = admin_tenant(current_admin, parsed.tenant_id)
+        except ValidationError as e:
+            result["detail"] = "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+            continue
+        except HTTPException as e:
+            result["detail"] = e.detail
+            continue
+        email = parsed.email
+        result["email"] = email
+        if email in seen:
+            result.update(status="duplicate", detail="Email appears earlier in the file")
+            continue
+        seen.add(email)
+        candidates.append((result, parsed, tenant_id))
+
+    # One round trip finds every address that is already registered
+    users_collection = get_collection("users")
+    emails = [result["email"] for result, _, _ in candidates]
+    existing = {user["email"] async for user in users_collection.find({"email": {"$in": emails}}, {"email": 1})}
+    new_users = []
+    for result, parsed, tenant_id in candidates:
+        if result["email"] in existing:
+            result.update(status="duplicate", detail="Email already registered")
+        else:
+            new_users.append((result, parsed, tenant_id))
+
+    hashes = await hash_passwords([parsed.password for _, parsed, _ in new_users])
+    current_time = datetime.now(timezone.utc)
+    user_docs = [
+        {
+            "email": result["email"],
+            "hashed_password": hashed,
+            "role": parsed.role.value,
+            "tenant_id": tenant_id,
+            "is_active": True,
+            "created_at": current_time,
+            "updated_at": current_time
+        }
+        for (result, parsed, tenant_id), hashed in zip(new_users, hashes)
+    ]
+    if not user_docs:
+        return results
+
+    failed = {}
+    try:
+        await users_collection.insert_many(user_docs, ordered=False)
+    except BulkWriteError as e:
+        # Rows that lost a race with another writer; the rest were still inserted
+        failed = {error["index"]: error for error in e.details.get("writeErrors", [])}
+    for index, ((result, _, _), doc) in enumerate(zip(new_users, user_docs)):
+        if index in failed:
+            duplicate = failed[index].get("code") == DUPLICATE_KEY
+            result.update(status="duplicate" if duplicate else "error",
+                          detail="Email already registered" if duplicate else failed[index].get("errmsg"))
+        else:
+            result.update(status="created", id=str(doc["_id"]))
+    return results
@@ -0,0 +1 @@
+# Offline benchmark suite with local OpenAI, Qdrant and MongoDB stand-ins
@@ -0,0 +1,169 @@
+"""
+Offline benchmark runner.
+
+    python -m benchmarks run --output bench.json
+    python -m benchmarks compare baseline.json bench.json
+    python -m benchmarks load --rates 1,2,4,8 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+from benchmarks.environment import use_local_stand_ins
+from benchmarks.fake_openai import FakeOpenAIServer, LatencyProfile
+from benchmarks import loadgen
+
+SUITES = ("imports", "serialization", "chunking", "ingestion", "quantization", "scoped_search", "chat")
+HIGHER_IS_BETTER = ("per_sec", "rps", "recall")
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(args) -> dict:
+    latency = LatencyProfile(
+        embedding_ms=args.embedding_latency_ms,
+        chat_ms=args.chat_latency_ms,
+        jitter_ms=args.jitter_ms,
+        seed=args.seed,
+    )
+    suites = args.suites.split(",")
+    concurrency_levels = [int(c) for c in args.concurrency.split(",")]
+
+    with FakeOpenAIServer(latency, embedding_dim=args.embedding_dim) as server:
+        use_local_stand_ins(server.base_url, args.qdrant_url)
+        # Imported late so the clients are built against the stand-ins
+        from app.services import get_rag_engine
+        from benchmarks import suite
+        from benchmarks.memory_mongo import install_memory_mongo
+
+        rag_engine = get_rag_engine()
+        rag_engine.ensure_collection()
+        documents = suite.synthetic_documents(args.documents, args.words_per_doc, args.seed)
+        results = {}
+
+        if "imports" in suites:
+            results["imports"] = suite.bench_import_time("app.main")
+        if "serialization" in suites:
+            results["serialization"] = suite.bench_serialization()
+        if "chunking" in suites:
+            results["chunking"] = suite.bench_chunking(rag_engine, documents)
+        if "ingestion" in suites or "chat" in suites:
+            ingestion = suite.bench_ingestion(rag_engine, documents)
+            if "ingestion" in suites:
+                results["ingestion"] = ingestion
+        if "quantization" in suites:
+            results["quantization"] = suite.bench_quantization(
+                vectors=args.quantization_vectors,
+                dims=[int(dim) for dim in args.quantization_dims.split(",")],
+                seed=args.seed
+            )
+        if "scoped_search" in suites:
+            results["scoped_search"] = suite.bench_scoped_search(
+                rag_engine.qdrant_client, points=args.scoped_points, seed=args.seed
+            )
+        if "chat" in suites:
+            from app.main import app
+            install_memory_mongo()
+            results["chat_turn"] = {
+                f"c{level}": asyncio.run(suite.bench_chat_turn(app, args.requests, level, args.seed))
+                for level in concurrency_levels
+            }
+        upstream = dict(server.stats)
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "params": vars(args),
+        },
+        "upstream": upstream,
+        "results": results,
+    }
+
+
+def flatten(prefix: str, value, out: dict):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def compare(args) -> int:
+    with open(args.baseline) as f:
+        baseline = flatten("", json.load(f)["results"], {})
+    with open(args.candidate) as f:
+        candidate = flatten("", json.load(f)["results"], {})
+
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys()):
+        old, new = baseline[key], candidate[key]
+        change = ((new - old) / old * 100.0) if old else 0.0
+        worse = -change if any(tag in key for tag in HIGHER_IS_BETTER) else change
+        flag = ""
+        if worse > args.threshold and not key.endswith((".requests", ".concurrency", ".documents", ".chunks")):
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key:45} {old:>12} {new:>12} {change:>+8.1f}%{flag}")
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmark suite against local stand-ins")
+    run_parser.add_argument("--suites", default=",".join(SUITES), help="Comma-separated subset of: " + ", ".join(SUITES))
+    run_parser.add_argument("--documents", type=int, default=20)
+    run_parser.add_argument("--words-per-doc", type=int, default=2000)
+    run_parser.add_argument("--requests", type=int, default=100, help="Chat turns per concurrency level")
+    run_parser.add_argument("--concurrency", default="1,8", help="Comma-separated concurrency levels")
+    run_parser.add_argument("--embedding-dim", type=int, default=3072)
+    run_parser.add_argument("--quantization-vectors", type=int, default=10000)
+    run_parser.add_argument("--scoped-points", type=int, default=10000, help="Collection size for the scoped_search suite")
+    run_parser.add_argument("--qdrant-url", default=":memory:", help="Qdrant to benchmark against (default: local in-process)")
+    run_parser.add_argument("--quantization-dims", default="1536,512,256", help="Comma-separated vector sizes to compare")
+    run_parser.add_argument("--embedding-latency-ms", type=float, default=5.0)
+    run_parser.add_argument("--chat-latency-ms", type=float, default=50.0)
+    run_parser.add_argument("--jitter-ms", type=float, default=0.0)
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two JSON result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("candidate")
+    compare_parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+
+    load_parser = subparsers.add_parser("load", help="Drive whole API sessions with the load generator")
+    loadgen.add_arguments(load_parser)
+
+    args = parser.parse_args()
+    if args.command == "compare":
+        sys.exit(compare(args))
+
+    result = loadgen.run_load(args) if args.command == "load" else run(args)
+    output = json.dumps(result, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Point the application settings at the local stand-ins.
+
+This must run before ``app.rag`` / ``app.chat`` are imported, because those
+modules build their Qdrant and OpenAI clients from ``settings``.
+"""
+
+import os
+import sys
+
+OFFLINE_DEFAULTS = {
+    "MONGODB_URI": "mongodb://localhost:27017",
+    "MONGODB_DBNAME": "rag_chatbot_bench",
+    "OPENAI_API_KEY": "sk-local-stand-in",
+    "JWT_SECRET": "benchmark-secret",
+    "DEBUG": "false",
+    # The real Mongo client is swapped for the in-memory store after startup
+    "WARM_UP_ON_BOOT": "false",
+    # A few load-generator users send far more than a person would
+    "RATE_LIMIT_ENABLED": "false",
+}
+
+
+def use_local_stand_ins(openai_base_url: str, qdrant_url: str = ":memory:"):
+    """Configure the environment (and any already loaded settings) for offline runs."""
+    for key, value in OFFLINE_DEFAULTS.items():
+        os.environ.setdefault(key, value)
+    os.environ["OPENAI_BASE_URL"] = openai_base_url
+    os.environ["QDRANT_URL"] = qdrant_url
+
+    config = sys.modules.get("app.config")
+    if config is not None:
+        config.settings.openai_base_url = openai_base_url
+        config.settings.qdrant_url = qdrant_url
@@ -0,0 +1,202 @@
+"""
+Deterministic stand-in for the OpenAI embeddings and chat completions API.
+
+Run standalone with ``python -m benchmarks.fake_openai --port 8001`` and point
+``OPENAI_BASE_URL`` at ``http://127.0.0.1:8001/v1``, or start it in-process
+with ``FakeOpenAIServer``.
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import uvicorn
+from fastapi import FastAPI, Request
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+@dataclass
+class LatencyProfile:
+    """Simulated upstream latency, in milliseconds."""
+    embedding_ms: float = 0.0
+    embedding_per_input_ms: float = 0.0
+    chat_ms: float = 0.0
+    jitter_ms: float = 0.0
+    seed: int = 0
+
+
+def embed_text(text: str, dim: int) -> np.ndarray:
+    """Hash word tokens into a unit vector so similar texts get similar embeddings."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        bucket = int.from_bytes(digest[:4], "little") % dim
+        sign = 1.0 if digest[4] & 1 else -1.0
+        vector[bucket] += sign
+    norm = np.linalg.norm(vector)
+    if norm == 0:
+        vector[0] = 1.0
+        return vector
+    return vector / norm
+
+
+def count_tokens(text: str) -> int:
+    """Cheap token estimate used for the usage block."""
+    return len(TOKEN_PATTERN.findall(text))
+
+
+def create_app(latency: LatencyProfile = None, embedding_dim: int = 3072) -> FastAPI:
+    """Build the fake OpenAI ASGI app."""
+    latency = latency or LatencyProfile()
+    rng = random.Random(latency.seed)
+    app = FastAPI(title="Fake OpenAI")
+    app.state.stats = {"embedding_requests": 0, "embedding_inputs": 0, "chat_requests": 0}
+
+    async def simulate(base_ms: float):
+        delay = base_ms + (rng.uniform(0, latency.jitter_ms) if latency.jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000.0)
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [await retrieve_model(name) for name in ("gpt-4o-mini", "text-embedding-3-small")]}
+
+    @app.get("/v1/models/{model}")
+    async def retrieve_model(model: str):
+        return {"id": model, "object": "model", "created": 0, "owned_by": "stand-in"}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"]
+        if isinstance(inputs, str):
+            inputs = [inputs]
+        dim = body.get("dimensions") or embedding_dim
+        app.state.stats["embedding_requests"] += 1
+        app.state.stats["embedding_inputs"] += len(inputs)
+        await simulate(latency.embedding_ms + latency.embedding_per_input_ms * len(inputs))
+
+        data = []
+        for index, text in enumerate(inputs):
+            vector = embed_text(text, dim)
+            if body.get("encoding_format") == "base64":
+                embedding = base64.b64encode(vector.tobytes()).decode("ascii")
+            else:
+                embedding = vector.tolist()
+            data.append({"object": "embedding", "index": index, "embedding": embedding})
+
+        tokens = sum(count_tokens(text) for text in inputs)
+        return {
+            "object": "list",
+            "data": data,
+            "model": body.get("model", "text-embedding-3-small"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages: List[dict] = body.get("messages", [])
+        app.state.stats["chat_requests"] += 1
+        await simulate(latency.chat_ms)
+
+        prompt = messages[-1]["content"] if messages else ""
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+        content = f"Stand-in answer {digest} based on the provided context."
+        prompt_tokens = sum(count_tokens(m.get("content") or "") for m in messages)
+        completion_tokens = count_tokens(content)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+class FakeOpenAIServer:
+    """Run the fake OpenAI app on a background uvicorn thread."""
+
+    def __init__(self, latency: LatencyProfile = None, embedding_dim: int = 3072,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.app = create_app(latency, embedding_dim)
+        self.host = host
+        self.port = port
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    @property
+    def stats(self) -> dict:
+        return self.app.state.stats
+
+    def start(self):
+        config = uvicorn.Config(self.app, host=self.host, port=self.port, log_level="warning", access_log=False)
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("Fake OpenAI server failed to start")
+            time.sleep(0.01)
+        self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.should_exit = True
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake OpenAI server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--embedding-dim", type=int, default=3072)
+    parser.add_argument("--embedding-latency-ms", type=float, default=0.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    latency = LatencyProfile(
+        embedding_ms=args.embedding_latency_ms,
+        chat_ms=args.chat_latency_ms,
+        jitter_ms=args.jitter_ms,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(latency, args.embedding_dim), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
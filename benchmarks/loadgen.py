@@ -0,0 +1,340 @@
+"""
+Open-loop asyncio load generator that drives the real API through whole sessions.
+
+A "chat" session logs in, creates a thread, sends N messages and pages through
+the thread history; a "browse" session logs in, lists threads and pages through
+the most recent one. Sessions arrive as a Poisson process at the configured
+rate while admin uploaders post documents in the background. Each ramp step
+reports throughput, per-operation latency percentiles, error rates and the
+server's event-loop lag, and the run reports the first saturated rate.
+"""
+
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.environment import use_local_stand_ins
+from benchmarks.fake_openai import FakeOpenAIServer, LatencyProfile
+from benchmarks.suite import make_pdf, summarize_latencies, synthetic_text
+
+USER_PASSWORD = "bench-user-password"
+
+
+class LoadStats:
+    """Per-operation latencies and error counts for one ramp step."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.sessions_started = 0
+        self.sessions_completed = 0
+
+    def record(self, operation: str, elapsed: float, status: Optional[int]):
+        self.latencies[operation].append(elapsed)
+        if status is None or status >= 400:
+            self.errors[operation][str(status or "exception")] += 1
+
+    def report(self, elapsed: float) -> dict:
+        requests = sum(len(values) for values in self.latencies.values())
+        errors = sum(sum(codes.values()) for codes in self.errors.values())
+        return {
+            "seconds": round(elapsed, 3),
+            "sessions_started": self.sessions_started,
+            "sessions_completed": self.sessions_completed,
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 3) if elapsed else 0.0,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "operations": {
+                operation: {
+                    "count": len(values),
+                    "errors": dict(self.errors.get(operation, {})),
+                    "latency_ms": summarize_latencies(values),
+                }
+                for operation, values in sorted(self.latencies.items())
+            },
+        }
+
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.users: List[str] = []
+        self.admin_headers: Dict[str, str] = {}
+        self.stats = LoadStats()
+
+    async def call(self, operation: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.stats.record(operation, time.perf_counter() - start, None)
+            return None
+        self.stats.record(operation, time.perf_counter() - start, response.status_code)
+        return response
+
+    async def login(self, email: str, password: str, operation: str = "login") -> Optional[Dict[str, str]]:
+        response = await self.call(operation, "POST", "/auth/login", json={"email": email, "password": password})
+        if response is None or response.status_code != 200:
+            return None
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def setup(self):
+        """Log in as admin and create the user pool (not measured)."""
+        self.admin_headers = await self.login(self.args.admin_email, self.args.admin_password, "setup")
+        if not self.admin_headers:
+            raise RuntimeError("Admin login failed; check --admin-email / --admin-password")
+        for i in range(self.args.users):
+            email = f"load-{self.args.seed}-{i}@example.com"
+            response = await self.client.post(
+                "/admin/users", json={"email": email, "password": USER_PASSWORD}, headers=self.admin_headers
+            )
+            if response.status_code not in (200, 400):
+                response.raise_for_status()
+            self.users.append(email)
+        self.stats = LoadStats()
+
+    async def page_history(self, thread_id: str, headers: Dict[str, str]):
+        skip = 0
+        while True:
+            response = await self.call(
+                "get_messages", "GET", f"/chat/{thread_id}/messages",
+                params={"skip": skip, "limit": self.args.page_size}, headers=headers,
+            )
+            if response is None or response.status_code != 200 or len(response.json()) < self.args.page_size:
+                return
+            skip += self.args.page_size
+
+    async def chat_session(self, headers: Dict[str, str]):
+        response = await self.call("create_thread", "POST", "/threads", json={"title": "load test"}, headers=headers)
+        if response is None or response.status_code != 200:
+            return
+        thread_id = response.json()["id"]
+        for _ in range(self.args.messages):
+            question = synthetic_text(self.rng.randint(6, 16), self.rng.randint(0, 10_000))
+            await self.call(
+                "send_message", "POST", f"/chat/{thread_id}/message", json={"message": question}, headers=headers
+            )
+        await self.page_history(thread_id, headers)
+
+    async def browse_session(self, headers: Dict[str, str]):
+        response = await self.call("list_threads", "GET", "/threads", headers=headers)
+        if response is None or response.status_code != 200 or not response.json():
+            return
+        await self.page_history(response.json()[0]["id"], headers)
+
+    async def session(self, kind: str):
+        self.stats.sessions_started += 1
+        headers = await self.login(self.rng.choice(self.users), USER_PASSWORD)
+        if headers is None:
+            return
+        if kind == "chat":
+            await self.chat_session(headers)
+        else:
+            await self.browse_session(headers)
+        self.stats.sessions_completed += 1
+
+    async def uploader(self, stop: asyncio.Event, index: int):
+        sequence = 0
+        while not stop.is_set():
+            pdf = make_pdf(synthetic_text(self.args.upload_words, seed=index * 100_000 + sequence))
+            await self.call(
+                "upload_document", "POST", "/admin/documents/upload",
+                files={"file": (f"load-{index}-{sequence}.pdf", pdf, "application/pdf")},
+                headers=self.admin_headers,
+            )
+            sequence += 1
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.args.upload_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run_step(self, rate: float) -> dict:
+        """Offer ``rate`` sessions/sec for ``duration`` seconds, then drain."""
+        self.stats = LoadStats()
+        mix = self.args.mix
+        kinds, weights = list(mix.keys()), list(mix.values())
+        await self.client.get("/_bench/loop-lag", params={"reset": True})
+
+        stop = asyncio.Event()
+        uploaders = [asyncio.create_task(self.uploader(stop, i)) for i in range(self.args.uploaders)]
+        sessions = []
+        start = time.perf_counter()
+        next_arrival = start
+        while True:
+            next_arrival += self.rng.expovariate(rate)
+            if next_arrival - start >= self.args.duration:
+                break
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            kind = self.rng.choices(kinds, weights)[0]
+            sessions.append(asyncio.create_task(self.session(kind)))
+
+        stop.set()
+        arrivals_end = time.perf_counter()
+        pending = sessions + uploaders
+        if pending:
+            await asyncio.wait(pending, timeout=self.args.drain_timeout)
+            for task in pending:
+                task.cancel()
+        end = time.perf_counter()
+        elapsed = end - start
+
+        report = self.stats.report(elapsed)
+        report["offered_rate"] = rate
+        report["achieved_rate"] = round(self.stats.sessions_completed / elapsed, 3)
+        report["drain_seconds"] = round(end - arrivals_end, 3)
+        lag = await self.client.get("/_bench/loop-lag")
+        report["loop_lag_ms"] = lag.json() if lag.status_code == 200 else None
+        report["saturated"] = self.is_saturated(report)
+        return report
+
+    def is_saturated(self, report: dict) -> bool:
+        send = report["operations"].get("send_message")
+        if send and send["latency_ms"]["p95"] > self.args.slo_p95_ms:
+            return True
+        if report["error_rate"] > self.args.max_error_rate:
+            return True
+        if report["drain_seconds"] > self.args.max_drain_s:
+            return True
+        return report["sessions_completed"] < 0.9 * report["sessions_started"]
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in ("chat", "browse"):
+            raise ValueError(f"Unknown session kind: {kind}")
+        mix[kind] = float(weight or 1)
+    return mix
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn_worker(openai_base_url: str, port: int) -> subprocess.Popen:
+    """Start one uvicorn worker serving the stand-in app."""
+    env = dict(os.environ, OPENAI_BASE_URL=openai_base_url, QDRANT_URL=":memory:", DEBUG="false")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "benchmarks.standin_app:app",
+         "--host", "127.0.0.1", "--port", str(port), "--workers", "1", "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_until_healthy(base_url: str, timeout: float = 60.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/health")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become healthy")
+
+
+async def drive(client: httpx.AsyncClient, args) -> dict:
+    generator = LoadGenerator(client, args)
+    await generator.setup()
+    steps = []
+    for rate in args.rates:
+        step = await generator.run_step(rate)
+        steps.append(step)
+        if step["saturated"] and args.stop_on_saturation:
+            break
+    sustainable = [step["offered_rate"] for step in steps if not step["saturated"]]
+    saturated = [step["offered_rate"] for step in steps if step["saturated"]]
+    return {
+        "max_sustainable_rate": max(sustainable) if sustainable else None,
+        "saturation_rate": saturated[0] if saturated else None,
+        "steps": steps,
+    }
+
+
+async def run_in_process(args) -> dict:
+    from benchmarks.standin_app import app
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadgen", timeout=None) as client:
+            return await drive(client, args)
+
+
+async def run_against(base_url: str, args) -> dict:
+    limits = httpx.Limits(max_connections=args.max_connections, max_keepalive_connections=args.max_connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.request_timeout, limits=limits) as client:
+        return await drive(client, args)
+
+
+def run_load(args) -> dict:
+    args.mix = parse_mix(args.mix)
+    args.rates = [float(rate) for rate in args.rates.split(",")]
+    latency = LatencyProfile(
+        embedding_ms=args.embedding_latency_ms,
+        chat_ms=args.chat_latency_ms,
+        jitter_ms=args.jitter_ms,
+        seed=args.seed,
+    )
+
+    with FakeOpenAIServer(latency, embedding_dim=args.embedding_dim) as server:
+        use_local_stand_ins(server.base_url)
+        if args.target == "inprocess":
+            result = asyncio.run(run_in_process(args))
+        elif args.target == "spawn":
+            port = free_port()
+            process = spawn_worker(server.base_url, port)
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                asyncio.run(wait_until_healthy(base_url))
+                result = asyncio.run(run_against(base_url, args))
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+        else:
+            result = asyncio.run(run_against(args.target, args))
+        result["upstream"] = dict(server.stats)
+    return result
+
+
+def add_arguments(parser):
+    parser.add_argument("--target", default="spawn",
+                        help="'spawn' (one uvicorn worker on the stand-ins), 'inprocess', or a base URL")
+    parser.add_argument("--rates", default="1,2,4,8", help="Comma-separated session arrival rates (sessions/sec)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of arrivals per step")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--mix", default="chat=0.7,browse=0.3", help="Session mix, e.g. chat=0.7,browse=0.3")
+    parser.add_argument("--users", type=int, default=10, help="Size of the user pool")
+    parser.add_argument("--messages", type=int, default=3, help="Messages per chat session")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--uploaders", type=int, default=1, help="Background admin uploaders")
+    parser.add_argument("--upload-interval", type=float, default=5.0)
+    parser.add_argument("--upload-words", type=int, default=3000)
+    parser.add_argument("--admin-email", default=os.environ.get("BENCH_ADMIN_EMAIL", "bench-admin@example.com"))
+    parser.add_argument("--admin-password", default=os.environ.get("BENCH_ADMIN_PASSWORD", "bench-admin-password"))
+    parser.add_argument("--slo-p95-ms", type=float, default=2000.0, help="send_message p95 above this marks saturation")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--max-drain-s", type=float, default=10.0,
+                        help="Backlog that takes longer than this to drain after arrivals stop marks saturation")
+    parser.add_argument("--stop-on-saturation", action="store_true")
+    parser.add_argument("--max-connections", type=int, default=200)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--embedding-dim", type=int, default=3072)
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0)
+    parser.add_argument("--chat-latency-ms", type=float, default=400.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write JSON results to this file (default: stdout)")
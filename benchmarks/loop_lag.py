@@ -0,0 +1,36 @@
+import asyncio
+import time
+from typing import List, Optional
+
+from benchmarks.suite import summarize_latencies
+
+
+class LoopLagMonitor:
+    """Measure how late a periodic timer fires on the running event loop."""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, time.perf_counter() - start - self.interval))
+
+    def snapshot(self, reset: bool = False) -> dict:
+        summary = summarize_latencies(self.samples)
+        summary["samples"] = len(self.samples)
+        if reset:
+            self.samples = []
+        return summary
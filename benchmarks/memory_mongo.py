@@ -0,0 +1,355 @@
+"""
+In-memory stand-in for the subset of Motor that the application uses.
+
+Install it with ``install_memory_mongo()`` instead of calling
+``connect_to_mongo()`` to run the routers without a MongoDB server.
+Unique indexes are enforced on inserts only.
+"""
+
+import copy
+import re
+from dataclasses import dataclass
+from typing import Any, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+from app.config import settings
+from app.database import Database
+
+_MISSING = object()
+
+
+@dataclass
+class InsertOneResult:
+    inserted_id: Any
+
+
+@dataclass
+class InsertManyResult:
+    inserted_ids: List[Any]
+
+
+@dataclass
+class UpdateResult:
+    matched_count: int
+    modified_count: int
+    upserted_id: Any = None
+
+
+@dataclass
+class DeleteResult:
+    deleted_count: int
+
+
+def _get_path(doc: dict, path: str):
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        elif isinstance(value, list):
+            # Dotted paths reach into arrays of subdocuments, like multikey indexes
+            value = [item[part] for item in value if isinstance(item, dict) and part in item]
+        else:
+            return _MISSING
+    return value
+
+
+def _set_path(doc: dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset_path(doc: dict, path: str):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part, {})
+    doc.pop(parts[-1], None)
+
+
+def _compare(value, op, operand) -> bool:
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > operand
+        if op == "$gte":
+            return value >= operand
+        if op == "$lt":
+            return value < operand
+        return value <= operand
+    except TypeError:
+        return False
+
+
+def _equals(value, operand) -> bool:
+    if value is _MISSING:
+        return operand is None
+    if isinstance(value, list) and not isinstance(operand, list):
+        return operand in value
+    return value == operand
+
+
+def _match_condition(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+        for op, operand in condition.items():
+            if op == "$eq" and not _equals(value, operand):
+                return False
+            if op == "$ne" and _equals(value, operand):
+                return False
+            if op == "$in" and not any(_equals(value, item) for item in operand):
+                return False
+            if op == "$nin" and any(_equals(value, item) for item in operand):
+                return False
+            if op in ("$gt", "$gte", "$lt", "$lte") and not _compare(value, op, operand):
+                return False
+            if op == "$exists" and (value is not _MISSING) != bool(operand):
+                return False
+            if op == "$regex":
+                flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+                if not isinstance(value, str) or not re.search(operand, value, flags):
+                    return False
+        return True
+    return _equals(value, condition)
+
+
+def matches(doc: dict, query: Optional[dict]) -> bool:
+    """Evaluate a MongoDB filter document against ``doc``."""
+    for key, condition in (query or {}).items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def _apply_update(doc: dict, update: dict, inserting: bool = False):
+    for op, fields in update.items():
+        for path, value in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                _set_path(doc, path, copy.deepcopy(value))
+            elif op == "$unset":
+                _unset_path(doc, path)
+            elif op == "$inc":
+                current = _get_path(doc, path)
+                _set_path(doc, path, (0 if current is _MISSING else current) + value)
+            elif op == "$push":
+                current = _get_path(doc, path)
+                items = current if isinstance(current, list) else []
+                if isinstance(value, dict) and "$each" in value:
+                    items.extend(copy.deepcopy(value["$each"]))
+                else:
+                    items.append(copy.deepcopy(value))
+                _set_path(doc, path, items)
+            elif op == "$pull":
+                current = _get_path(doc, path)
+                if isinstance(current, list):
+                    _set_path(doc, path, [item for item in current if not (
+                        matches(item, value) if isinstance(value, dict) else item == value)])
+            elif op in ("$min", "$max"):
+                current = _get_path(doc, path)
+                if current is _MISSING or (value < current if op == "$min" else value > current):
+                    _set_path(doc, path, value)
+
+
+def _project(doc: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != "_id"}
+    if include:
+        result = {k: copy.deepcopy(doc[k]) for k in include if k in doc}
+        if projection.get("_id", 1) and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    return {k: copy.deepcopy(v) for k, v in doc.items() if projection.get(k, 1)}
+
+
+def _sort_key(value):
+    if value is _MISSING or value is None:
+        return (0, 0)
+    return (1, value)
+
+
+class MemoryCursor:
+    def __init__(self, collection: "MemoryCollection", query: Optional[dict], projection: Optional[dict]):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort = []
+        self._skip = 0
+        self._limit = 0
+        self._results = None
+
+    def sort(self, key, direction: int = 1):
+        self._sort = list(key) if isinstance(key, list) else [(key, direction)]
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def _evaluate(self) -> List[dict]:
+        docs = [doc for doc in self._collection.docs if matches(doc, self._query)]
+        for key, direction in reversed(self._sort):
+            docs.sort(key=lambda d: _sort_key(_get_path(d, key)), reverse=direction < 0)
+        docs = docs[self._skip:]
+        if self._limit:
+            docs = docs[:self._limit]
+        return [_project(doc, self._projection) for doc in docs]
+
+    def __aiter__(self):
+        self._results = iter(self._evaluate())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._results)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length: Optional[int] = None):
+        docs = self._evaluate()
+        return docs if length is None else docs[:length]
+
+
+class MemoryCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self.docs: List[dict] = []
+        self.unique: List[List[str]] = []     # key paths of each unique index
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None, session=None):
+        return MemoryCursor(self, query, projection)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, session=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                return _project(doc, projection)
+        return None
+
+    def _check_unique(self, document: dict):
+        for keys in self.unique:
+            values = [_get_path(document, key) for key in keys]
+            if any(all(_get_path(doc, key) == value for key, value in zip(keys, values)) for doc in self.docs):
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {'_'.join(keys)}", 11000)
+
+    async def insert_one(self, document: dict, session=None):
+        document.setdefault("_id", ObjectId())
+        self._check_unique(document)
+        self.docs.append(copy.deepcopy(document))
+        return InsertOneResult(document["_id"])
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True, session=None):
+        errors, inserted = [], 0
+        for index, document in enumerate(documents):
+            document.setdefault("_id", ObjectId())
+            try:
+                self._check_unique(document)
+            except DuplicateKeyError as e:
+                errors.append({"index": index, "code": e.code, "errmsg": str(e)})
+                if ordered:
+                    break
+                continue
+            self.docs.append(copy.deepcopy(document))
+            inserted += 1
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": inserted})
+        return InsertManyResult([document["_id"] for document in documents])
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False, session=None):
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                _apply_update(doc, update)
+                return UpdateResult(1, int(doc != before))
+        if upsert:
+            doc = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            doc.setdefault("_id", ObjectId())
+            _apply_update(doc, update, inserting=True)
+            self.docs.append(doc)
+            return UpdateResult(0, 0, doc["_id"])
+        return UpdateResult(0, 0)
+
+    async def update_many(self, query: dict, update: dict):
+        matched = modified = 0
+        for doc in self.docs:
+            if matches(doc, query):
+                before = copy.deepcopy(doc)
+                _apply_update(doc, update)
+                matched += 1
+                modified += int(doc != before)
+        return UpdateResult(matched, modified)
+
+    async def delete_one(self, query: dict):
+        for index, doc in enumerate(self.docs):
+            if matches(doc, query):
+                del self.docs[index]
+                return DeleteResult(1)
+        return DeleteResult(0)
+
+    async def delete_many(self, query: dict):
+        kept = [doc for doc in self.docs if not matches(doc, query)]
+        deleted = len(self.docs) - len(kept)
+        self.docs = kept
+        return DeleteResult(deleted)
+
+    async def count_documents(self, query: dict):
+        return sum(1 for doc in self.docs if matches(doc, query))
+
+    async def distinct(self, key: str, query: Optional[dict] = None):
+        values = []
+        for doc in self.docs:
+            value = _get_path(doc, key)
+            if matches(doc, query) and value is not _MISSING and value not in values:
+                values.append(value)
+        return values
+
+    async def create_index(self, keys, unique: bool = False, **kwargs):
+        if unique:
+            self.unique.append([keys] if isinstance(keys, str) else [key for key, _ in keys])
+        return keys if isinstance(keys, str) else "_".join(f"{k}_{d}" for k, d in keys)
+
+
+class MemoryDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        if name not in self._collections:
+            self._collections[name] = MemoryCollection(name)
+        return self._collections[name]
+
+    async def command(self, name: str, *args, **kwargs):
+        return {"ok": 1.0}
+
+
+class MemoryMongoClient:
+    def __init__(self):
+        self._databases = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        if name not in self._databases:
+            self._databases[name] = MemoryDatabase(name)
+        return self._databases[name]
+
+    def close(self):
+        pass
+
+
+def install_memory_mongo() -> MemoryDatabase:
+    """Point ``app.database`` at a fresh in-memory database."""
+    Database.client = MemoryMongoClient()
+    Database.database = Database.client[settings.mongodb_dbname]
+    Database.transactions = False
+    return Database.database
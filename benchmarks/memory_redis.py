@@ -0,0 +1,56 @@
+"""
+In-memory stand-in for the subset of ``redis.asyncio`` that the application uses.
+
+Only the rate limiter's token-bucket script is understood: ``register_script``
+returns a callable that applies the same bucket update as the Lua source, on
+hashes kept in this process (with key expiry). Use it as
+``RedisBackend(MemoryRedis())`` to exercise the shared rate-limit backend
+without a Redis server; several backends built on one ``MemoryRedis`` behave
+like workers sharing one server.
+"""
+
+import math
+import time
+
+from app.ratelimit import TOKEN_BUCKET_SCRIPT
+
+
+class MemoryRedis:
+    def __init__(self):
+        self.hashes = {}
+        self.expires_at = {}
+        self.calls = 0
+        self.down = False                 # raise ConnectionError on every call, like an unreachable server
+
+    def hget_all(self, key: str) -> dict:
+        if key in self.expires_at and self.expires_at[key] <= time.time():
+            self.hashes.pop(key, None)
+            self.expires_at.pop(key, None)
+        return self.hashes.get(key, {})
+
+    def register_script(self, source: str):
+        if source != TOKEN_BUCKET_SCRIPT:
+            raise NotImplementedError("MemoryRedis only runs the rate limiter's token-bucket script")
+
+        async def token_bucket(keys, args):
+            self.calls += 1
+            if self.down:
+                raise ConnectionError("Error connecting to redis")
+            key, (capacity, rate) = keys[0], (float(args[0]), float(args[1]))
+            now = time.time()
+            bucket = self.hget_all(key)
+            tokens = float(bucket.get("tokens", capacity))
+            ts = float(bucket.get("ts", now))
+            tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+            allowed = 0
+            if tokens >= 1:
+                tokens -= 1
+                allowed = 1
+            self.hashes[key] = {"tokens": str(tokens), "ts": str(now)}
+            self.expires_at[key] = now + (math.ceil((capacity - tokens) / rate * 1000) + 1000) / 1000
+            return [allowed, str(tokens).encode()]
+
+        return token_bucket
+
+    async def close(self):
+        pass
@@ -0,0 +1,56 @@
+"""
+ASGI entry point that serves the real application on top of the local stand-ins.
+
+    OPENAI_BASE_URL=http://127.0.0.1:8001/v1 uvicorn benchmarks.standin_app:app
+
+Qdrant runs in-process, MongoDB is replaced by the in-memory store on startup
+and an admin account is seeded so the load generator can create its users.
+"""
+
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+
+from benchmarks.environment import use_local_stand_ins
+
+use_local_stand_ins(os.environ.get("OPENAI_BASE_URL", "http://127.0.0.1:8001/v1"))
+
+from app.auth import get_password_hash  # noqa: E402
+from app.database import get_collection  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.loop_lag import LoopLagMonitor  # noqa: E402
+from benchmarks.memory_mongo import install_memory_mongo  # noqa: E402
+
+ADMIN_EMAIL = os.environ.get("BENCH_ADMIN_EMAIL", "bench-admin@example.com")
+ADMIN_PASSWORD = os.environ.get("BENCH_ADMIN_PASSWORD", "bench-admin-password")
+
+lag_monitor = LoopLagMonitor()
+app_lifespan = app.router.lifespan_context
+
+
+@asynccontextmanager
+async def standin_lifespan(app):
+    """Run the app lifespan, then swap in the in-memory database and seed the benchmark admin."""
+    async with app_lifespan(app):
+        install_memory_mongo()
+        now = datetime.now(timezone.utc)
+        await get_collection("users").insert_one({
+            "email": ADMIN_EMAIL,
+            "hashed_password": get_password_hash(ADMIN_PASSWORD),
+            "role": "admin",
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+        })
+        lag_monitor.start()
+        yield
+        lag_monitor.stop()
+
+
+app.router.lifespan_context = standin_lifespan
+
+
+@app.get("/_bench/loop-lag", include_in_schema=False)
+async def loop_lag(reset: bool = True):
+    """Event-loop lag observed by this worker since the last reset."""
+    return lag_monitor.snapshot(reset=reset)
@@ -0,0 +1,477 @@
+"""
+Benchmarks for chunking, ingestion and end-to-end chat turns.
+
+Every benchmark returns a plain dict so results can be written out as JSON
+and compared between commits. Import this module only after
+``benchmarks.environment.use_local_stand_ins`` has been called.
+"""
+
+import asyncio
+import gzip
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import List
+
+import httpx
+import numpy as np
+
+WORDS = (
+    "acrylic aluminum bracket cable canvas ceiling channel clear color custom "
+    "dimension display drill edge finish frame glass hanging height install "
+    "letter light mount mounting neon order outdoor panel polish price print "
+    "product rod screw shipping sign size spacer standoff steel support "
+    "template thickness vinyl wall warranty waterproof weight width wood"
+).split()
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Linear-interpolated percentile of an already sorted list, q in [0, 100]."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction
+
+
+def summarize_latencies(latencies_s: List[float]) -> dict:
+    """Summarize latencies (seconds) as milliseconds."""
+    values = sorted(latency * 1000.0 for latency in latencies_s)
+    return {
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "mean": round(sum(values) / len(values), 3) if values else 0.0,
+        "max": round(values[-1], 3) if values else 0.0,
+    }
+
+
+def synthetic_text(words: int, seed: int) -> str:
+    """Deterministic catalog-like prose with sentence and paragraph breaks."""
+    rng = random.Random(seed)
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(6, 18))
+        sentence = " ".join(rng.choice(WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+        remaining -= length
+        if rng.random() < 0.15:
+            sentences.append("\n")
+    return " ".join(sentences)
+
+
+def synthetic_documents(count: int, words_per_doc: int, seed: int = 0) -> List[dict]:
+    """Documents in the shape returned by ``RAGEngine.load_document_from_upload``."""
+    return [
+        {"id": f"bench_doc_{i}.pdf", "text": synthetic_text(words_per_doc, seed + i), "page_count": 1}
+        for i in range(count)
+    ]
+
+
+def bench_import_time(module: str, repeat: int = 3, top: int = 8) -> dict:
+    """Cold-start import cost of ``module`` measured with ``python -X importtime``."""
+    totals = []
+    by_package = defaultdict(int)
+    for _ in range(repeat):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            env=dict(os.environ), capture_output=True, text=True, check=True,
+        )
+        for line in completed.stderr.splitlines():
+            if not line.startswith("import time:") or "self [us]" in line:
+                continue
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            if name.strip() == module:
+                totals.append(int(cumulative_us) / 1000.0)
+            by_package[name.strip().split(".")[0]] += int(self_us)
+    heaviest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:top]
+    return {
+        "module": module,
+        "cumulative_ms": round(statistics.median(totals), 3),
+        "heaviest_packages_ms": {name: round(us / repeat / 1000.0, 3) for name, us in heaviest},
+    }
+
+
+def synthetic_message_rows(count: int, seed: int = 0) -> List[dict]:
+    """Message documents as stored in MongoDB, alternating user and assistant turns."""
+    from bson import ObjectId
+
+    rng = random.Random(seed)
+    thread_id = str(ObjectId())
+    rows = []
+    for i in range(count):
+        assistant = i % 2 == 1
+        rows.append({
+            "_id": ObjectId(),
+            "thread_id": thread_id,
+            "role": "assistant" if assistant else "user",
+            "content": synthetic_text(rng.randint(60, 160) if assistant else rng.randint(8, 24), seed + i),
+            "created_at": datetime(2024, 1, 1, 12, 0, i % 60, 123000),
+            "retrieval_refs": [
+                {"doc_id": f"doc_{j}.pdf", "filename": f"doc_{j}.pdf", "page": 1,
+                 "chunk_id": f"chunk-{i}-{j}", "score": 0.8}
+                for j in range(3)
+            ] if assistant else None,
+        })
+    return rows
+
+
+def bench_serialization(count: int = 1000, repeat: int = 20) -> dict:
+    """Per-1,000-message cost of the validated model path versus the fast row path."""
+    from fastapi.responses import JSONResponse
+    from pydantic import TypeAdapter
+    from app.models import MessageResponse
+    from app.responses import FastJSONResponse, serialize_message
+
+    rows = synthetic_message_rows(count)
+    adapter = TypeAdapter(List[MessageResponse])
+
+    def model_path() -> bytes:
+        # Handler builds models, FastAPI re-validates them against response_model and encodes
+        models = [MessageResponse(**serialize_message(row)) for row in rows]
+        content = adapter.dump_python(adapter.validate_python(models), mode="json")
+        return JSONResponse(content).body
+
+    def fast_path() -> bytes:
+        return FastJSONResponse([serialize_message(row) for row in rows]).body
+
+    timings = {}
+    for name, path in (("model", model_path), ("fast", fast_path)):
+        path()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            body = path()
+        timings[name] = (time.perf_counter() - start) / repeat * 1000.0 * 1000 / count
+        timings[f"{name}_bytes"] = len(body)
+
+    return {
+        "messages": count,
+        "model_ms_per_1000": round(timings["model"], 3),
+        "fast_ms_per_1000": round(timings["fast"], 3),
+        "speedup": round(timings["model"] / timings["fast"], 2),
+        "payload_bytes": timings["fast_bytes"],
+        "gzip_bytes": len(gzip.compress(fast_path(), compresslevel=6)),
+    }
+
+
+def bench_chunking(rag_engine, documents: List[dict], repeat: int = 5) -> dict:
+    """Throughput of ``split_text`` over the synthetic corpus."""
+    total_bytes = sum(len(doc["text"].encode("utf-8")) for doc in documents)
+    chunk_count = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for doc in documents:
+            chunk_count += len(rag_engine.split_text(doc["text"]))
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": len(documents) * repeat,
+        "chunks": chunk_count,
+        "seconds": round(elapsed, 4),
+        "mb_per_sec": round(total_bytes * repeat / elapsed / 1e6, 3),
+        "chunks_per_sec": round(chunk_count / elapsed, 1),
+    }
+
+
+def bench_ingestion(rag_engine, documents: List[dict]) -> dict:
+    """Documents/sec through chunk -> embed -> upsert, as ``add_document`` does."""
+    chunk_count = 0
+    start = time.perf_counter()
+    for doc in documents:
+        chunks = rag_engine.preprocess_document(doc)
+        chunks = rag_engine.embed_chunks(chunks)
+        rag_engine.add_documents_to_qdrant(chunks)
+        chunk_count += len(chunks)
+    elapsed = time.perf_counter() - start
+    return {
+        "documents": len(documents),
+        "chunks": chunk_count,
+        "seconds": round(elapsed, 4),
+        "docs_per_sec": round(len(documents) / elapsed, 3),
+        "chunks_per_sec": round(chunk_count / elapsed, 1),
+    }
+
+
+def _top_ids(scores, k: int):
+    k = min(k, len(scores))
+    ids = np.argpartition(-scores, k - 1)[:k]
+    return ids[np.argsort(-scores[ids])]
+
+
+def _truncate(vectors, dim: int):
+    """What the embeddings API returns for ``dimensions=dim``: leading components, renormalized."""
+    reduced = vectors[:, :dim]
+    return reduced / np.maximum(np.linalg.norm(reduced, axis=1, keepdims=True), 1e-12)
+
+
+class QuantizedIndex:
+    """Brute-force stand-in for a Qdrant segment with scalar (int8) or binary quantization.
+
+    Candidates are ranked on the quantized vectors; with rescoring the best
+    ``k * oversampling`` of them are re-ranked with the float32 originals.
+    """
+
+    POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint16)
+
+    def __init__(self, vectors, mode: str, quantile: float = 0.99):
+        self.vectors = vectors
+        self.mode = mode
+        if mode == "scalar":
+            tail = (1.0 - quantile) / 2
+            low, high = np.quantile(vectors, [tail, 1.0 - tail])
+            scale = (high - low) / 255.0
+            codes = np.round((np.clip(vectors, low, high) - low) / scale).astype(np.uint8)
+            self.quantized = codes.astype(np.float32) * scale + low
+        elif mode == "binary":
+            self.quantized = np.packbits(vectors > 0, axis=1)
+
+    def ram_bytes(self) -> int:
+        count, dim = self.vectors.shape
+        if self.mode == "scalar":
+            return count * dim
+        if self.mode == "binary":
+            return count * ((dim + 7) // 8)
+        return count * dim * 4
+
+    def search(self, query, k: int, rescore: bool = True, oversampling: float = 2.0):
+        if self.mode == "float32":
+            return _top_ids(self.vectors @ query, k)
+        if self.mode == "scalar":
+            scores = self.quantized @ query
+        else:
+            bits = np.packbits(query > 0)
+            scores = -self.POPCOUNT[np.bitwise_xor(self.quantized, bits)].sum(axis=1, dtype=np.int32)
+        if not rescore:
+            return _top_ids(scores.astype(np.float32), k)
+        candidates = _top_ids(scores.astype(np.float32), int(k * oversampling))
+        return candidates[_top_ids(self.vectors[candidates] @ query, k)]
+
+
+def synthetic_embeddings(count: int, dim: int, rng, clusters: int = 200):
+    """Dense, topic-clustered unit vectors whose variance decays along the dimensions.
+
+    Mimics embeddings trained for shortening (text-embedding-3): the leading
+    components carry most of the signal, so truncation degrades gracefully.
+    """
+    spread = 1.0 / np.sqrt(1.0 + np.arange(dim) / 64.0)
+    centers = rng.standard_normal((clusters, dim)) * spread
+    vectors = centers[rng.integers(0, clusters, count)] + 0.6 * rng.standard_normal((count, dim)) * spread
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors.astype(np.float32), spread
+
+
+def bench_quantization(vectors: int = 10000, queries: int = 200, dims=(1536, 512, 256),
+                       top_k: int = 5, oversampling: float = 2.0, seed: int = 0) -> dict:
+    """Memory footprint and recall/latency of float32, scalar and binary storage per vector size.
+
+    Recall@k is measured against exact float32 search at the largest size, so
+    it covers both the shortened vectors and the quantization error. Latency is
+    numpy brute force: it shows the cost of rescoring, not Qdrant's SIMD speed.
+    """
+    rng = np.random.default_rng(seed)
+    full_dim = max(dims)
+    corpus, spread = synthetic_embeddings(vectors, full_dim, rng)
+    # Queries are paraphrases: a stored vector plus noise
+    query_vectors = corpus[rng.integers(0, vectors, queries)] + 0.5 * rng.standard_normal((queries, full_dim)) * spread
+    query_vectors = (query_vectors / np.linalg.norm(query_vectors, axis=1, keepdims=True)).astype(np.float32)
+    truth = [set(_top_ids(corpus @ query, top_k).tolist()) for query in query_vectors]
+
+    results = {"vectors": vectors, "queries": queries, "top_k": top_k, "oversampling": oversampling}
+    variants = (("float32", "float32", False), ("scalar", "scalar", True), ("scalar_no_rescore", "scalar", False),
+                ("binary", "binary", True), ("binary_no_rescore", "binary", False))
+    for dim in dims:
+        docs, dim_queries = _truncate(corpus, dim), _truncate(query_vectors, dim)
+        indexes = {mode: QuantizedIndex(docs, mode) for mode in ("float32", "scalar", "binary")}
+        by_variant = {}
+        for name, mode, rescore in variants:
+            index = indexes[mode]
+            latencies = []
+            found = 0
+            for query, expected in zip(dim_queries, truth):
+                start = time.perf_counter()
+                ids = index.search(query, top_k, rescore=rescore, oversampling=oversampling)
+                latencies.append(time.perf_counter() - start)
+                found += len(expected & set(ids.tolist()))
+            by_variant[name] = {
+                "recall_at_k": round(found / (queries * top_k), 4),
+                "latency_ms": summarize_latencies(latencies),
+                "ram_mb": round(index.ram_bytes() / 1e6, 3),
+                # Quantized collections keep the float32 originals on disk for rescoring
+                "disk_mb": round(docs.nbytes / 1e6, 3) if mode != "float32" else 0.0,
+            }
+        results[f"d{dim}"] = by_variant
+    return results
+
+
+def bench_scoped_search(qdrant_client, points: int = 10000, dim: int = 1536, chunks_per_doc: int = 50,
+                        scope_docs: int = 2, queries: int = 100, top_k: int = 5, seed: int = 0) -> dict:
+    """Latency of document-scoped versus unfiltered search over one large collection.
+
+    Uses a throwaway collection with the app's payload indexes. Qdrant servers
+    answer a selective indexed filter from the payload index; the local
+    ``:memory:`` mode scores every point and filters in Python, so run this
+    against a server (``--qdrant-url``) to see the saving.
+    """
+    from qdrant_client.http import models
+    from app.rag import PAYLOAD_INDEXES, scope_filter
+
+    rng = np.random.default_rng(seed)
+    collection = "bench_scoped_search"
+    if qdrant_client.collection_exists(collection):
+        qdrant_client.delete_collection(collection)
+    qdrant_client.create_collection(collection, vectors_config=models.VectorParams(size=dim, distance=models.Distance.COSINE))
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        qdrant_client.create_payload_index(collection, field_name=field_name, field_schema=field_schema)
+
+    vectors, spread = synthetic_embeddings(points, dim, rng)
+    doc_count = max(1, points // chunks_per_doc)
+    for start in range(0, points, 1000):
+        qdrant_client.upsert(collection, points=[
+            models.PointStruct(id=i, vector=vectors[i].tolist(), payload={
+                "doc_id": f"doc_{i % doc_count}",
+                "source_file": f"doc_{i % doc_count}.pdf",
+                "tags": [f"line_{i % doc_count % 10}"],
+            })
+            for i in range(start, min(start + 1000, points))
+        ])
+
+    unfiltered, scoped = [], []
+    in_scope = 0
+    for _ in range(queries):
+        source = int(rng.integers(0, points))
+        query = vectors[source] + 0.5 * rng.standard_normal(dim).astype(np.float32) * spread
+        query = (query / np.linalg.norm(query)).tolist()
+        others = rng.choice(doc_count, size=min(scope_docs, doc_count), replace=False)
+        doc_ids = sorted({f"doc_{source % doc_count}", *(f"doc_{d}" for d in others)})[:scope_docs]
+
+        start = time.perf_counter()
+        hits = qdrant_client.search(collection, query_vector=query, limit=top_k)
+        unfiltered.append(time.perf_counter() - start)
+        in_scope += sum(hit.payload["doc_id"] in doc_ids for hit in hits)
+
+        start = time.perf_counter()
+        qdrant_client.search(collection, query_vector=query, query_filter=scope_filter(doc_ids), limit=top_k)
+        scoped.append(time.perf_counter() - start)
+
+    qdrant_client.delete_collection(collection)
+    unfiltered_ms, scoped_ms = summarize_latencies(unfiltered), summarize_latencies(scoped)
+    return {
+        "points": points,
+        "scope_points": scope_docs * chunks_per_doc,
+        "unfiltered_ms": unfiltered_ms,
+        "scoped_ms": scoped_ms,
+        "scoped_speedup": round(unfiltered_ms["p50"] / scoped_ms["p50"], 2) if scoped_ms["p50"] else 0.0,
+        # Share of unfiltered results that came from the documents the user scoped to
+        "unfiltered_in_scope_ratio": round(in_scope / (queries * top_k), 3),
+    }
+
+
+async def seed_user(email: str = "bench@example.com", role: str = "user") -> dict:
+    """Insert a user directly and return auth headers for it."""
+    from app.auth import create_access_token
+    from app.database import get_collection
+
+    now = datetime.now(timezone.utc)
+    await get_collection("users").insert_one({
+        "email": email,
+        "hashed_password": "not-used-by-token-auth",
+        "role": role,
+        "is_active": True,
+        "created_at": now,
+        "updated_at": now,
+    })
+    token = create_access_token({"sub": email})
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def bench_chat_turn(app, requests: int, concurrency: int, seed: int = 0) -> dict:
+    """Latency percentiles of ``POST /chat/{thread_id}/message`` through the ASGI app."""
+    rng = random.Random(seed)
+    questions = [synthetic_text(rng.randint(6, 14), seed + i) for i in range(requests)]
+    latencies = []
+    errors = 0
+
+    async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=None) as client:
+        headers = await seed_user(f"bench-{concurrency}@example.com")
+        thread_ids = []
+        for worker in range(concurrency):
+            response = await client.post("/threads", json={"title": f"bench {worker}"}, headers=headers)
+            response.raise_for_status()
+            thread_ids.append(response.json()["id"])
+
+        queue = asyncio.Queue()
+        for question in questions:
+            queue.put_nowait(question)
+
+        async def worker(thread_id: str):
+            nonlocal errors
+            while not queue.empty():
+                question = queue.get_nowait()
+                start = time.perf_counter()
+                response = await client.post(
+                    f"/chat/{thread_id}/message", json={"message": question}, headers=headers
+                )
+                latencies.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(thread_id) for thread_id in thread_ids))
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 3),
+        "latency_ms": summarize_latencies(latencies),
+    }
+
+
+def make_pdf(text: str, lines_per_page: int = 40, line_width: int = 90) -> bytes:
+    """Build a minimal text-only PDF that PyPDF2 can extract."""
+    words = text.split()
+    lines, current = [], ""
+    for word in words:
+        if current and len(current) + len(word) + 1 > line_width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        lines.append(current)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    page_refs = []
+    for page_lines in pages:
+        escaped = [line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in page_lines]
+        stream = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in escaped) + " ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>"
+        )
+        page_refs.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(page_refs)}] /Count {len(page_refs)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode("latin-1")
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode("latin-1")
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode("latin-1")
+    return bytes(out)
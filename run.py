@@ -1,16 +1,72 @@
 #!/usr/bin/env python3
 """
 RAG Chatbot Platform - Run Script
+
+    python run.py                 # development: one worker, reload when DEBUG=true
+    python run.py --production    # production: one worker per CPU, uvloop/httptools, no reload
+
+Production mode is also selected by ENV=production.
 """
 
+import argparse
+import importlib.util
+import math
+import os
 import uvicorn
 from app.config import settings
 
+
+def available_cpus() -> int:
+    """CPUs this process may use, honouring affinity masks and cgroup v2 quotas."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return max(1, cpus)
+
+
+def production_options() -> dict:
+    """uvicorn options for a multi-worker production server."""
+    return {
+        "workers": settings.web_workers or available_cpus(),
+        "reload": False,
+        "loop": "uvloop" if importlib.util.find_spec("uvloop") else "asyncio",
+        "http": "httptools" if importlib.util.find_spec("httptools") else "h11",
+        "timeout_keep_alive": settings.keep_alive_timeout,
+        "backlog": settings.backlog,
+        "limit_concurrency": settings.limit_concurrency,
+        "timeout_graceful_shutdown": settings.graceful_shutdown_timeout,
+        "log_level": "info",
+    }
+
+
+def development_options() -> dict:
+    """uvicorn options for local development."""
+    return {
+        "reload": settings.debug,
+        "log_level": "info",
+    }
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the RAG Chatbot API")
+    parser.add_argument("--production", action="store_true", default=settings.env.lower() == "production",
+                        help="Multi-worker server without reload (default when ENV=production)")
+    args = parser.parse_args()
+    if args.production:
+        # Workers build their own settings from the environment; they serve the built frontend too
+        os.environ["ENV"] = settings.env = "production"
+
     uvicorn.run(
         "app.main:app",
         host=settings.host,
         port=settings.port,
-        reload=settings.debug,
-        log_level="info"
+        **(production_options() if args.production else development_options())
     )
@@ -3,9 +3,223 @@ let currentUser = null;
 let currentThread = null;
 let authToken = null;
 
+// Client-side caches revalidated with If-None-Match
+let threadListCache = null;          // { etag, threads }
+const threadMessageCache = new Map(); // threadId -> { etag, messages }
+
+function revalidationHeaders(cached) {
+    const headers = { 'Authorization': `Bearer ${authToken}` };
+    if (cached && cached.etag) {
+        headers['If-None-Match'] = cached.etag;
+    }
+    return headers;
+}
+
+function clearClientCaches() {
+    threadListCache = null;
+    threadMessageCache.clear();
+}
+
+// Page size for "messages since" delta requests
+const DELTA_PAGE_SIZE = 200;
+
+// Renders only the messages near the viewport; the rest are represented by spacers
+class VirtualMessageList {
+    constructor(list) {
+        this.list = list;
+        this.scroller = list.parentElement;
+        this.messages = [];
+        this.heights = [];
+        this.elements = new Map();
+        this.gap = 15;
+        this.overscan = 600;
+        this.estimatedHeight = 80;
+        this.renderPending = false;
+        this.topSpacer = document.createElement('div');
+        this.bottomSpacer = document.createElement('div');
+        this.topSpacer.className = this.bottomSpacer.className = 'virtual-spacer';
+        this.scroller.addEventListener('scroll', () => this.scheduleRender(), { passive: true });
+        window.addEventListener('resize', () => this.scheduleRender());
+    }
+
+    reset(messages) {
+        this.messages = messages.slice();
+        this.heights = this.messages.map(() => null);
+        this.elements.clear();
+        this.render();
+        this.scrollToBottom();
+    }
+
+    append(messages) {
+        const stickToBottom = this.isNearBottom();
+        messages.forEach(msg => {
+            this.messages.push(msg);
+            this.heights.push(null);
+        });
+        this.render();
+        if (stickToBottom) {
+            this.scrollToBottom();
+        }
+    }
+
+    update(index, message) {
+        this.messages[index] = message;
+        this.heights[index] = null;
+        this.elements.delete(index);
+        this.scheduleRender();
+    }
+
+    truncate(length) {
+        for (let i = length; i < this.messages.length; i++) {
+            this.elements.delete(i);
+        }
+        this.messages.length = length;
+        this.heights.length = length;
+        this.render();
+    }
+
+    clear() {
+        this.reset([]);
+    }
+
+    slotHeight(index) {
+        return (this.heights[index] ?? this.estimatedHeight) + this.gap;
+    }
+
+    isNearBottom() {
+        return this.scroller.scrollHeight - this.scroller.scrollTop - this.scroller.clientHeight < 120;
+    }
+
+    scrollToBottom() {
+        // Jump rather than smooth-scroll so the rendered window matches the final position
+        this.scroller.scrollTo({ top: this.scroller.scrollHeight, behavior: 'instant' });
+        // Estimated heights were replaced by measured ones, so settle once more
+        this.render();
+        this.scroller.scrollTo({ top: this.scroller.scrollHeight, behavior: 'instant' });
+    }
+
+    scheduleRender() {
+        if (this.renderPending) return;
+        this.renderPending = true;
+        requestAnimationFrame(() => {
+            this.renderPending = false;
+            this.render();
+        });
+    }
+
+    render() {
+        const viewTop = this.scroller.scrollTop - this.overscan;
+        const viewBottom = this.scroller.scrollTop + this.scroller.clientHeight + this.overscan;
+        const count = this.messages.length;
+
+        let first = 0;
+        let offset = 0;
+        while (first < count && offset + this.slotHeight(first) < viewTop) {
+            offset += this.slotHeight(first);
+            first++;
+        }
+        const topHeight = offset;
+
+        let last = first;
+        while (last < count && offset < viewBottom) {
+            offset += this.slotHeight(last);
+            last++;
+        }
+        let bottomHeight = 0;
+        for (let i = last; i < count; i++) {
+            bottomHeight += this.slotHeight(i);
+        }
+
+        const visible = [];
+        for (let i = first; i < last; i++) {
+            if (!this.elements.has(i)) {
+                this.elements.set(i, createMessageElement(this.messages[i]));
+            }
+            visible.push(this.elements.get(i));
+        }
+        this.topSpacer.style.height = `${Math.max(0, topHeight - this.gap)}px`;
+        this.bottomSpacer.style.height = `${Math.max(0, bottomHeight - this.gap)}px`;
+        this.list.replaceChildren(this.topSpacer, ...visible, this.bottomSpacer);
+
+        visible.forEach((element, i) => {
+            this.heights[first + i] = element.offsetHeight;
+        });
+    }
+}
+
+let messageList = null;
+
+function getMessageList() {
+    if (!messageList) {
+        messageList = new VirtualMessageList(document.getElementById('chatMessages'));
+    }
+    return messageList;
+}
+
+function samePrefix(page, messages) {
+    return page.length <= messages.length && page.every((msg, i) => msg.id === messages[i].id);
+}
+
 // API base URL
 const API_BASE = '';
 
+// One authenticated WebSocket for every chat turn; answers stream back as tokens
+class ChatSocket {
+    constructor() {
+        this.socket = null;
+        this.ready = null;
+        this.turns = new Map(); // ref -> { onToken, resolve, reject }
+        this.nextRef = 0;
+    }
+
+    connect() {
+        if (this.ready) return this.ready;
+        this.ready = new Promise((resolve, reject) => {
+            const base = API_BASE || window.location.origin;
+            const socket = new WebSocket(`${base.replace(/^http/, 'ws')}/chat/ws`);
+            socket.onopen = () => socket.send(JSON.stringify({ type: 'auth', token: authToken }));
+            socket.onmessage = event => {
+                const frame = JSON.parse(event.data);
+                if (frame.type === 'ready') {
+                    resolve(socket);
+                    return;
+                }
+                const turn = this.turns.get(frame.ref);
+                if (!turn) return;
+                if (frame.type === 'token') {
+                    turn.onToken(frame.text);
+                } else if (frame.type === 'done' || frame.type === 'cancelled' || frame.type === 'error') {
+                    this.turns.delete(frame.ref);
+                    frame.type === 'error' ? turn.reject(new Error(frame.detail)) : turn.resolve(frame);
+                }
+            };
+            socket.onclose = () => {
+                this.ready = null;
+                this.socket = null;
+                this.turns.forEach(turn => turn.reject(new Error('Chat connection closed')));
+                this.turns.clear();
+                reject(new Error('Chat connection closed'));
+            };
+            this.socket = socket;
+        });
+        return this.ready;
+    }
+
+    async send(threadId, message, onToken) {
+        const socket = await this.connect();
+        const ref = `m${this.nextRef++}`;
+        const done = new Promise((resolve, reject) => this.turns.set(ref, { onToken, resolve, reject }));
+        socket.send(JSON.stringify({ type: 'send', ref, thread_id: threadId, message }));
+        return done;
+    }
+
+    close() {
+        if (this.socket) this.socket.close();
+    }
+}
+
+const chatSocket = new ChatSocket();
+
 // DOM Content Loaded
 document.addEventListener('DOMContentLoaded', function() {
     // Check if user is already logged in
@@ -177,13 +391,15 @@ function logout() {
     authToken = null;
     currentUser = null;
     currentThread = null;
+    clearClientCaches();
+    chatSocket.close();
     
     // Clear chat interface
     document.getElementById('chatInterface').classList.add('hidden');
     document.getElementById('loginPage').classList.remove('hidden');
     
     // Clear chat messages and threads
-    document.getElementById('chatMessages').innerHTML = '';
+    getMessageList().clear();
     document.getElementById('threadsList').innerHTML = '';
     document.getElementById('currentThreadTitle').textContent = 'Select a thread to start chatting';
     document.getElementById('messageInput').disabled = true;
@@ -272,14 +488,19 @@ async function loadThreads() {
         console.log('Loading threads for user:', currentUser);
         
         const response = await fetch(`${API_BASE}/threads`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
+            headers: revalidationHeaders(threadListCache),
+            cache: 'no-store'
         });
         
-        if (response.ok) {
-            const threads = await response.json();
-            console.log('Loaded threads from API:', threads);
+        if (response.status === 304 || response.ok) {
+            let threads;
+            if (response.status === 304) {
+                threads = threadListCache.threads;
+            } else {
+                threads = await response.json();
+                threadListCache = { etag: response.headers.get('ETag'), threads: threads };
+                console.log('Loaded threads from API:', threads);
+            }
             
             const threadsList = document.getElementById('threadsList');
             threadsList.innerHTML = '';
@@ -359,24 +580,28 @@ async function createNewThread() {
 async function loadThreadMessages(threadId) {
     try {
         currentThread = threadId;
-        const messagesList = document.getElementById('chatMessages');
         
+        const cached = threadMessageCache.get(threadId);
         const response = await fetch(`${API_BASE}/chat/${threadId}/messages`, {
-            headers: {
-                'Authorization': `Bearer ${authToken}`
-            }
+            headers: revalidationHeaders(cached),
+            cache: 'no-store'
         });
         
-        if (response.ok) {
-            const messages = await response.json();
-            console.log('Loaded messages:', messages);
+        if (response.status === 304 || response.ok) {
+            let entry = cached;
+            if (response.status !== 304) {
+                const page = await response.json();
+                const etag = response.headers.get('ETag');
+                console.log('Loaded messages:', page);
+                // New messages land after the first page, so keep the cached tail when the page still matches
+                entry = cached && samePrefix(page, cached.messages)
+                    ? { etag: etag, messages: cached.messages }
+                    : { etag: etag, messages: page };
+                threadMessageCache.set(threadId, entry);
+            }
             
-            messagesList.innerHTML = '';
-            
-            messages.forEach(msg => {
-                const messageElement = createMessageElement(msg);
-                messagesList.appendChild(messageElement);
-            });
+            if (currentThread !== threadId) return;
+            getMessageList().reset(entry.messages);
             
             // Enable input fields
             document.getElementById('messageInput').disabled = false;
@@ -394,8 +619,8 @@ async function loadThreadMessages(threadId) {
             // Update thread title
             updateThreadTitle(threadId);
             
-            // Scroll to bottom
-            messagesList.scrollTop = messagesList.scrollHeight;
+            // Pull anything newer than the cached messages
+            await syncThreadMessages(threadId);
         } else {
             console.error('Failed to load messages');
         }
@@ -404,6 +629,47 @@ async function loadThreadMessages(threadId) {
     }
 }
 
+async function syncThreadMessages(threadId) {
+    const entry = threadMessageCache.get(threadId) || { etag: null, messages: [] };
+    threadMessageCache.set(threadId, entry);
+    
+    // One delta request chain per thread at a time, or messages would be appended twice
+    while (entry.syncing) {
+        await entry.syncing;
+    }
+    entry.syncing = pullMessageDeltas(threadId, entry);
+    try {
+        await entry.syncing;
+    } finally {
+        entry.syncing = null;
+    }
+}
+
+async function pullMessageDeltas(threadId, entry) {
+    while (true) {
+        const last = entry.messages[entry.messages.length - 1];
+        const params = new URLSearchParams({ limit: DELTA_PAGE_SIZE });
+        if (last) {
+            params.set('message_id', last.id);
+        }
+        const response = await fetch(`${API_BASE}/chat/${threadId}/messages/since?${params}`, {
+            headers: { 'Authorization': `Bearer ${authToken}` },
+            cache: 'no-store'
+        });
+        if (!response.ok) {
+            console.error('Failed to sync messages');
+            return;
+        }
+        
+        const delta = await response.json();
+        entry.messages.push(...delta);
+        if (currentThread === threadId && delta.length > 0) {
+            getMessageList().append(delta);
+        }
+        if (delta.length < DELTA_PAGE_SIZE) return;
+    }
+}
+
 function createMessageElement(msg) {
     const messageDiv = document.createElement('div');
     messageDiv.className = `message ${msg.role}`;
@@ -453,6 +719,12 @@ async function sendMessage() {
     
     if (!message || !currentThread) return;
     
+    const threadId = currentThread;
+    const entry = threadMessageCache.get(threadId) || { etag: null, messages: [] };
+    threadMessageCache.set(threadId, entry);
+    const list = getMessageList();
+    const confirmedLength = entry.messages.length;
+    
     // Clear input
     messageInput.value = '';
     
@@ -464,52 +736,43 @@ async function sendMessage() {
     };
     
     // Append user message immediately
-    const messagesList = document.getElementById('chatMessages');
-    const userMessageElement = createMessageElement(tempUserMessage);
-    messagesList.appendChild(userMessageElement);
-    messagesList.scrollTop = messagesList.scrollHeight;
+    list.append([tempUserMessage]);
+    list.scrollToBottom();
     
+    // Stream the answer over the chat socket; fall back to a plain request without it
+    const streamed = { role: 'assistant', content: '', created_at: new Date().toISOString() };
     try {
-        const response = await fetch(`${API_BASE}/chat/${currentThread}/message`, {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-                'Authorization': `Bearer ${authToken}`
-            },
-            body: JSON.stringify({ message: message })
-        });
+        try {
+            await chatSocket.send(threadId, message, token => {
+                if (currentThread !== threadId) return;
+                if (!streamed.content) list.append([streamed]);
+                streamed.content += token;
+                list.update(confirmedLength + 1, { ...streamed });
+            });
+        } catch (socketError) {
+            if (socketError.message !== 'Chat connection closed') throw socketError;
+            const response = await fetch(`${API_BASE}/chat/${threadId}/message`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${authToken}`
+                },
+                body: JSON.stringify({ message: message })
+            });
+            if (!response.ok) throw new Error('Failed to send message');
+        }
         
-        if (response.ok) {
-            const chatResponse = await response.json();
-            console.log('Chat response:', chatResponse);
-            
-            // Replace temporary user message with real one
-            const realUserMessage = {
-                role: 'user',
-                content: message,
-                created_at: new Date().toISOString()
-            };
-            const realUserElement = createMessageElement(realUserMessage);
-            messagesList.replaceChild(realUserElement, userMessageElement);
-            
-            // Create and append assistant message
-            const assistantMessage = {
-                role: 'assistant',
-                content: chatResponse.message,
-                created_at: new Date().toISOString()
-            };
-            const assistantElement = createMessageElement(assistantMessage);
-            messagesList.appendChild(assistantElement);
-            
-            // Scroll to bottom
-            messagesList.scrollTop = messagesList.scrollHeight;
-        } else {
-            console.error('Failed to send message');
-            alert('Failed to send message. Please try again.');
+        // Swap the temporary messages for the stored user and assistant messages
+        if (currentThread === threadId) {
+            list.truncate(confirmedLength);
+        }
+        await syncThreadMessages(threadId);
+        if (currentThread === threadId) {
+            list.scrollToBottom();
         }
     } catch (error) {
         console.error('Error sending message:', error);
-        alert('Error sending message. Please try again.');
+        alert('Failed to send message. Please try again.');
     }
 }
 
@@ -575,12 +838,13 @@ async function deleteThread(threadId) {
         
         if (response.ok) {
             console.log('Thread deleted successfully');
+            threadMessageCache.delete(threadId);
             await loadThreads();
             
             // If the deleted thread was the current thread, clear the chat
             if (currentThread === threadId) {
                 currentThread = null;
-                document.getElementById('chatMessages').innerHTML = '';
+                getMessageList().clear();
                 document.getElementById('currentThreadTitle').textContent = 'Select a thread to start chatting';
                 document.getElementById('messageInput').disabled = true;
                 document.getElementById('sendButton').disabled = true;
@@ -606,7 +870,10 @@ async function deleteMessage(messageId) {
         
         if (response.ok) {
             console.log('Message deleted successfully');
-            // Reload messages to reflect the change
+            // Drop it from the cached copy and re-render
+            threadMessageCache.forEach(entry => {
+                entry.messages = entry.messages.filter(msg => msg.id !== messageId);
+            });
             if (currentThread) {
                 await loadThreadMessages(currentThread);
             }
@@ -908,6 +1175,10 @@ async function uploadDocument() {
     
     const formData = new FormData();
     formData.append('file', file);
+    const tags = document.getElementById('documentTags').value.trim();
+    if (tags) {
+        formData.append('tags', tags);
+    }
     
     // Show progress bar
     const progressDiv = document.getElementById('uploadProgress');
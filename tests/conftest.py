@@ -0,0 +1,21 @@
+import os
+
+# Offline defaults so the app settings load without a .env file.
+# A local in-process Qdrant keeps RAGEngine usable without a server.
+os.environ.setdefault("MONGODB_URI", "mongodb://localhost:27017")
+os.environ.setdefault("MONGODB_DBNAME", "rag_chatbot_test")
+os.environ.setdefault("QDRANT_URL", ":memory:")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+os.environ.setdefault("JWT_SECRET", "test-secret")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_rate_limits():
+    """Start every test with empty rate-limit buckets."""
+    from app.ratelimit import RateLimits
+
+    RateLimits.backend = None
+    yield
+    RateLimits.backend = None
@@ -0,0 +1,99 @@
+import os
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from app.assets import build_assets, index_html_path, IndexPage, PrecompressedStaticFiles, IMMUTABLE
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "app.js").write_text("console.log('chat');\n" * 200)
+    (tmp_path / "styles.css").write_text("body { color: #333; }\n" * 200)
+    (tmp_path / "index.html").write_text(
+        '<link rel="stylesheet" href="/static/styles.css?v=15">'
+        '<script src="/static/app.js?v=14"></script>'
+    )
+    return tmp_path
+
+
+def make_app(static_dir):
+    app = FastAPI()
+    app.mount("/static", PrecompressedStaticFiles(directory=str(static_dir)), name="static")
+    index_page = IndexPage(str(static_dir / "dist" / "index.html"))
+
+    @app.get("/")
+    async def root(request: Request):
+        return index_page.response(request)
+
+    return app
+
+
+class TestAssets:
+    def test_build_fingerprints_and_precompresses(self, static_dir):
+        """Test the build writes hashed, precompressed assets and rewrites index.html."""
+        manifest = build_assets(str(static_dir), str(static_dir / "dist"))
+
+        js = manifest["app.js"]
+        assert js.startswith("app.") and js.endswith(".js") and js != "app.js"
+        assert os.path.isfile(static_dir / "dist" / js)
+        assert os.path.isfile(static_dir / "dist" / f"{js}.gz")
+
+        index_html = (static_dir / "dist" / "index.html").read_text()
+        assert f"/static/dist/{js}" in index_html
+        assert f"/static/dist/{manifest['styles.css']}" in index_html
+        assert "?v=" not in index_html
+
+    def test_fingerprinted_assets_are_immutable_and_precompressed(self, static_dir):
+        """Test hashed files get long-lived caching and the .gz sibling."""
+        manifest = build_assets(str(static_dir), str(static_dir / "dist"))
+        client = TestClient(make_app(static_dir))
+
+        response = client.get(f"/static/dist/{manifest['app.js']}", headers={"Accept-Encoding": "gzip"})
+
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == IMMUTABLE
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["content-type"].startswith("text/javascript") or \
+            response.headers["content-type"].startswith("application/javascript")
+        assert "console.log" in response.text
+
+    def test_unfingerprinted_assets_revalidate(self, static_dir):
+        """Test source files are served with no-cache so edits show up."""
+        build_assets(str(static_dir), str(static_dir / "dist"))
+        client = TestClient(make_app(static_dir))
+
+        response = client.get("/static/app.js")
+
+        assert response.headers["cache-control"] == "no-cache"
+
+    def test_index_etag_revalidation(self, static_dir):
+        """Test index.html answers a matching If-None-Match with 304."""
+        build_assets(str(static_dir), str(static_dir / "dist"))
+        client = TestClient(make_app(static_dir))
+
+        first = client.get("/")
+        assert first.status_code == 200
+        etag = first.headers["etag"]
+
+        second = client.get("/", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+
+    def test_production_serves_the_hashed_index(self, static_dir, monkeypatch):
+        """Test ENV=production serves the built index.html and development the editable source."""
+        from app.config import settings
+        from app.main import create_index_page
+
+        manifest = build_assets(str(static_dir), str(static_dir / "dist"))
+        monkeypatch.setattr("app.assets.STATIC_DIR", str(static_dir))
+        monkeypatch.setattr("app.assets.DIST_DIR", str(static_dir / "dist"))
+
+        monkeypatch.setattr(settings, "env", "production")
+        production = create_index_page()
+        assert f"/static/dist/{manifest['app.js']}".encode() in production.variants[None]
+        assert not production.watch
+
+        monkeypatch.setattr(settings, "env", "development")
+        development = create_index_page()
+        assert development.path == index_html_path(production=False) == str(static_dir / "index.html")
+        assert development.watch
@@ -0,0 +1,141 @@
+import pytest
+import numpy as np
+from benchmarks.fake_openai import embed_text
+from benchmarks.loadgen import LoadStats, parse_mix
+from benchmarks.memory_mongo import MemoryCollection, matches
+from app.config import settings
+from app.rag import RAGEngine
+from app.scheduler import BACKGROUND
+from benchmarks.suite import (QuantizedIndex, bench_ingestion, percentile, summarize_latencies, synthetic_documents,
+                              synthetic_embeddings, synthetic_text)
+
+
+class TestBenchmarkHelpers:
+    def test_percentile(self):
+        """Test linear-interpolated percentiles."""
+        values = [1.0, 2.0, 3.0, 4.0, 5.0]
+
+        assert percentile(values, 50) == 3.0
+        assert percentile(values, 0) == 1.0
+        assert percentile(values, 100) == 5.0
+        assert percentile(values, 95) == pytest.approx(4.8)
+        assert percentile([], 50) == 0.0
+
+    def test_summarize_latencies(self):
+        """Test latency summary is reported in milliseconds."""
+        summary = summarize_latencies([0.010, 0.020, 0.030])
+
+        assert summary["p50"] == 20.0
+        assert summary["max"] == 30.0
+
+    def test_synthetic_text_is_deterministic(self):
+        """Test the synthetic corpus is stable across runs."""
+        assert synthetic_text(100, seed=3) == synthetic_text(100, seed=3)
+        assert synthetic_text(100, seed=3) != synthetic_text(100, seed=4)
+
+
+class TestQuantizationBenchmark:
+    def test_quantized_index(self):
+        """Test quantized storage sizes and that rescoring recovers exact neighbours."""
+        vectors, _ = synthetic_embeddings(500, 128, np.random.default_rng(0), clusters=20)
+        exact = QuantizedIndex(vectors, "float32")
+        scalar = QuantizedIndex(vectors, "scalar")
+        binary = QuantizedIndex(vectors, "binary")
+
+        assert scalar.ram_bytes() * 4 == exact.ram_bytes()
+        assert binary.ram_bytes() * 32 == exact.ram_bytes()
+
+        query = vectors[7]
+        assert exact.search(query, 5)[0] == 7
+        assert scalar.search(query, 5)[0] == 7
+        assert binary.search(query, 5, oversampling=4.0)[0] == 7
+
+
+class TestIngestionBenchmark:
+    def test_embeds_like_add_document(self, monkeypatch):
+        """Test the benchmark embeds in batches at background priority, as add_document does."""
+        monkeypatch.setattr(settings, "embedding_dim", 64)
+        monkeypatch.setattr(settings, "qdrant_collection_name", "bench_ingest_test")
+        rag = RAGEngine()
+        rag.ensure_collection()
+        requests = []
+
+        def embed(texts, priority=None):
+            requests.append(priority)
+            return [embed_text(text, 64).tolist() for text in texts]
+
+        monkeypatch.setattr(rag, "get_openai_embeddings", embed)
+        monkeypatch.setattr(settings, "embed_batch_size", 8)
+        documents = synthetic_documents(3, 2000)
+        report = bench_ingestion(rag, documents)
+
+        assert len(requests) == sum(-(-len(rag.preprocess_document(doc)) // 8) for doc in documents) < report["chunks"]
+        assert set(requests) == {BACKGROUND}
+
+
+class TestFakeOpenAI:
+    def test_embeddings_are_deterministic_unit_vectors(self):
+        """Test fake embeddings are stable and normalized."""
+        first = embed_text("wall mounted acrylic sign", 256)
+        second = embed_text("wall mounted acrylic sign", 256)
+
+        assert np.array_equal(first, second)
+        assert np.linalg.norm(first) == pytest.approx(1.0)
+
+    def test_similar_texts_score_higher(self):
+        """Test overlapping vocabulary yields higher cosine similarity."""
+        query = embed_text("how do I mount an acrylic sign", 512)
+        related = embed_text("mount the acrylic sign with standoff screws", 512)
+        unrelated = embed_text("shipping warranty for outdoor neon", 512)
+
+        assert float(query @ related) > float(query @ unrelated)
+
+
+class TestMemoryMongo:
+    def test_query_operators(self):
+        """Test the supported subset of filter operators."""
+        doc = {"email": "Admin@Example.com", "role": "admin", "count": 5}
+
+        assert matches(doc, {"role": {"$in": ["admin", "user"]}})
+        assert matches(doc, {"email": {"$regex": "admin", "$options": "i"}})
+        assert matches(doc, {"count": {"$gte": 5, "$lt": 10}})
+        assert not matches(doc, {"role": {"$ne": "admin"}})
+        assert not matches(doc, {"missing": {"$exists": True}})
+
+    @pytest.mark.asyncio
+    async def test_cursor_sort_skip_limit(self):
+        """Test cursor chaining mirrors Motor's behaviour."""
+        collection = MemoryCollection("messages")
+        for i in range(5):
+            await collection.insert_one({"thread_id": "t1", "seq": i})
+        await collection.insert_one({"thread_id": "t2", "seq": 99})
+
+        docs = await collection.find({"thread_id": "t1"}).sort("seq", -1).skip(1).limit(2).to_list(None)
+
+        assert [doc["seq"] for doc in docs] == [3, 2]
+        assert await collection.count_documents({"thread_id": "t1"}) == 5
+
+
+class TestLoadGenerator:
+    def test_parse_mix(self):
+        """Test session mix parsing and validation."""
+        assert parse_mix("chat=0.7,browse=0.3") == {"chat": 0.7, "browse": 0.3}
+        assert parse_mix("chat") == {"chat": 1.0}
+
+        with pytest.raises(ValueError):
+            parse_mix("upload=1")
+
+    def test_load_stats_report(self):
+        """Test error rates and per-operation summaries."""
+        stats = LoadStats()
+        stats.record("login", 0.1, 200)
+        stats.record("send_message", 0.5, 200)
+        stats.record("send_message", 0.7, 500)
+        stats.record("send_message", 0.9, None)
+
+        report = stats.report(elapsed=2.0)
+
+        assert report["requests"] == 4
+        assert report["throughput_rps"] == 2.0
+        assert report["error_rate"] == 0.5
+        assert report["operations"]["send_message"]["errors"] == {"500": 1, "exception": 1}
@@ -0,0 +1,192 @@
+import threading
+import time
+import pytest
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from app.auth import create_access_token
+from app.chat import AnswerPlan, ChatService
+from app.main import app
+from app.models import RetrievalRef
+from app.query_router import QueryRouter
+from app.services import get_chat_service, get_query_router
+from benchmarks.memory_mongo import install_memory_mongo
+
+
+class FakeStream:
+    """Streamed completion that yields ``tokens`` (forever when None) until closed."""
+
+    def __init__(self, tokens, delay):
+        self.tokens = tokens
+        self.delay = delay
+        self.sent = 0
+        self.response = SimpleNamespace(closed=False)
+        self.response.close = lambda: setattr(self.response, "closed", True)
+
+    def __iter__(self):
+        while self.tokens is None or self.sent < len(self.tokens):
+            time.sleep(self.delay)
+            token = "tok " if self.tokens is None else self.tokens[self.sent]
+            self.sent += 1
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+
+
+class FakeOpenAI:
+    def __init__(self, tokens=None, delay=0.01):
+        self.streams = []
+        self.tokens = tokens
+        self.delay = delay
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, stream=False, **kwargs):
+        self.streams.append(FakeStream(self.tokens, self.delay))
+        return self.streams[-1]
+
+
+class PlannedChatService(ChatService):
+    """Chat service whose retrieval step is canned, so only generation is exercised."""
+
+    def plan_answer(self, message, doc_ids=None, tags=None, tenant_id=None, query_embedding=None):
+        ref = RetrievalRef(doc_id="doc-1", filename="guide.pdf", page=2, chunk_id="guide.pdf_chunk0", score=0.9)
+        return AnswerPlan(prompt=message, system="system", retrieval_refs=[ref])
+
+
+@pytest.fixture
+def setup():
+    database = install_memory_mongo()
+    now = datetime.now(timezone.utc)
+
+    def build(openai_client):
+        chat_service = PlannedChatService(SimpleNamespace(get_openai_embedding=lambda text: [0.1, 0.2]), openai_client)
+        app.dependency_overrides[get_chat_service] = lambda: chat_service
+        app.dependency_overrides[get_query_router] = lambda: QueryRouter()
+        return TestClient(app)
+
+    async def add_thread(owner):
+        result = await database["threads"].insert_one({"title": "t", "owner_user_id": owner, "created_at": now,
+                                                       "updated_at": now, "message_count": 0})
+        return str(result.inserted_id)
+
+    async def add_user(email):
+        result = await database["users"].insert_one({"email": email, "hashed_password": "x", "role": "user",
+                                                     "is_active": True, "created_at": now, "updated_at": now})
+        return str(result.inserted_id), create_access_token({"sub": email})
+
+    yield database, build, add_thread, add_user
+    app.dependency_overrides.clear()
+
+
+@contextmanager
+def connect(client, token):
+    with client.websocket_connect("/chat/ws") as ws:
+        ws.send_json({"type": "auth", "token": token})
+        yield ws
+
+
+def frames_until(ws, kinds):
+    frames = []
+    while not frames or frames[-1]["type"] not in kinds:
+        frames.append(ws.receive_json())
+    return frames
+
+
+class TestChatSocket:
+    @pytest.mark.asyncio
+    async def test_turns_on_several_threads_stream_over_one_socket(self, setup):
+        """Test one authenticated socket streams refs, tokens and a stored answer per thread."""
+        database, build, add_thread, add_user = setup
+        user_id, token = await add_user("owner@example.com")
+        threads = [await add_thread(user_id), await add_thread(user_id)]
+        client = build(FakeOpenAI(tokens=["Use ", "screws."]))
+
+        with connect(client, token) as ws:
+            assert ws.receive_json() == {"type": "ready", "user_id": user_id}
+            results = {}
+            for i, thread_id in enumerate(threads):
+                ws.send_json({"type": "send", "ref": f"r{i}", "thread_id": thread_id, "message": "How do I mount it?"})
+                results[thread_id] = frames_until(ws, {"done", "error"})
+
+        for thread_id, frames in results.items():
+            assert [frame["type"] for frame in frames] == ["refs", "token", "token", "done"]
+            assert frames[0]["retrieval_refs"][0]["filename"] == "guide.pdf"
+            assert frames[-1]["message"] == "Use screws."
+            assert frames[-1]["thread_id"] == thread_id
+        counts = {str(thread["_id"]): thread["message_count"] for thread in database["threads"].docs}
+        assert counts == {thread_id: 2 for thread_id in threads}
+
+    @pytest.mark.asyncio
+    async def test_cancel_aborts_the_upstream_stream(self, setup):
+        """Test cancelling a turn closes the LLM response and keeps only the question."""
+        database, build, add_thread, add_user = setup
+        user_id, token = await add_user("owner@example.com")
+        thread_id = await add_thread(user_id)
+        openai_client = FakeOpenAI(tokens=None)
+        client = build(openai_client)
+
+        with connect(client, token) as ws:
+            ws.receive_json()
+            ws.send_json({"type": "send", "ref": "r1", "thread_id": thread_id, "message": "Tell me everything"})
+            frames_until(ws, {"token"})
+            ws.send_json({"type": "cancel", "ref": "r1"})
+            frames = frames_until(ws, {"cancelled"})
+
+        stream = openai_client.streams[0]
+        # The worker notices the cancel at the next token
+        deadline = time.monotonic() + 1
+        while not stream.response.closed and time.monotonic() < deadline:
+            time.sleep(0.01)
+        sent = stream.sent
+        time.sleep(0.05)
+        assert stream.response.closed
+        assert stream.sent == sent
+        assert frames[-1] == {"type": "cancelled", "ref": "r1"}
+        assert [message["role"] for message in database["messages"].docs] == ["user"]
+        assert database["threads"].docs[0]["message_count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_streams_are_read_on_generation_threads(self):
+        """Test a token stream holds a generation thread rather than one of the default executor's."""
+        openai_client = FakeOpenAI(tokens=["a ", "b"], delay=0)
+        threads = []
+        create = openai_client.create
+        openai_client.chat.completions.create = lambda **kwargs: threads.append(threading.current_thread().name) or create(**kwargs)
+        chat_service = PlannedChatService(SimpleNamespace(), openai_client)
+
+        tokens = [token async for token in chat_service.stream_answer(AnswerPlan(prompt="q", system="system"))]
+
+        assert "".join(tokens) == "a b"
+        assert threads[0].startswith("chat-generation")
+
+    @pytest.mark.asyncio
+    async def test_access_is_checked_per_thread(self, setup):
+        """Test a send to someone else's thread fails without closing the socket."""
+        database, build, add_thread, add_user = setup
+        _, token = await add_user("owner@example.com")
+        other_id, _ = await add_user("other@example.com")
+        thread_id = await add_thread(other_id)
+        client = build(FakeOpenAI(tokens=["x"]))
+
+        with connect(client, token) as ws:
+            ws.receive_json()
+            ws.send_json({"type": "send", "ref": "r1", "thread_id": thread_id, "message": "hi there, question"})
+            error = frames_until(ws, {"error"})[-1]
+            ws.send_json({"type": "ping"})
+            unknown = ws.receive_json()
+
+        assert (error["ref"], error["status"]) == ("r1", 403)
+        assert unknown["status"] == 400
+        assert database["messages"].docs == []
+
+    def test_bad_token_closes_the_socket(self, setup):
+        """Test a socket whose first frame does not authenticate is closed."""
+        _, build, _, _ = setup
+        client = build(FakeOpenAI())
+
+        with client.websocket_connect("/chat/ws") as ws:
+            ws.send_json({"type": "auth", "token": "not-a-jwt"})
+            with pytest.raises(WebSocketDisconnect) as closed:
+                ws.receive_json()
+
+        assert closed.value.code == 1008
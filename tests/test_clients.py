@@ -0,0 +1,53 @@
+import pytest
+import httpx
+from app.clients import create_openai_client, create_openai_http_client, http_pool_stats, qdrant_pool_stats
+from app.config import settings
+from app.database import mongo_client_options, PoolStatsListener
+from app.rag import RAGEngine
+from app.chat import ChatService
+
+
+class TestClients:
+    def test_chat_service_shares_openai_client(self):
+        """Test both OpenAI uses go through one client."""
+        rag = RAGEngine()
+        chat_service = ChatService(rag)
+
+        assert chat_service.client is rag.openai_client
+
+    def test_openai_client_uses_shared_http_client(self):
+        """Test the OpenAI client is built on the tuned keep-alive pool."""
+        http_client = create_openai_http_client()
+        client = create_openai_client(http_client)
+
+        assert client._client is http_client
+        assert http_pool_stats(http_client) == {"connections": 0, "idle": 0, "active": 0, "http2": 0}
+
+    def test_mongo_client_options(self, monkeypatch):
+        """Test pool settings and that only available compressors are offered."""
+        monkeypatch.setattr(settings, "mongo_compressors", "zlib,unknown")
+
+        options = mongo_client_options()
+
+        assert options["maxPoolSize"] == settings.mongo_max_pool_size
+        assert options["minPoolSize"] == settings.mongo_min_pool_size
+        assert options["compressors"] == "zlib"
+
+    def test_pool_stats_listener(self):
+        """Test pool events are summarized per server."""
+        class Event:
+            address = ("db.example.com", 27017)
+
+        listener = PoolStatsListener()
+        listener.connection_created(Event())
+        listener.connection_created(Event())
+        listener.connection_checked_out(Event())
+        listener.connection_closed(Event())
+
+        stats = listener.snapshot()["db.example.com:27017"]
+        assert stats["open"] == 1
+        assert stats["in_use"] == 1
+
+    def test_qdrant_pool_stats_local(self):
+        """Test the local store reports its transport."""
+        assert qdrant_pool_stats(RAGEngine().qdrant_client) == {"transport": "local"}
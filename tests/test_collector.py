@@ -0,0 +1,157 @@
+import uuid
+import pytest
+from datetime import datetime, timezone
+from bson import ObjectId
+from qdrant_client.http.models import PointStruct
+from fastapi.testclient import TestClient
+from app.auth import get_current_user
+from app.collector import GarbageCollector
+from app.config import settings
+from app.main import app
+from app.models import User
+from app.rag import RAGEngine
+from benchmarks.fake_openai import embed_text
+from benchmarks.memory_mongo import install_memory_mongo
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(settings, "gc_batch_size", 2)
+    monkeypatch.setattr(settings, "gc_batch_pause", 0)
+    return install_memory_mongo()
+
+
+@pytest.fixture
+def rag(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_dim", 64)
+    monkeypatch.setattr(settings, "qdrant_collection_name", "gc_test")
+    return RAGEngine()
+
+
+def add_chunks(rag, doc_id, filename, count=3):
+    chunks = [{"id": f"{filename}_chunk{i}", "text": f"chunk {i} of {filename}", "source_file": filename,
+               "doc_id": doc_id, "embedding": embed_text(f"chunk {i}", 64).tolist()} for i in range(count)]
+    rag.add_documents_to_qdrant(chunks)
+
+
+def add_legacy_chunks(rag, filename, count=3):
+    """Chunks as written before doc_id existed: only ``source_file`` names the document."""
+    rag.ensure_collection()
+    rag.qdrant_client.upsert(collection_name=rag.collection_for(None), points=[
+        PointStruct(id=str(uuid.uuid4()), vector=embed_text(f"chunk {i}", 64).tolist(),
+                    payload={"text": f"chunk {i} of {filename}", "source_file": filename, "chunk_id": f"{filename}_chunk{i}"})
+        for i in range(count)
+    ])
+
+
+def point_doc_ids(rag):
+    pairs, _ = rag.scroll_point_doc_ids(limit=100)
+    return sorted(doc_id for _, doc_id in pairs)
+
+
+async def add_thread(database, owner, messages=5):
+    now = datetime.now(timezone.utc)
+    result = await database["threads"].insert_one({
+        "title": "t", "owner_user_id": owner, "created_at": now, "updated_at": now
+    })
+    thread_id = str(result.inserted_id)
+    for i in range(messages):
+        await database["messages"].insert_one({"thread_id": thread_id, "role": "user", "content": str(i), "created_at": now})
+    return thread_id
+
+
+class TestTombstones:
+    @pytest.mark.asyncio
+    async def test_thread_delete_returns_before_messages_are_removed(self, database, rag):
+        """Test deleting a thread hides it at once and the collector removes its messages in batches."""
+        now = datetime.now(timezone.utc)
+        user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+        app.dependency_overrides[get_current_user] = lambda: user
+        try:
+            client = TestClient(app)
+            thread_id = await add_thread(database, "user_1")
+
+            assert client.delete(f"/threads/{thread_id}").status_code == 200
+            assert client.get("/threads").json() == []
+            assert client.get(f"/chat/{thread_id}/messages").status_code == 404
+            assert len(database["messages"].docs) == 5
+        finally:
+            app.dependency_overrides.clear()
+
+        assert (await GarbageCollector(rag).run_once())["threads"] == 1
+        assert database["threads"].docs == []
+        assert database["messages"].docs == []
+
+    @pytest.mark.asyncio
+    async def test_user_delete_cascades(self, database, rag):
+        """Test a tombstoned user's threads and messages are collected with them."""
+        user = await database["users"].insert_one({"email": "gone@example.com", "deleted_at": datetime.now(timezone.utc)})
+        await add_thread(database, str(user.inserted_id))
+        kept = await add_thread(database, "someone_else", messages=1)
+
+        result = await GarbageCollector(rag).run_once()
+
+        assert (result["users"], result["threads"]) == (1, 1)
+        assert [str(thread["_id"]) for thread in database["threads"].docs] == [kept]
+        assert [message["thread_id"] for message in database["messages"].docs] == [kept]
+
+    @pytest.mark.asyncio
+    async def test_document_points_are_collected_including_legacy_chunks(self, database, rag):
+        """Test a deleted document's points go even when they have no doc_id, sparing a re-upload of the file."""
+        add_chunks(rag, "doc-new", "new.pdf")
+        add_legacy_chunks(rag, "legacy.pdf")
+        add_chunks(rag, "doc-reupload", "legacy.pdf", count=1)
+        now = datetime.now(timezone.utc)
+        for doc_id, filename in (("doc-new", "new.pdf"), (str(ObjectId()), "legacy.pdf")):
+            await database["documents"].insert_one({"doc_id": doc_id, "filename": filename, "deleted_at": now})
+
+        assert (await GarbageCollector(rag).run_once())["documents"] == 2
+        assert point_doc_ids(rag) == ["doc-reupload"]
+        assert database["documents"].docs == []
+
+
+class TestReconcile:
+    @pytest.mark.asyncio
+    async def test_orphans_are_swept(self, database, rag, monkeypatch):
+        """Test orphaned messages go at once and orphaned points only after a second sweep."""
+        monkeypatch.setattr(settings, "gc_orphan_grace", 0)
+        await database["users"].insert_one({"_id": ObjectId(), "email": "owner@example.com"})
+        await database["messages"].insert_one({"thread_id": str(ObjectId()), "role": "user", "content": "x"})
+        await database["documents"].insert_one({"doc_id": "doc-live", "filename": "live.pdf"})
+        add_chunks(rag, "doc-live", "live.pdf", count=1)
+        add_chunks(rag, "doc-orphan", "orphan.pdf", count=3)
+        collector = GarbageCollector(rag)
+
+        first = await collector.reconcile()
+        assert (first["messages"], first["points"]) == (1, 0)
+        assert point_doc_ids(rag) == ["doc-live", "doc-orphan", "doc-orphan", "doc-orphan"]
+
+        assert (await collector.reconcile())["points"] == 3
+        assert point_doc_ids(rag) == ["doc-live"]
+
+    @pytest.mark.asyncio
+    async def test_legacy_points_of_live_documents_are_kept(self, database, rag):
+        """Test points without a doc_id are matched to live documents by filename and survive sweeps."""
+        await database["documents"].insert_one({"doc_id": str(ObjectId()), "filename": "legacy.pdf"})
+        add_legacy_chunks(rag, "legacy.pdf", count=2)
+        add_legacy_chunks(rag, "gone.pdf", count=1)
+        collector = GarbageCollector(rag)
+
+        await collector.reconcile()
+        assert (await collector.reconcile())["points"] == 1
+        assert point_doc_ids(rag) == ["legacy.pdf", "legacy.pdf"]
+
+    @pytest.mark.asyncio
+    async def test_points_of_a_long_upload_are_not_swept(self, database, rag, monkeypatch):
+        """Test points stored before their document is recorded survive sweeps during the grace period."""
+        monkeypatch.setattr(settings, "gc_orphan_grace", 3600)
+        add_chunks(rag, "doc-uploading", "uploading.pdf", count=2)
+        collector = GarbageCollector(rag)
+
+        assert (await collector.reconcile())["points"] == 0
+        assert (await collector.reconcile())["points"] == 0
+        assert point_doc_ids(rag) == ["doc-uploading", "doc-uploading"]
+
+        monkeypatch.setattr(settings, "gc_orphan_grace", 0)
+        await collector.reconcile()
+        assert (await collector.reconcile())["points"] == 2
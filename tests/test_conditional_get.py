@@ -0,0 +1,107 @@
+import pytest
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from app.auth import get_current_user
+from app.main import app
+from app.messages import append_messages
+from app.models import User
+from app.responses import etag_matches, weak_etag
+from benchmarks.memory_mongo import install_memory_mongo
+
+
+@pytest.fixture
+def client():
+    database = install_memory_mongo()
+    now = datetime.now(timezone.utc)
+    user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+    app.dependency_overrides[get_current_user] = lambda: user
+    yield TestClient(app), database
+    app.dependency_overrides.clear()
+
+
+async def add_thread(database, updated_at):
+    result = await database["threads"].insert_one({
+        "title": "Mounting", "owner_user_id": "user_1",
+        "created_at": updated_at, "updated_at": updated_at
+    })
+    return str(result.inserted_id)
+
+
+class TestConditionalGet:
+    def test_etag_matching(self):
+        """Test weak comparison and wildcard handling."""
+        etag = weak_etag("a", 1)
+
+        assert etag.startswith('W/"')
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('W/"other"', etag)
+        assert not etag_matches(None, etag)
+
+    @pytest.mark.asyncio
+    async def test_messages_revalidate_until_thread_changes(self, client):
+        """Test an unchanged message page is a 304 and a new message invalidates it."""
+        client, database = client
+        now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        thread_id = await add_thread(database, now)
+        await database["messages"].insert_one({
+            "thread_id": thread_id, "role": "user", "content": "hi", "created_at": now, "retrieval_refs": None
+        })
+
+        first = client.get(f"/chat/{thread_id}/messages")
+        etag = first.headers["etag"]
+        assert first.status_code == 200
+        assert first.headers["cache-control"] == "private, no-cache"
+
+        cached = client.get(f"/chat/{thread_id}/messages", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        assert cached.content == b""
+
+        # New messages are written together with the thread's summary
+        await append_messages(thread_id, [{"role": "assistant", "content": "hello", "created_at": now, "retrieval_refs": []}])
+        changed = client.get(f"/chat/{thread_id}/messages", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert len(changed.json()) == 2
+
+    @pytest.mark.asyncio
+    async def test_thread_list_revalidation(self, client):
+        """Test the thread list ETag follows creates and updates."""
+        client, database = client
+        await add_thread(database, datetime(2024, 5, 1, tzinfo=timezone.utc))
+
+        etag = client.get("/threads").headers["etag"]
+        assert client.get("/threads", headers={"If-None-Match": etag}).status_code == 304
+
+        await add_thread(database, datetime(2024, 5, 2, tzinfo=timezone.utc))
+        changed = client.get("/threads", headers={"If-None-Match": etag})
+        assert changed.status_code == 200
+        assert len(changed.json()) == 2
+
+
+class TestDeltaSync:
+    @pytest.mark.asyncio
+    async def test_messages_since(self, client):
+        """Test only messages after the given id are returned, oldest first."""
+        client, database = client
+        now = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        thread_id = await add_thread(database, now)
+        ids = []
+        for i in range(5):
+            result = await database["messages"].insert_one({
+                "thread_id": thread_id, "role": "user", "content": f"m{i}", "created_at": now, "retrieval_refs": None
+            })
+            ids.append(str(result.inserted_id))
+        await database["messages"].insert_one({
+            "thread_id": "other", "role": "user", "content": "x", "created_at": now, "retrieval_refs": None
+        })
+
+        everything = client.get(f"/chat/{thread_id}/messages/since").json()
+        delta = client.get(f"/chat/{thread_id}/messages/since", params={"message_id": ids[2]}).json()
+        paged = client.get(f"/chat/{thread_id}/messages/since", params={"message_id": ids[0], "limit": 2}).json()
+        empty = client.get(f"/chat/{thread_id}/messages/since", params={"message_id": ids[-1]}).json()
+
+        assert [m["id"] for m in everything] == ids
+        assert [m["content"] for m in delta] == ["m3", "m4"]
+        assert [m["id"] for m in paged] == ids[1:3]
+        assert empty == []
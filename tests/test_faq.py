@@ -0,0 +1,123 @@
+import pytest
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from app.auth import get_current_user
+from app.config import settings
+from app.faq import FAQIndex, TenantFAQ
+from app.main import app
+from app.models import User
+from app.query_router import QueryRouter
+from app.services import get_query_router, get_rag_engine
+from benchmarks.fake_openai import embed_text
+from benchmarks.memory_mongo import install_memory_mongo
+
+DIM = 64
+
+
+def embed(text):
+    return embed_text(text, DIM).tolist()
+
+
+def faq_entry(questions, answer, model=None):
+    return {"questions": questions, "answer": answer, "embeddings": [embed(q) for q in questions],
+            "embedding_model": model or settings.embedding_model}
+
+
+class FakeRAGEngine:
+    def get_openai_embeddings(self, texts):
+        return [embed(text) for text in texts]
+
+    def get_openai_embedding(self, text):
+        return embed(text)
+
+
+@pytest.fixture(autouse=True)
+def small_embeddings(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_dim", DIM)
+
+
+class TestFAQMatching:
+    def test_closest_variant_wins(self):
+        """Test a query is matched against every question variant in one pass."""
+        faq = TenantFAQ([
+            faq_entry(["what are your shipping times", "how long does delivery take"], "3 business days."),
+            faq_entry(["do you offer refunds", "can I return my sign"], "Within 30 days."),
+        ])
+
+        entry, score = faq.match(embed("how long does delivery take"))
+
+        assert entry["answer"] == "3 business days."
+        assert score == pytest.approx(1.0, abs=1e-5)
+        assert faq.matrix.shape == (4, DIM)
+
+    def test_threshold_and_stale_models(self, monkeypatch):
+        """Test weak matches and vectors from another embedding model are ignored."""
+        index = FAQIndex()
+        index.set_entries("default", [
+            faq_entry(["do you offer refunds"], "Within 30 days."),
+            faq_entry(["what are your shipping times"], "3 business days.", model="old-model"),
+        ])
+
+        assert index.match(embed("do you offer refunds"), "default")["answer"] == "Within 30 days."
+        assert index.match(embed("what are your shipping times"), "default") is None
+        assert index.lookup("what are your shipping times", "default")["answer"] == "3 business days."
+
+        monkeypatch.setattr(settings, "faq_match_threshold", 1.01)
+        assert index.match(embed("do you offer refunds"), "default") is None
+
+
+class TestFAQAdmin:
+    @pytest.fixture
+    def client(self):
+        database = install_memory_mongo()
+        now = datetime.now(timezone.utc)
+        admin = User(id="admin_1", email="admin@example.com", hashed_password="x", role="admin",
+                     tenant_id="acme", created_at=now, updated_at=now)
+        router = QueryRouter()
+        app.dependency_overrides[get_current_user] = lambda: admin
+        app.dependency_overrides[get_rag_engine] = lambda: FakeRAGEngine()
+        app.dependency_overrides[get_query_router] = lambda: router
+        yield TestClient(app), router, database
+        app.dependency_overrides.clear()
+
+    @pytest.mark.asyncio
+    async def test_saved_entries_are_served_without_restart(self, client):
+        """Test create, update and delete refresh the in-memory FAQ, citing the entry's linked documents."""
+        client, router, database = client
+        await database["documents"].insert_one({"doc_id": "doc-shipping", "filename": "shipping.pdf", "tenant_id": "acme"})
+
+        created = client.post("/admin/faqs", json={
+            "questions": ["What are your shipping times?", "How long does delivery take?"],
+            "answer": "Orders ship within 3 business days.",
+            "doc_ids": ["doc-shipping"]
+        })
+        assert created.status_code == 200
+        faq_id = created.json()["id"]
+        assert created.json()["tenant_id"] == "acme"
+        assert len(database["faqs"].docs[0]["embeddings"]) == 2
+
+        answer = router.route("what are your shipping times", "acme")
+        assert answer.route == "faq"
+        assert [(ref.doc_id, ref.filename) for ref in answer.retrieval_refs] == [("doc-shipping", "shipping.pdf")]
+        assert router.route("what are your shipping times", "globex") is None
+        assert router.match_faq(embed("how long does delivery take"), "acme").retrieval_refs == answer.retrieval_refs
+
+        client.patch(f"/admin/faqs/{faq_id}", json={"answer": "Orders ship next day."})
+        assert router.route("what are your shipping times", "acme").message == "Orders ship next day."
+        assert [faq["id"] for faq in client.get("/admin/faqs").json()] == [faq_id]
+
+        assert client.delete(f"/admin/faqs/{faq_id}").status_code == 200
+        assert router.route("what are your shipping times", "acme") is None
+
+    @pytest.mark.asyncio
+    async def test_other_workers_reload_on_revision_change(self, client, monkeypatch):
+        """Test a worker that did not handle the edit reloads after the refresh interval."""
+        client, router, database = client
+        other_worker = FAQIndex()
+        await other_worker.load()
+        monkeypatch.setattr(settings, "faq_refresh_interval", 0)
+
+        client.post("/admin/faqs", json={"questions": ["Do you offer refunds?"], "answer": "Within 30 days."})
+        await other_worker.maybe_refresh("acme")
+
+        assert other_worker.lookup("do you offer refunds", "acme")["answer"] == "Within 30 days."
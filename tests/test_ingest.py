@@ -0,0 +1,82 @@
+import io
+import zipfile
+import pytest
+from datetime import datetime, timezone
+from docx import Document
+from fastapi.testclient import TestClient
+from app.auth import get_current_user
+from app.config import settings
+from app.main import app
+from app.models import User
+from app.rag import RAGEngine
+from app.services import get_rag_engine
+from benchmarks.fake_openai import embed_text
+from benchmarks.memory_mongo import install_memory_mongo
+
+
+def docx_bytes(text: str) -> bytes:
+    document = Document()
+    for _ in range(30):
+        document.add_paragraph(text)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    database = install_memory_mongo()
+    monkeypatch.setattr(settings, "embedding_dim", 64)
+    monkeypatch.setattr(settings, "embed_batch_size", 4)
+    monkeypatch.setattr(settings, "qdrant_collection_name", "bulk_test")
+    rag = RAGEngine()
+    requests = []
+
+    def get_openai_embeddings(texts, priority=None):
+        requests.append(len(texts))
+        return [embed_text(text, 64).tolist() for text in texts]
+
+    monkeypatch.setattr(rag, "get_openai_embeddings", get_openai_embeddings)
+    now = datetime.now(timezone.utc)
+    admin = User(id="admin_1", email="admin@example.com", hashed_password="x", role="admin", created_at=now, updated_at=now)
+    app.dependency_overrides[get_current_user] = lambda: admin
+    app.dependency_overrides[get_rag_engine] = lambda: rag
+    yield TestClient(app), rag, database, requests
+    app.dependency_overrides.clear()
+
+
+class TestBulkUpload:
+    def test_files_and_archive_members_get_per_item_results(self, client):
+        """Test loose files and zip members are ingested, and bad items fail on their own."""
+        client, rag, database, requests = client
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("catalog/acrylic.docx", docx_bytes("Acrylic signs mount with standoff screws."))
+            zf.writestr("catalog/neon.docx", docx_bytes("Neon signs need a transformer."))
+            zf.writestr("catalog/readme.txt", "not a document")
+            zf.writestr("catalog/broken.docx", b"not really a docx")
+
+        response = client.post("/admin/documents/bulk-upload", data={"tags": "catalog"}, files=[
+            ("files", ("wood.docx", docx_bytes("Wood signs hang from chains."), "application/octet-stream")),
+            ("files", ("catalog.zip", archive.getvalue(), "application/zip")),
+        ])
+
+        assert response.status_code == 200
+        body = response.json()
+        statuses = {item["filename"]: item["status"] for item in body["items"]}
+        assert statuses == {
+            "wood.docx": "ok", "catalog/acrylic.docx": "ok", "catalog/neon.docx": "ok",
+            "catalog/readme.txt": "skipped", "catalog/broken.docx": "error"
+        }
+        assert (body["succeeded"], body["failed"]) == (3, 2)
+
+        # Metadata is saved for ingested items only, and their chunks are searchable by tag
+        assert sorted(doc["filename"] for doc in database["documents"].docs) == [
+            "catalog/acrylic.docx", "catalog/neon.docx", "wood.docx"
+        ]
+        refs = rag.search_documents("signs", tags=["catalog"], query_embedding=embed_text("signs", 64).tolist())
+        assert refs and {ref.filename for ref in refs} <= set(statuses)
+
+        # Chunks are embedded in batches rather than one request per chunk
+        assert max(requests) <= 4
+        assert sum(requests) == sum(item["chunk_count"] for item in body["items"])
@@ -0,0 +1,308 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from app.auth import get_current_user
+from app.config import settings
+from app.main import app
+from app.messages import BucketMessageRepository, DocumentMessageRepository, append_messages, ensure_summary
+from app.migrate_messages import migrate
+from app.models import ChatResponse, User
+from app.query_router import QueryRouter
+from app.services import get_chat_service, get_query_router
+from benchmarks.memory_mongo import install_memory_mongo
+
+
+@pytest.fixture
+def database(monkeypatch):
+    monkeypatch.setattr(settings, "message_bucket_size", 3)
+    return install_memory_mongo()
+
+
+@pytest.fixture(params=["documents", "buckets"])
+def repository(request, database, monkeypatch):
+    monkeypatch.setattr(settings, "message_storage", request.param)
+    return BucketMessageRepository() if request.param == "buckets" else DocumentMessageRepository()
+
+
+def message(i):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return {"role": "user", "content": str(i), "created_at": start + timedelta(seconds=i), "retrieval_refs": None}
+
+
+async def add_messages(repository, thread_id, count):
+    for i in range(count):
+        await repository.add(thread_id, [message(i)])
+
+
+class TestMessageRepository:
+    @pytest.mark.asyncio
+    async def test_reads_match_across_layouts(self, repository):
+        """Test both layouts count, page and list messages since an id the same way."""
+        await add_messages(repository, "t1", 8)
+        await add_messages(repository, "t2", 2)
+
+        assert await repository.count("t1") == 8
+        assert [m["content"] for m in await repository.page("t1", 2, 4)] == ["2", "3", "4", "5"]
+        assert [m["content"] for m in await repository.page("t1", 7, 50)] == ["7"]
+        assert await repository.page("t1", 8, 50) == []
+
+        everything = await repository.since("t1", None, 100)
+        assert [m["content"] for m in everything] == [str(i) for i in range(8)]
+        assert all(m["thread_id"] == "t1" for m in everything)
+        newer = await repository.since("t1", str(everything[4]["_id"]), 2)
+        assert [m["content"] for m in newer] == ["5", "6"]
+
+    @pytest.mark.asyncio
+    async def test_get_and_delete(self, repository):
+        """Test a single message can be fetched and deleted by id."""
+        await add_messages(repository, "t1", 5)
+        target = (await repository.page("t1", 3, 1))[0]
+
+        assert (await repository.get(str(target["_id"])))["content"] == "3"
+        assert await repository.delete(str(target["_id"]))
+        assert await repository.get(str(target["_id"])) is None
+        assert not await repository.delete(str(target["_id"]))
+        assert [m["content"] for m in await repository.page("t1", 0, 50)] == ["0", "1", "2", "4"]
+        assert await repository.count("t1") == 4
+
+    @pytest.mark.asyncio
+    async def test_delete_batch(self, repository):
+        """Test the collector's batch delete only removes the given threads."""
+        await add_messages(repository, "t1", 7)
+        await add_messages(repository, "t2", 1)
+
+        while await repository.delete_batch(["t1"], 3):
+            pass
+
+        assert await repository.count("t1") == 0
+        assert await repository.thread_ids() == ["t2"]
+
+    @pytest.mark.asyncio
+    async def test_buckets_roll_over(self, database):
+        """Test a full bucket is closed and the next message opens a new one."""
+        repository = BucketMessageRepository()
+        await add_messages(repository, "t1", 7)
+
+        buckets = sorted(database["message_buckets"].docs, key=lambda bucket: bucket["seq"])
+        assert [(bucket["seq"], bucket["count"]) for bucket in buckets] == [(0, 3), (1, 3), (2, 1)]
+        assert buckets[0]["last_id"] == buckets[0]["messages"][-1]["_id"]
+
+
+class TestMessageRoutes:
+    @pytest.mark.asyncio
+    async def test_history_endpoints_use_the_configured_layout(self, repository, database):
+        """Test the chat endpoints read, count and delete through the repository."""
+        now = datetime.now(timezone.utc)
+        thread = await database["threads"].insert_one({"title": "t", "owner_user_id": "user_1", "created_at": now, "updated_at": now})
+        thread_id = str(thread.inserted_id)
+        await add_messages(repository, thread_id, 5)
+        user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+        app.dependency_overrides[get_current_user] = lambda: user
+        try:
+            client = TestClient(app)
+            page = client.get(f"/chat/{thread_id}/messages", params={"skip": 1, "limit": 3}).json()
+            assert [m["content"] for m in page] == ["1", "2", "3"]
+            assert client.get(f"/chat/{thread_id}/messages/count").json() == {"count": 5}
+
+            assert client.delete(f"/chat/messages/{page[0]['id']}").status_code == 200
+            since = client.get(f"/chat/{thread_id}/messages/since", params={"message_id": page[1]["id"]}).json()
+            assert [m["content"] for m in since] == ["3", "4"]
+            assert client.get(f"/chat/{thread_id}/messages/count").json() == {"count": 4}
+        finally:
+            app.dependency_overrides.clear()
+
+
+class TestMigration:
+    @pytest.mark.asyncio
+    async def test_round_trip_keeps_ids_and_order(self, database):
+        """Test migrating to buckets and back preserves every message id and the order."""
+        documents = DocumentMessageRepository()
+        await add_messages(documents, "t1", 7)
+        await add_messages(documents, "t2", 2)
+        before = [(m["_id"], m["content"]) for m in await documents.page("t1", 0, 0)]
+
+        assert await migrate("buckets") == {"threads": 2, "messages": 9}
+        assert database["messages"].docs == []
+        buckets = BucketMessageRepository()
+        assert [(m["_id"], m["content"]) for m in await buckets.page("t1", 0, 0)] == before
+        assert await buckets.count("t2") == 2
+
+        assert await migrate("documents") == {"threads": 2, "messages": 9}
+        assert database["message_buckets"].docs == []
+        assert [(m["_id"], m["content"]) for m in await documents.page("t1", 0, 0)] == before
+
+    @pytest.mark.asyncio
+    async def test_rerun_after_interruption_copies_only_missing(self, database):
+        """Test a repeated run after a partial copy neither duplicates nor drops messages."""
+        documents, buckets = DocumentMessageRepository(), BucketMessageRepository()
+        await add_messages(documents, "t1", 5)
+        # A previous run copied the first two messages and stopped
+        await buckets.add("t1", [{k: v for k, v in m.items() if k != "thread_id"} for m in await documents.page("t1", 0, 2)])
+
+        assert (await migrate("buckets"))["messages"] == 3
+        assert [m["content"] for m in await buckets.page("t1", 0, 0)] == ["0", "1", "2", "3", "4"]
+        assert ObjectId.is_valid(str((await buckets.page("t1", 0, 1))[0]["_id"]))
+
+    @pytest.mark.asyncio
+    async def test_message_written_during_copy_is_not_lost(self, database, monkeypatch):
+        """Test a message added to the source after it was read is moved by a later round, not deleted."""
+        documents, buckets = DocumentMessageRepository(), BucketMessageRepository()
+        await add_messages(documents, "t1", 3)
+        add = BucketMessageRepository.add
+
+        async def add_while_writer_appends(self, thread_id, messages):
+            await add(self, thread_id, messages)
+            if len(database["messages"].docs) == 3:
+                await documents.add("t1", [{**message(3), "content": "late"}])
+
+        monkeypatch.setattr(BucketMessageRepository, "add", add_while_writer_appends)
+        assert await migrate("buckets") == {"threads": 1, "messages": 4}
+        assert database["messages"].docs == []
+        assert [m["content"] for m in await buckets.page("t1", 0, 0)] == ["0", "1", "2", "late"]
+
+    @pytest.mark.asyncio
+    async def test_bucket_source_keeps_unread_messages(self, database):
+        """Test deleting read ids from buckets leaves other messages and drops emptied buckets."""
+        buckets = BucketMessageRepository()
+        await add_messages(buckets, "t1", 4)
+        ids = [m["_id"] for m in await buckets.page("t1", 0, 3)]
+
+        assert await buckets.delete_ids("t1", ids) == 3
+        assert [m["content"] for m in await buckets.page("t1", 0, 0)] == ["3"]
+        assert await buckets.count("t1") == 1
+
+
+class TestThreadSummaries:
+    @pytest.mark.asyncio
+    async def test_summary_follows_appends_and_deletes(self, repository, database):
+        """Test the thread list and count endpoint report the thread's own summary."""
+        now = datetime.now(timezone.utc)
+        user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+        app.dependency_overrides[get_current_user] = lambda: user
+        try:
+            client = TestClient(app)
+            thread_id = client.post("/threads", json={"title": "t"}).json()["id"]
+            for i in range(3):
+                await append_messages(thread_id, [message(i)])
+
+            listed = client.get("/threads").json()[0]
+            assert (listed["message_count"], listed["last_message_preview"]) == (3, "2")
+            assert listed["last_activity_at"].startswith("2024-01-01T00:00:02")
+            assert client.get(f"/chat/{thread_id}/messages/count").json() == {"count": 3}
+
+            newest = (await repository.page(thread_id, 2, 1))[0]
+            assert client.delete(f"/chat/messages/{newest['_id']}").status_code == 200
+            listed = client.get("/threads").json()[0]
+            assert (listed["message_count"], listed["last_message_preview"]) == (2, "1")
+        finally:
+            app.dependency_overrides.clear()
+
+    @pytest.mark.asyncio
+    async def test_legacy_threads_are_backfilled(self, repository, database):
+        """Test a thread stored before summaries existed gets one on first read."""
+        now = datetime.now(timezone.utc)
+        thread = await database["threads"].insert_one({"title": "t", "owner_user_id": "user_1", "created_at": now, "updated_at": now})
+        await add_messages(repository, str(thread.inserted_id), 4)
+
+        summarized = await ensure_summary(await database["threads"].find_one({"_id": thread.inserted_id}))
+
+        assert (summarized["message_count"], summarized["last_message_preview"]) == (4, "3")
+        assert database["threads"].docs[0]["message_count"] == 4
+
+    @pytest.mark.asyncio
+    async def test_delete_on_a_legacy_thread_counts_from_its_messages(self, repository, database):
+        """Test deleting a message from a thread without a summary leaves the true count, not -1."""
+        now = datetime.now(timezone.utc)
+        user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+        thread = await database["threads"].insert_one({"title": "t", "owner_user_id": "user_1", "created_at": now,
+                                                       "updated_at": now, "deleted_at": None})
+        thread_id = str(thread.inserted_id)
+        await add_messages(repository, thread_id, 4)
+        oldest = (await repository.page(thread_id, 0, 1))[0]
+        app.dependency_overrides[get_current_user] = lambda: user
+        try:
+            client = TestClient(app)
+            assert client.delete(f"/chat/messages/{oldest['_id']}").status_code == 200
+            listed = client.get("/threads").json()[0]
+        finally:
+            app.dependency_overrides.clear()
+
+        assert (listed["message_count"], listed["last_message_preview"]) == (3, "3")
+        assert database["threads"].docs[0]["message_count"] == 3
+
+
+class StubRAGEngine:
+    def __init__(self):
+        self.embedded = []
+
+    def get_openai_embedding(self, text):
+        self.embedded.append(text)
+        return [0.1, 0.2]
+
+
+class StubChatService:
+    def __init__(self, fail=False):
+        self.rag_engine = StubRAGEngine()
+        self.fail = fail
+        self.embeddings = []
+
+    async def process_chat_message(self, message, query_embedding=None, **kwargs):
+        if self.fail:
+            raise RuntimeError("LLM unavailable")
+        self.embeddings.append(query_embedding)
+        return ChatResponse(message=f"answer to {message}", retrieval_refs=[])
+
+
+class TestSendMessage:
+    def send(self, database, chat_service):
+        now = datetime.now(timezone.utc)
+        user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_chat_service] = lambda: chat_service
+        app.dependency_overrides[get_query_router] = lambda: QueryRouter()
+        try:
+            client = TestClient(app)
+            thread_id = client.post("/threads", json={"title": "t"}).json()["id"]
+            return client, thread_id
+        except BaseException:
+            app.dependency_overrides.clear()
+            raise
+
+    def test_turn_is_stored_with_one_summary_update(self, repository, database):
+        """Test a turn stores both messages, reuses the early embedding and counts both on the thread."""
+        chat_service = StubChatService()
+        client, thread_id = self.send(database, chat_service)
+        try:
+            response = client.post(f"/chat/{thread_id}/message", json={"message": "How do I mount a sign?"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.json()["message"] == "answer to How do I mount a sign?"
+        assert chat_service.rag_engine.embedded == ["How do I mount a sign?"]
+        assert chat_service.embeddings == [[0.1, 0.2]]
+        thread = database["threads"].docs[0]
+        assert (thread["message_count"], thread["last_message_preview"]) == (2, "answer to How do I mount a sign?")
+
+    def test_failed_answer_still_counts_the_question(self, repository, database):
+        """Test the stored question is reflected in the thread summary when generation fails."""
+        client, thread_id = self.send(database, StubChatService(fail=True))
+        try:
+            with pytest.raises(RuntimeError):
+                client.post(f"/chat/{thread_id}/message", json={"message": "How do I mount a sign?"})
+        finally:
+            app.dependency_overrides.clear()
+
+        thread = database["threads"].docs[0]
+        assert (thread["message_count"], thread["last_message_preview"]) == (1, "How do I mount a sign?")
+
+    def test_unknown_thread_writes_nothing(self, database):
+        """Test validation failures leave no message behind."""
+        client, _ = self.send(database, StubChatService())
+        try:
+            response = client.post(f"/chat/{ObjectId()}/message", json={"message": "How do I mount a sign?"})
+        finally:
+            app.dependency_overrides.clear()
+
+        assert response.status_code == 404
+        assert database["messages"].docs == []
@@ -0,0 +1,76 @@
+import json
+import pytest
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from app.auth import get_current_user
+from app.main import app
+from app.models import User
+from app.query_router import QueryRouter, normalize
+from app.services import get_chat_service, get_query_router
+from benchmarks.memory_mongo import install_memory_mongo
+
+FAQ = [{"questions": ["What are your shipping times?", "How long does shipping take"],
+        "answer": "Orders ship within 3 business days."}]
+
+
+class TestQueryRouter:
+    def test_normalize(self):
+        """Test punctuation, case and spacing differences normalize away."""
+        assert normalize("  Thank   YOU!! ") == "thank you"
+        assert normalize("What's up?") == "whats up"
+
+    def test_chitchat_is_answered_from_templates(self):
+        """Test greetings and thanks are answered without RAG."""
+        router = QueryRouter()
+
+        for message in ("Hi!", "hello there", "Thanks a lot", "ok thanks", "Goodbye"):
+            assert router.route(message).route == "chitchat", message
+
+    def test_knowledge_questions_go_to_rag(self):
+        """Test a greeting followed by a real question is not short-circuited."""
+        router = QueryRouter(FAQ)
+
+        assert router.route("hi, how do I mount an acrylic sign?") is None
+        assert router.route("What are your shipping costs?") is None
+
+    def test_faq_variants_share_an_answer(self, tmp_path, monkeypatch):
+        """Test FAQ entries load from the configured file and match any variant."""
+        from app.config import settings
+
+        faq_file = tmp_path / "faq.json"
+        faq_file.write_text(json.dumps(FAQ))
+        monkeypatch.setattr(settings, "faq_file", str(faq_file))
+        router = QueryRouter.from_settings()
+
+        response = router.route("how long does shipping take?")
+        assert response.route == "faq"
+        assert response.message == "Orders ship within 3 business days."
+
+        monkeypatch.setattr(settings, "fast_path_enabled", False)
+        assert router.route("how long does shipping take?") is None
+
+
+class TestFastPathRoute:
+    def test_chitchat_skips_the_chat_service(self):
+        """Test a greeting is stored and answered without calling the RAG pipeline."""
+        class FailingChatService:
+            async def process_chat_message(self, *args, **kwargs):
+                raise AssertionError("RAG should not run for small talk")
+
+        database = install_memory_mongo()
+        now = datetime.now(timezone.utc)
+        user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_chat_service] = lambda: FailingChatService()
+        app.dependency_overrides[get_query_router] = lambda: QueryRouter()
+        try:
+            client = TestClient(app)
+            thread_id = client.post("/threads", json={"title": "Hello"}).json()["id"]
+
+            response = client.post(f"/chat/{thread_id}/message", json={"message": "Hello!"})
+
+            assert response.status_code == 200
+            assert response.json()["route"] == "chitchat"
+            assert len(database["messages"].docs) == 2
+        finally:
+            app.dependency_overrides.clear()
@@ -1,29 +1,31 @@
 import pytest
-from app.rag import RAGEngine
+from qdrant_client.http import models
+from app.config import settings
+from app.rag import RAGEngine, embedding_options, quantization_config, scope_filter, search_params
 from app.models import RetrievalRef
 
 
 class TestRAG:
-    def test_chunk_text(self):
+    def test_split_text(self):
         """Test text chunking functionality."""
         rag = RAGEngine()
         text = "This is a test text that should be chunked into smaller pieces for processing."
         
-        chunks = rag.chunk_text(text, chunk_size=20, overlap=5)
+        chunks = rag.split_text(text, chunk_size=20, chunk_overlap=5)
         
         # Should create multiple chunks
         assert len(chunks) > 1
         
         # Each chunk should be within size limit
         for chunk in chunks:
-            assert len(chunk.split()) <= 20
+            assert len(chunk) <= 20
     
-    def test_chunk_text_with_overlap(self):
+    def test_split_text_with_overlap(self):
         """Test text chunking with overlap."""
         rag = RAGEngine()
         text = "Word1 Word2 Word3 Word4 Word5 Word6 Word7 Word8 Word9 Word10"
         
-        chunks = rag.chunk_text(text, chunk_size=5, overlap=2)
+        chunks = rag.split_text(text, chunk_size=25, chunk_overlap=10)
         
         # Should have overlap between chunks
         assert len(chunks) > 1
@@ -41,6 +43,17 @@ class TestRAG:
         # At least one word should appear multiple times
         assert max(word_counts.values()) > 1
     
+    def test_preprocess_document(self):
+        """Test document chunk ids and source tracking."""
+        rag = RAGEngine()
+        document = {"id": "catalog.pdf", "text": "First sentence. " * 200, "page_count": 1}
+        
+        chunks = rag.preprocess_document(document)
+        
+        assert len(chunks) > 1
+        assert chunks[0]["id"] == "catalog.pdf_chunk1"
+        assert all(chunk["source_file"] == "catalog.pdf" for chunk in chunks)
+    
     def test_retrieval_ref_creation(self):
         """Test RetrievalRef model creation."""
         ref = RetrievalRef(
@@ -67,3 +80,88 @@ class TestRAG:
         except Exception as e:
             # If initialization fails due to missing config, that's expected in test environment
             assert "OPENAI_API_KEY" in str(e) or "mongodb" in str(e).lower()
+
+
+class TestVectorStorage:
+    def test_collection_uses_configured_size(self, monkeypatch):
+        """Test the collection is created with embedding_dim and rejects a mismatch later."""
+        monkeypatch.setattr(settings, "embedding_dim", 256)
+        rag = RAGEngine()
+        rag.ensure_collection()
+
+        info = rag.qdrant_client.get_collection(settings.qdrant_collection_name)
+        assert info.config.params.vectors.size == 256
+
+        monkeypatch.setattr(settings, "embedding_dim", 512)
+        with pytest.raises(ValueError):
+            rag.check_collection_config(settings.qdrant_collection_name)
+
+    def test_quantization_modes(self, monkeypatch):
+        """Test quantization and rescoring settings follow the configured mode."""
+        monkeypatch.setattr(settings, "qdrant_quantization", "none")
+        assert quantization_config() is None
+        assert search_params() is None
+
+        monkeypatch.setattr(settings, "qdrant_quantization", "scalar")
+        assert isinstance(quantization_config(), models.ScalarQuantization)
+        assert search_params().quantization.rescore is True
+
+        monkeypatch.setattr(settings, "qdrant_quantization", "binary")
+        assert isinstance(quantization_config(), models.BinaryQuantization)
+
+        monkeypatch.setattr(settings, "qdrant_quantization", "product")
+        with pytest.raises(ValueError):
+            quantization_config()
+
+    def test_embedding_dimensions_request(self, monkeypatch):
+        """Test shortened vectors are only requested from models that support them."""
+        assert embedding_options() == {"extra_body": {"dimensions": settings.embedding_dim}}
+
+        monkeypatch.setattr(settings, "embedding_model", "text-embedding-ada-002")
+        assert embedding_options() == {}
+
+
+class TestScopedRetrieval:
+    @pytest.fixture
+    def rag(self, monkeypatch):
+        from benchmarks.fake_openai import embed_text
+
+        monkeypatch.setattr(settings, "embedding_dim", 64)
+        monkeypatch.setattr(settings, "qdrant_collection_name", "scoped_test")
+        rag = RAGEngine()
+        monkeypatch.setattr(rag, "get_openai_embedding", lambda text: embed_text(text, 64).tolist())
+        monkeypatch.setattr(rag, "get_openai_embeddings", lambda texts, priority=None: [embed_text(text, 64).tolist() for text in texts])
+        rag.ensure_collection()
+        for doc_id, filename, tags, text in (
+            ("doc-a", "acrylic.pdf", ["acrylic"], "Acrylic signs mount with standoff screws. " * 20),
+            ("doc-b", "neon.pdf", ["neon"], "Neon signs mount with standoff screws and a transformer. " * 20),
+        ):
+            document = {"id": filename, "doc_id": doc_id, "tags": tags, "text": text, "page_count": 1}
+            rag.add_documents_to_qdrant(rag.embed_chunks(rag.preprocess_document(document)))
+        return rag
+
+    def test_scope_filter(self):
+        """Test documents and tags combine as alternatives and no scope means no filter."""
+        assert scope_filter() is None
+
+        query_filter = scope_filter(doc_ids=["doc-a"], tags=["neon"])
+        assert [condition.key for condition in query_filter.should] == ["doc_id", "tags"]
+
+    def test_search_is_restricted_to_scope(self, rag):
+        """Test scoped searches only return chunks from the selected documents or tags."""
+        everything = rag.search_documents("how do signs mount")
+        by_doc = rag.search_documents("how do signs mount", doc_ids=["doc-b"])
+        by_tag = rag.search_documents("how do signs mount", tags=["acrylic"])
+
+        assert {ref.doc_id for ref in everything} == {"doc-a", "doc-b"}
+        assert {ref.doc_id for ref in by_doc} == {"doc-b"}
+        assert {ref.filename for ref in by_tag} == {"acrylic.pdf"}
+
+    def test_delete_by_stable_id(self, rag):
+        """Test deletes and chunk lookups use the doc_id stored on each chunk."""
+        assert rag.get_document_chunks("doc-a")
+
+        assert rag.delete_document("doc-a")
+
+        assert rag.get_document_chunks("doc-a") == []
+        assert rag.get_document_chunks("doc-b")
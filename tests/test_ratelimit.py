@@ -0,0 +1,97 @@
+import asyncio
+import time
+import pytest
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from app.auth import get_current_user
+from app.config import settings
+from app.main import app
+from app.models import ChatResponse, User
+from app.query_router import QueryRouter
+from app.ratelimit import MemoryBackend, RateLimits, RedisBackend, chat_rate_limit, parse_limit, upload_rate_limit
+from app.services import get_chat_service, get_query_router
+from benchmarks.memory_mongo import install_memory_mongo
+from benchmarks.memory_redis import MemoryRedis
+
+
+class EchoChatService:
+    rag_engine = None
+
+    async def process_chat_message(self, message, **kwargs):
+        return ChatResponse(message=f"answer to {message}", retrieval_refs=[])
+
+
+class TestRateLimits:
+    def test_limits_are_parsed(self):
+        """Test "<count>/<period>" limits and rejection of malformed ones."""
+        assert parse_limit("20/minute") == (20, 20 / 60)
+        assert parse_limit("5/second") == (5, 5.0)
+        with pytest.raises(ValueError):
+            parse_limit("20 per minute")
+
+    def test_chat_route_returns_headers_and_429(self, monkeypatch):
+        """Test a user's burst is allowed with rate-limit headers and the next turn gets 429."""
+        database = install_memory_mongo()
+        monkeypatch.setattr(settings, "rate_limit_chat", "2/minute")
+        now = datetime.now(timezone.utc)
+        user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+        app.dependency_overrides[get_current_user] = lambda: user
+        app.dependency_overrides[get_chat_service] = lambda: EchoChatService()
+        app.dependency_overrides[get_query_router] = lambda: QueryRouter()
+        try:
+            client = TestClient(app)
+            thread_id = client.post("/threads", json={"title": "t"}).json()["id"]
+            responses = [client.post(f"/chat/{thread_id}/message", json={"message": f"Question number {i}?"})
+                         for i in range(3)]
+        finally:
+            app.dependency_overrides.clear()
+
+        assert [response.status_code for response in responses] == [200, 200, 429]
+        assert [response.headers["RateLimit-Remaining"] for response in responses] == ["1", "0", "0"]
+        assert responses[0].headers["RateLimit-Limit"] == responses[0].headers["X-RateLimit-Limit"] == "2"
+        assert responses[1].headers["RateLimit-Reset"] == "60"
+        assert responses[2].headers["Retry-After"] == "30"
+        assert len(database["messages"].docs) == 4
+
+    @pytest.mark.asyncio
+    async def test_buckets_are_per_user_and_route_and_refill(self, monkeypatch):
+        """Test one user's empty chat bucket leaves other users and routes alone, and refills over time."""
+        monkeypatch.setattr(settings, "rate_limit_chat", "20/second")
+
+        assert all([(await chat_rate_limit.check("alice")).allowed for _ in range(20)])
+        assert not (await chat_rate_limit.check("alice")).allowed
+        assert (await chat_rate_limit.check("bob")).allowed
+        assert (await upload_rate_limit.check("alice")).allowed
+
+        await asyncio.sleep(0.1)
+        assert (await chat_rate_limit.check("alice")).allowed
+
+    def test_memory_check_costs_microseconds(self):
+        """Test the in-process check stays in the microsecond range."""
+        backend, limit = MemoryBackend(), parse_limit("1000000/second")
+        started = time.perf_counter()
+        for i in range(20000):
+            backend.take(f"ratelimit:chat:user_{i % 500}", limit)
+        per_check = (time.perf_counter() - started) / 20000
+
+        assert per_check < 50e-6
+        assert len(backend.buckets) <= 500
+
+    @pytest.mark.asyncio
+    async def test_shared_backend_is_consistent_across_workers(self, monkeypatch):
+        """Test workers sharing a Redis-protocol server draw from one bucket, and an outage fails open."""
+        monkeypatch.setattr(settings, "rate_limit_chat", "3/minute")
+        server = MemoryRedis()
+        workers = [RedisBackend(server), RedisBackend(server)]
+
+        decisions = []
+        for i in range(4):
+            RateLimits.backend = workers[i % 2]
+            decisions.append(await chat_rate_limit.check("alice"))
+
+        assert [decision.allowed for decision in decisions] == [True, True, True, False]
+        assert [decision.remaining for decision in decisions] == [2, 1, 0, 0]
+        assert decisions[3].retry_after == pytest.approx(20, abs=0.1)
+
+        server.down = True
+        assert (await chat_rate_limit.check("alice")).allowed
@@ -0,0 +1,221 @@
+import asyncio
+import threading
+import time
+import httpx
+import pytest
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from fastapi.testclient import TestClient
+from openai import APIConnectionError, AuthenticationError
+from qdrant_client.http.exceptions import ResponseHandlingException, UnexpectedResponse
+from app.auth import get_current_user
+from app.chat import ERROR_REPLY, AnswerPlan, ChatService, GenerationPool, shutdown_generation_pool
+from app.config import settings
+from app.main import app
+from app.models import ChatResponse, RetrievalRef, User
+from app.query_router import QueryRouter
+from app.rag import RAGEngine
+from app.resilience import CircuitBreaker, CircuitOpenError, breakers, chat_admission, openai_breaker, qdrant_breaker
+from app.services import get_chat_service, get_query_router
+from benchmarks.memory_mongo import install_memory_mongo
+
+
+@pytest.fixture(autouse=True)
+def closed_breakers(monkeypatch):
+    monkeypatch.setattr(settings, "breaker_failure_threshold", 2)
+    monkeypatch.setattr(settings, "openai_max_retries", 3)
+    monkeypatch.setattr(settings, "openai_backoff_base", 0.001)
+    monkeypatch.setattr(settings, "openai_backoff_max", 0.001)
+    yield
+    for breaker in breakers.values():
+        breaker.record_success()
+
+
+def raise_(error):
+    def fail(*args, **kwargs):
+        raise error
+    return fail
+
+
+class DownOpenAI:
+    """OpenAI client whose every request fails to connect."""
+
+    def __init__(self):
+        self.calls = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise APIConnectionError(request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"))
+
+
+class TestCircuitBreaker:
+    def test_opens_fails_fast_and_recovers_through_a_trial(self, monkeypatch):
+        """Test consecutive failures open the breaker and one trial call closes it after the reset."""
+        monkeypatch.setattr(settings, "breaker_reset_timeout", 0.05)
+        breaker = CircuitBreaker("search")
+
+        def fail():
+            raise TimeoutError()
+
+        for _ in range(2):
+            with pytest.raises(TimeoutError):
+                breaker.call(fail)
+        with pytest.raises(CircuitOpenError) as rejected:
+            breaker.call(lambda: "never called")
+        assert 0 < rejected.value.retry_after <= 0.05
+        assert breaker.stats()["state"] == "open"
+
+        time.sleep(0.06)
+        breaker.check()
+        # Only one trial goes through while half-open
+        with pytest.raises(CircuitOpenError):
+            breaker.check()
+        breaker.record_failure()
+        assert breaker.stats()["state"] == "open"
+
+        time.sleep(0.06)
+        assert breaker.call(lambda: "ok") == "ok"
+        assert breaker.stats() == {"state": "closed", "consecutive_failures": 0, "opens": 2, "rejected": 2, "retry_after": 0}
+
+    def test_qdrant_breaker_counts_only_outages(self):
+        """Test 4xx and missing-collection errors leave the Qdrant breaker closed while 5xx and connection errors open it."""
+        not_found = UnexpectedResponse(404, "Not Found", b"Collection `documents` doesn't exist!", httpx.Headers())
+        for error in (not_found, ValueError("Collection documents not found"), not_found):
+            with pytest.raises(type(error)):
+                qdrant_breaker.call(raise_(error))
+        assert qdrant_breaker.stats()["state"] == "closed"
+
+        unreachable = ResponseHandlingException(httpx.ConnectError("Connection refused"))
+        for error in (UnexpectedResponse(503, "Service Unavailable", b"", httpx.Headers()), unreachable):
+            with pytest.raises(type(error)):
+                qdrant_breaker.call(raise_(error))
+        assert qdrant_breaker.stats()["state"] == "open"
+
+
+class TestDegradedChat:
+    def test_llm_outage_answers_with_the_retrieved_excerpts(self):
+        """Test failing completions open the OpenAI breaker and the reply lists the plan's excerpts."""
+        ref = RetrievalRef(doc_id="doc-1", filename="guide.pdf", page=1, chunk_id="c1", score=0.9)
+
+        class PlannedChatService(ChatService):
+            def plan_answer(self, message, doc_ids=None, tags=None, tenant_id=None, query_embedding=None):
+                return AnswerPlan(prompt=message, system="system", retrieval_refs=[ref],
+                                  excerpts=[{"filename": "guide.pdf", "text": "Mount acrylic signs with standoff screws."}])
+
+        openai_client = DownOpenAI()
+        chat_service = PlannedChatService(SimpleNamespace(), openai_client)
+
+        response = chat_service.answer_message("How do I mount it?")
+
+        assert response.route == "retrieval_only"
+        assert response.message.splitlines()[-1] == "- guide.pdf: Mount acrylic signs with standoff screws."
+        assert response.retrieval_refs == [ref]
+        # Retries stop once the breaker opens, and later questions skip OpenAI entirely
+        assert openai_client.calls == 2
+        assert openai_breaker.stats()["state"] == "open"
+        chat_service.answer_message("And outdoors?")
+        assert openai_client.calls == 2
+
+    def test_rejected_request_is_an_error_not_an_outage(self):
+        """Test an OpenAI 401 gets the error reply, and keeps the breaker closed."""
+        request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+        rejected = AuthenticationError("Incorrect API key", response=httpx.Response(401, request=request), body=None)
+        openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=raise_(rejected))))
+        chat_service = ChatService(SimpleNamespace(), openai_client)
+        chat_service.plan_answer = lambda *args, **kwargs: AnswerPlan(prompt="How do I mount it?", system="system")
+
+        response = chat_service.answer_message("How do I mount it?")
+
+        assert response.message == ERROR_REPLY
+        assert response.route != "retrieval_only"
+        assert openai_breaker.stats()["state"] == "closed"
+
+    def test_embedding_outage_falls_back_to_keyword_search(self, monkeypatch):
+        """Test a question that cannot be embedded is answered from a keyword search of the chunks."""
+        from benchmarks.fake_openai import embed_text
+
+        monkeypatch.setattr(settings, "embedding_dim", 64)
+        monkeypatch.setattr(settings, "qdrant_collection_name", "degraded_test")
+        rag = RAGEngine()
+        rag.ensure_collection()
+        for filename, text in (("acrylic.pdf", "Acrylic signs mount with standoff screws."),
+                               ("neon.pdf", "Neon signs hang from a chain and need a transformer.")):
+            chunks = rag.preprocess_document({"id": filename, "doc_id": filename, "text": text})
+            for chunk in chunks:
+                chunk["embedding"] = embed_text(chunk["text"], 64).tolist()
+            rag.add_documents_to_qdrant(chunks)
+
+        def unavailable(text):
+            raise CircuitOpenError("openai", 30)
+
+        monkeypatch.setattr(rag, "get_openai_embedding", unavailable)
+        response = ChatService(rag, DownOpenAI()).answer_message("How do neon signs hang?")
+
+        assert response.route == "retrieval_only"
+        assert response.message.splitlines()[2] == "- neon.pdf: Neon signs hang from a chain and need a transformer."
+        assert [ref.filename for ref in response.retrieval_refs] == ["neon.pdf", "acrylic.pdf"]
+
+
+class TestChatAdmission:
+    @pytest.fixture
+    def client(self):
+        database = install_memory_mongo()
+        now = datetime.now(timezone.utc)
+        user = User(id="user_1", email="owner@example.com", hashed_password="x", created_at=now, updated_at=now)
+        app.dependency_overrides[get_current_user] = lambda: user
+        # Retrieval goes through the Qdrant breaker like the real engine's searches
+        rag_engine = SimpleNamespace(get_openai_embedding=lambda text: [0.1, 0.2],
+                                     search_documents=lambda *args, **kwargs: qdrant_breaker.call(lambda: []))
+        app.dependency_overrides[get_chat_service] = lambda: ChatService(rag_engine, DownOpenAI())
+        app.dependency_overrides[get_query_router] = lambda: QueryRouter()
+        client = TestClient(app)
+        yield client, client.post("/threads", json={"title": "t"}).json()["id"], database
+        app.dependency_overrides.clear()
+
+    def test_turns_past_the_queue_depth_are_shed(self, client, monkeypatch):
+        """Test a turn arriving with the queue full gets 503 and Retry-After without being stored."""
+        client, thread_id, database = client
+        monkeypatch.setattr(settings, "chat_max_queue_depth", 1)
+
+        with chat_admission.admit():
+            response = client.post(f"/chat/{thread_id}/message", json={"message": "How do I mount a sign?"})
+
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == str(settings.shed_retry_after)
+        assert chat_admission.stats()["depth"] == 0
+        assert database["messages"].docs == []
+
+    def test_open_vector_store_breaker_is_a_503(self, client):
+        """Test a turn needing Qdrant while its breaker is open fails fast with 503 and Retry-After."""
+        client, thread_id, _ = client
+        for _ in range(settings.breaker_failure_threshold):
+            qdrant_breaker.record_failure()
+
+        response = client.post(f"/chat/{thread_id}/message", json={"message": "How do I mount a sign?"})
+
+        assert response.status_code == 503
+        assert response.json() == {"detail": "qdrant is unavailable"}
+        assert 1 <= int(response.headers["Retry-After"]) <= settings.breaker_reset_timeout
+
+    @pytest.mark.asyncio
+    async def test_admitted_turns_generate_in_parallel_off_the_default_executor(self, monkeypatch):
+        """Test every admitted turn gets a generation thread and the default executor stays free."""
+        monkeypatch.setattr(settings, "chat_max_queue_depth", 40)
+        monkeypatch.setattr(settings, "coalesce_requests", False)
+        monkeypatch.setattr(GenerationPool, "executor", None)
+        # More turns than the default executor has threads, all blocked on each other
+        barrier = threading.Barrier(40, timeout=5)
+
+        class BlockingChatService(ChatService):
+            def answer_message(self, message, *args):
+                barrier.wait()
+                return ChatResponse(message=message, retrieval_refs=[])
+
+        chat_service = BlockingChatService(SimpleNamespace(), DownOpenAI())
+        turns = asyncio.gather(*(chat_service.process_chat_message(f"q{i}") for i in range(39)))
+        assert await asyncio.to_thread(lambda: "free") == "free"
+        barrier.wait()
+
+        assert len(await turns) == 39
+        shutdown_generation_pool()
@@ -0,0 +1,72 @@
+import gzip
+import json
+import pytest
+from datetime import datetime
+from bson import ObjectId
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from app.models import MessageResponse
+from app.responses import CompressionMiddleware, FastJSONResponse, serialize_message, brotli
+
+
+def make_app():
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/small")
+    async def small():
+        return FastJSONResponse({"ok": True})
+
+    @app.get("/large")
+    async def large():
+        return FastJSONResponse([{"content": "signage " * 20} for _ in range(50)])
+
+    return app
+
+
+class TestFastSerialization:
+    def test_matches_model_serialization(self):
+        """Test the fast path emits the same JSON as the validated model path."""
+        row = {
+            "_id": ObjectId(),
+            "thread_id": "thread_1",
+            "role": "assistant",
+            "content": "Use standoff screws.",
+            "created_at": datetime(2024, 5, 1, 9, 30, 0, 250000),
+            "retrieval_refs": [{"doc_id": "a.pdf", "filename": "a.pdf", "page": 1, "chunk_id": "c1", "score": 0.9}]
+        }
+
+        fast = json.loads(FastJSONResponse([serialize_message(row)]).body)
+        validated = jsonable_encoder([MessageResponse(**serialize_message(row))])
+
+        assert fast == validated
+
+
+class TestCompression:
+    def test_gzip_large_responses(self):
+        """Test large bodies are gzipped for gzip-only clients."""
+        client = TestClient(make_app())
+
+        response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+        assert response.headers["content-encoding"] == "gzip"
+        assert "Accept-Encoding" in response.headers["vary"]
+        assert len(response.json()) == 50
+
+    def test_small_responses_are_not_compressed(self):
+        """Test bodies below the threshold are sent as-is."""
+        client = TestClient(make_app())
+
+        response = client.get("/small", headers={"Accept-Encoding": "gzip, br"})
+
+        assert "content-encoding" not in response.headers
+
+    @pytest.mark.skipif(brotli is None, reason="brotli not installed")
+    def test_brotli_preferred_when_accepted(self):
+        """Test brotli is chosen when the client accepts it."""
+        client = TestClient(make_app())
+
+        response = client.get("/large", headers={"Accept-Encoding": "gzip, br"})
+
+        assert response.headers["content-encoding"] == "br"
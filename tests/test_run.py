@@ -0,0 +1,34 @@
+import pytest
+import run
+from app.config import settings
+
+
+class TestRunScript:
+    def test_available_cpus(self):
+        """Test CPU detection returns a usable worker count."""
+        assert run.available_cpus() >= 1
+
+    def test_production_options(self, monkeypatch):
+        """Test production mode never reloads and honours the worker override."""
+        monkeypatch.setattr(settings, "web_workers", 3)
+
+        options = run.production_options()
+
+        assert options["reload"] is False
+        assert options["workers"] == 3
+        assert options["loop"] in ("uvloop", "asyncio")
+        assert options["http"] in ("httptools", "h11")
+        assert options["timeout_graceful_shutdown"] == settings.graceful_shutdown_timeout
+
+    def test_production_options_default_workers(self, monkeypatch):
+        """Test the worker count follows the available CPUs by default."""
+        monkeypatch.setattr(settings, "web_workers", 0)
+
+        assert run.production_options()["workers"] == run.available_cpus()
+
+    def test_development_options(self, monkeypatch):
+        """Test development mode keeps reload tied to DEBUG."""
+        monkeypatch.setattr(settings, "debug", True)
+
+        assert run.development_options()["reload"] is True
+        assert "workers" not in run.development_options()
@@ -0,0 +1,112 @@
+import threading
+import time
+import httpx
+import pytest
+from openai import BadRequestError, InternalServerError, RateLimitError
+from app.config import settings
+from app.scheduler import BACKGROUND, INTERACTIVE, OpenAIScheduler, parse_duration
+
+
+def api_error(cls, status, headers=None, body=None):
+    request = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+    response = httpx.Response(status, headers=headers or {}, request=request)
+    return cls(f"status {status}", response=response, body=body)
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(settings, "openai_backoff_base", 0.001)
+    monkeypatch.setattr(settings, "openai_backoff_max", 0.01)
+    monkeypatch.setattr(settings, "openai_max_retries", 3)
+
+
+class TestOpenAIScheduler:
+    def test_reset_headers_are_parsed(self):
+        """Test the duration formats OpenAI uses in reset and retry-after headers."""
+        assert parse_duration("1s") == 1.0
+        assert parse_duration("6m0s") == 360.0
+        assert parse_duration("120ms") == pytest.approx(0.12)
+        assert parse_duration("2") == 2.0
+        assert parse_duration(None) is None
+
+    def test_transient_failures_are_retried(self):
+        """Test 429s and 5xx are retried, pausing on retry-after, while client errors are not."""
+        scheduler, attempts = OpenAIScheduler(), []
+        failures = [api_error(RateLimitError, 429, {"retry-after": "0.05"}), api_error(InternalServerError, 503)]
+
+        def call():
+            attempts.append(time.monotonic())
+            if failures:
+                raise failures.pop(0)
+            return "ok"
+
+        assert scheduler.call(call) == "ok"
+        assert len(attempts) == 3
+        assert attempts[1] - attempts[0] >= 0.05
+        stats = scheduler.stats()
+        assert (stats["retries"], stats["rate_limited"]) == (2, 1)
+
+        def bad_request():
+            attempts.append(time.monotonic())
+            raise api_error(BadRequestError, 400)
+
+        attempts.clear()
+        with pytest.raises(BadRequestError):
+            scheduler.call(bad_request)
+        assert len(attempts) == 1
+
+    def test_exhausted_quota_is_raised_at_once(self):
+        """Test a 429 for insufficient_quota is neither retried nor pauses other callers."""
+        scheduler, attempts = OpenAIScheduler(), []
+
+        def out_of_quota():
+            attempts.append(time.monotonic())
+            raise api_error(RateLimitError, 429, {"retry-after": "5"}, body={"code": "insufficient_quota"})
+
+        with pytest.raises(RateLimitError):
+            scheduler.call(out_of_quota)
+        assert len(attempts) == 1
+        assert scheduler.paused_until <= time.monotonic()
+        assert (scheduler.stats()["retries"], scheduler.stats()["rate_limited"]) == (0, 0)
+
+    def test_exhausted_header_budget_waits_for_the_reset(self):
+        """Test callers hold once the server reports no remaining requests."""
+        scheduler = OpenAIScheduler()
+        scheduler.observe(httpx.Response(200, headers={
+            "x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "100ms",
+            "x-ratelimit-remaining-tokens": "5000", "x-ratelimit-reset-tokens": "1s"
+        }))
+
+        started = time.monotonic()
+        scheduler.call(lambda: None, tokens=10)
+
+        assert time.monotonic() - started >= 0.09
+        assert scheduler.stats()["remaining_tokens"] == 4990
+
+    def test_background_leaves_a_reserve_and_yields_to_interactive(self, monkeypatch):
+        """Test ingestion stops at its share of the RPM budget and chat goes first when both wait."""
+        monkeypatch.setattr(settings, "openai_rpm_limit", 10)
+        monkeypatch.setattr(settings, "openai_interactive_reserve", 0.2)
+        scheduler = OpenAIScheduler()
+        for _ in range(8):
+            scheduler.call(lambda: None, priority=BACKGROUND)
+        # Background is out of budget; interactive still has the reserve
+        assert scheduler.wait_time(BACKGROUND, 1, time.monotonic()) > 0
+        assert scheduler.wait_time(INTERACTIVE, 1, time.monotonic()) == 0
+
+        scheduler.pause(0.1)
+        order = []
+        background = threading.Thread(target=scheduler.call, args=(lambda: order.append("background"),),
+                                      kwargs={"priority": BACKGROUND}, daemon=True)
+        background.start()
+        time.sleep(0.02)
+        scheduler.call(lambda: order.append("interactive"))
+        assert order == ["interactive"]
+        assert scheduler.stats()["waiting"] == {"interactive": 0, "background": 1}
+
+        # Once the minute's requests age out, ingestion resumes
+        with scheduler.condition:
+            scheduler.requests.clear()
+            scheduler.condition.notify_all()
+        background.join(2)
+        assert order == ["interactive", "background"]
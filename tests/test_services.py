@@ -0,0 +1,35 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import Services, get_rag_engine, get_chat_service, close_services
+
+
+class TestServices:
+    def test_import_does_not_build_services(self):
+        """Test importing the app leaves clients to the lifespan."""
+        import app.rag
+        import app.chat
+
+        assert not hasattr(app.rag, "rag_engine")
+        assert not hasattr(app.chat, "chat_service")
+
+    @pytest.mark.asyncio
+    async def test_chat_service_shares_rag_engine(self):
+        """Test lazily built services share one RAG engine."""
+        try:
+            chat_service = get_chat_service()
+            assert chat_service.rag_engine is get_rag_engine()
+            assert Services.chat_service is chat_service
+        finally:
+            await close_services()
+
+    def test_health_and_readiness_are_separate(self):
+        """Test /health stays up while /ready reports uninitialized dependencies."""
+        client = TestClient(app)
+
+        assert client.get("/health").status_code == 200
+
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "not ready"
+        assert set(response.json()["checks"]) == {"mongodb", "vector_store", "llm"}
@@ -0,0 +1,123 @@
+import asyncio
+import threading
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+from app.chat import ChatService
+from app.config import settings
+from app.models import ChatResponse
+from app.rag import RAGEngine
+from app.singleflight import SingleFlight, ThreadSingleFlight
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        """Test callers arriving while a call is in flight get its result without a second call."""
+        flight, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return "answer"
+
+        results = await asyncio.gather(*(flight.do("q", fetch) for _ in range(10)))
+
+        assert results == ["answer"] * 10
+        assert len(calls) == 1
+        assert flight.stats() == {"in_flight": 0, "calls": 1, "shared": 9}
+        # Nothing is cached once the call is done
+        await flight.do("q", fetch)
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_errors_fan_out_and_cancellation_does_not(self):
+        """Test a failure reaches every waiter and one cancelled waiter leaves the call running."""
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(flight.do("a", fail), flight.do("a", fail), return_exceptions=True)
+        assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+
+        async def slow():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.ensure_future(flight.do("b", slow))
+        second = asyncio.ensure_future(flight.do("b", slow))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "done"
+
+    def test_threads_share_one_call(self):
+        """Test blocking calls from several threads are coalesced."""
+        flight, calls = ThreadSingleFlight(), []
+        started = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return [0.5]
+
+        with ThreadPoolExecutor(8) as pool:
+            leader = pool.submit(flight.do, "text", fetch)
+            started.wait()
+            followers = [pool.submit(flight.do, "text", fetch) for _ in range(7)]
+            results = [leader.result()] + [future.result() for future in followers]
+
+        assert results == [[0.5]] * 8
+        assert len(calls) == 1
+
+
+class TestCoalescedServices:
+    @pytest.mark.asyncio
+    async def test_identical_questions_share_an_answer_per_tenant(self):
+        """Test normalized duplicates share one generation, but never across tenants."""
+        answered = []
+
+        class CountingChatService(ChatService):
+            def answer_message(self, message, doc_ids=None, tags=None, tenant_id=None, query_embedding=None):
+                answered.append((message, tenant_id))
+                time.sleep(0.05)
+                return ChatResponse(message=f"{tenant_id}: {message}", retrieval_refs=[])
+
+        chat_service = CountingChatService(SimpleNamespace(openai_client=None))
+        questions = ["How do I mount it?", "how do i mount it", "HOW DO I MOUNT IT?!"]
+
+        responses = await asyncio.gather(
+            *(chat_service.process_chat_message(question, tenant_id="acme") for question in questions),
+            chat_service.process_chat_message("How do I mount it?", tenant_id="globex")
+        )
+
+        assert sorted(tenant for _, tenant in answered) == ["acme", "globex"]
+        assert len({response.message for response in responses[:3]}) == 1
+        assert responses[3].message == "globex: How do I mount it?"
+        assert responses[0] is not responses[1]
+
+    @pytest.mark.asyncio
+    async def test_identical_embedding_inputs_share_a_request(self, monkeypatch):
+        """Test concurrent embeddings of the same text make one OpenAI request."""
+        requests = []
+
+        def create(input, model, **kwargs):
+            requests.append(input)
+            time.sleep(0.05)
+            return SimpleNamespace(data=[SimpleNamespace(embedding=[1.0, 0.0], index=0)])
+
+        openai_client = SimpleNamespace(embeddings=SimpleNamespace(create=create))
+        rag = RAGEngine(qdrant_client=object(), openai_client=openai_client)
+
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(6) as pool:
+            embeddings = await asyncio.gather(*(loop.run_in_executor(pool, rag.get_openai_embedding, "mounting") for _ in range(6)))
+            assert embeddings == [[1.0, 0.0]] * 6
+            assert requests == ["mounting"]
+
+            monkeypatch.setattr(settings, "coalesce_requests", False)
+            await asyncio.gather(*(loop.run_in_executor(pool, rag.get_openai_embedding, "mounting") for _ in range(3)))
+            assert len(requests) == 4
@@ -0,0 +1,102 @@
+import pytest
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from app.auth import get_current_user
+from app.config import settings
+from app.main import app
+from app.models import User
+from app.rag import RAGEngine
+from app.tenants import admin_tenant, can_access_thread, tenant_filter, tenant_of
+from benchmarks.memory_mongo import install_memory_mongo
+
+
+def make_user(user_id, role="user", tenant_id=None):
+    now = datetime.now(timezone.utc)
+    return User(id=user_id, email=f"{user_id}@example.com", hashed_password="x", role=role,
+                tenant_id=tenant_id, created_at=now, updated_at=now)
+
+
+class TestTenantRules:
+    def test_legacy_rows_belong_to_default_tenant(self):
+        """Test rows without a tenant_id are treated as the default tenant's."""
+        assert tenant_of({"title": "old thread"}) == settings.default_tenant
+        assert tenant_of(make_user("u1", tenant_id="acme")) == "acme"
+        assert tenant_filter(settings.default_tenant) == {"tenant_id": {"$in": [None, settings.default_tenant]}}
+        assert tenant_filter("acme") == {"tenant_id": "acme"}
+
+    def test_thread_access(self):
+        """Test admins only reach threads of their own tenant."""
+        thread = {"owner_user_id": "u1", "tenant_id": "acme"}
+
+        assert can_access_thread(thread, make_user("u1", tenant_id="acme"))
+        assert can_access_thread(thread, make_user("a1", role="admin", tenant_id="acme"))
+        assert not can_access_thread(thread, make_user("u2", tenant_id="acme"))
+        assert not can_access_thread(thread, make_user("a2", role="admin", tenant_id="globex"))
+
+    def test_admin_tenant(self):
+        """Test only platform admins may act on another tenant."""
+        assert admin_tenant(make_user("a1", role="admin", tenant_id="acme")) == "acme"
+        assert admin_tenant(make_user("root", role="admin"), "globex") == "globex"
+
+        with pytest.raises(HTTPException) as exc:
+            admin_tenant(make_user("a1", role="admin", tenant_id="acme"), "globex")
+        assert exc.value.status_code == 403
+
+        with pytest.raises(HTTPException) as exc:
+            admin_tenant(make_user("root", role="admin"), "Bad Tenant!")
+        assert exc.value.status_code == 400
+
+
+class TestTenantIsolation:
+    @pytest.fixture
+    def rag(self, monkeypatch):
+        from benchmarks.fake_openai import embed_text
+
+        monkeypatch.setattr(settings, "embedding_dim", 64)
+        monkeypatch.setattr(settings, "qdrant_collection_name", "tenant_test")
+        rag = RAGEngine()
+        monkeypatch.setattr(rag, "get_openai_embedding", lambda text: embed_text(text, 64).tolist())
+        monkeypatch.setattr(rag, "get_openai_embeddings", lambda texts, priority=None: [embed_text(text, 64).tolist() for text in texts])
+        for tenant_id, doc_id, text in (
+            ("acme", "doc-acme", "Acme signs mount with standoff screws. " * 20),
+            ("globex", "doc-globex", "Globex signs mount with standoff screws. " * 20),
+        ):
+            document = {"id": f"{doc_id}.pdf", "doc_id": doc_id, "tags": [], "text": text, "page_count": 1}
+            rag.add_documents_to_qdrant(rag.embed_chunks(rag.preprocess_document(document)), tenant_id=tenant_id)
+        return rag
+
+    def test_each_tenant_gets_its_own_collection(self, rag):
+        """Test tenant chunks land in separate collections and the default keeps the base name."""
+        assert rag.collection_for() == "tenant_test"
+        assert rag.collection_for("acme") == "tenant_test_acme"
+        assert rag.shard_key_for("acme") is None
+        assert {"acme", "globex"} <= rag.ready_tenants
+
+    def test_search_never_crosses_tenants(self, rag):
+        """Test retrieval and deletes only see the requesting tenant's chunks."""
+        acme = rag.search_documents("how do signs mount", tenant_id="acme")
+        globex = rag.search_documents("how do signs mount", tenant_id="globex")
+
+        assert {ref.doc_id for ref in acme} == {"doc-acme"}
+        assert {ref.doc_id for ref in globex} == {"doc-globex"}
+
+        rag.delete_document("doc-globex", tenant_id="acme")
+        assert rag.get_document_chunks("doc-globex", tenant_id="globex")
+
+    def test_admin_thread_list_is_tenant_scoped(self):
+        """Test a tenant admin lists their tenant's threads but not another tenant's."""
+        install_memory_mongo()
+        client = TestClient(app)
+        try:
+            for owner, tenant_id in (("u1", "acme"), ("u2", "globex"), ("u3", None)):
+                app.dependency_overrides[get_current_user] = lambda owner=owner, tenant_id=tenant_id: make_user(owner, tenant_id=tenant_id)
+                assert client.post("/threads", json={"title": owner}).status_code == 200
+
+            app.dependency_overrides[get_current_user] = lambda: make_user("a1", role="admin", tenant_id="acme")
+            assert [thread["title"] for thread in client.get("/threads").json()] == ["u1"]
+
+            app.dependency_overrides[get_current_user] = lambda: make_user("root", role="admin")
+            assert [thread["title"] for thread in client.get("/threads").json()] == ["u3"]
+        finally:
+            app.dependency_overrides.clear()
@@ -0,0 +1,81 @@
+import json
+import pytest
+from datetime import datetime, timezone
+from fastapi.testclient import TestClient
+from app.auth import get_current_user, verify_password
+from app.config import settings
+from app.database import ensure_indexes
+from app.main import app
+from app.models import User
+from app.user_import import hash_passwords, parse_rows, shutdown_hash_pool
+from benchmarks.memory_mongo import install_memory_mongo
+
+
+@pytest.fixture
+def client(monkeypatch):
+    database = install_memory_mongo()
+    monkeypatch.setattr(settings, "password_hash_workers", 2)
+    now = datetime.now(timezone.utc)
+    admin = User(id="admin_1", email="admin@example.com", hashed_password="x", role="admin",
+                 tenant_id="acme", created_at=now, updated_at=now)
+    app.dependency_overrides[get_current_user] = lambda: admin
+    yield TestClient(app), database
+    app.dependency_overrides.clear()
+    shutdown_hash_pool()
+
+
+class TestUserImport:
+    def test_parse_csv_and_json(self):
+        """Test CSV headers are normalized and JSON must be a list of objects."""
+        rows = parse_rows("team.csv", b"Email,Password,Role\nana@example.com,pw,admin\n")
+        assert rows == [{"email": "ana@example.com", "password": "pw", "role": "admin"}]
+
+        assert parse_rows("team.json", json.dumps([{"email": "a@example.com"}]).encode()) == [{"email": "a@example.com"}]
+
+    @pytest.mark.asyncio
+    async def test_per_row_report(self, client):
+        """Test new rows are inserted together while duplicates and bad rows are reported."""
+        client, database = client
+        await database["users"].insert_one({"email": "taken@example.com", "role": "user"})
+        csv_file = (
+            "email,password,role,tenant_id\n"
+            "ana@example.com,secret1,user,\n"
+            "ben@example.com,secret2,admin,acme\n"
+            "ana@example.com,secret3,user,\n"
+            "taken@example.com,secret4,user,\n"
+            "not-an-email,secret5,user,\n"
+            "cy@example.com,secret6,user,globex\n"
+        )
+
+        response = client.post("/admin/users/import", files={"file": ("team.csv", csv_file, "text/csv")})
+
+        assert response.status_code == 200
+        body = response.json()
+        assert [result["status"] for result in body["results"]] == [
+            "created", "created", "duplicate", "duplicate", "error", "error"
+        ]
+        assert (body["created"], body["failed"]) == (2, 4)
+
+        users = {user["email"]: user for user in database["users"].docs}
+        assert users["ben@example.com"]["role"] == "admin"
+        assert users["ana@example.com"]["tenant_id"] == "acme"
+        assert verify_password("secret1", users["ana@example.com"]["hashed_password"])
+        assert "cy@example.com" not in users
+
+    @pytest.mark.asyncio
+    async def test_email_taken_during_the_import_is_a_duplicate(self, client, monkeypatch):
+        """Test the unique email index turns an account created after the pre-check into a duplicate row."""
+        client, database = client
+        await ensure_indexes()
+
+        async def hash_while_admin_signs_up(passwords):
+            await database["users"].insert_one({"email": "ana@example.com", "role": "user"})
+            return await hash_passwords(passwords)
+
+        monkeypatch.setattr("app.user_import.hash_passwords", hash_while_admin_signs_up)
+        csv_file = "email,password\nana@example.com,secret1\nben@example.com,secret2\n"
+
+        response = client.post("/admin/users/import", files={"file": ("team.csv", csv_file, "text/csv")})
+
+        assert [result["status"] for result in response.json()["results"]] == ["duplicate", "created"]
+        assert sorted(user["email"] for user in database["users"].docs) == ["ana@example.com", "ben@example.com"]